@@ -15,7 +15,7 @@ import luigi.s3
 from luigi.configuration import get_config
 
 from edx.analytics.tasks.mapreduce import MapReduceJobTask, MultiOutputMapReduceJobTask, MapReduceJobTaskMixin
-from edx.analytics.tasks.pathutil import PathSetTask
+from edx.analytics.tasks.pathutil import EventLogParsingMixin, PathSetTask
 from edx.analytics.tasks.url import ExternalURL
 from edx.analytics.tasks.url import get_target_from_url, url_path_join
 from edx.analytics.tasks.mysql_load import MysqlInsertTask, MysqlInsertTaskMixin
@@ -35,7 +35,7 @@ UNKNOWN_ANSWER_VALUE = ''
 UNMAPPED_ANSWER_VALUE = ''
 
 
-class ProblemCheckEventMixin(object):
+class ProblemCheckEventMixin(EventLogParsingMixin):
     """Identifies first and last problem_check events for a user on a problem in a course, given raw event log input."""
 
     def mapper(self, line):
@@ -61,7 +61,7 @@ class ProblemCheckEventMixin(object):
                 (i4x://edX/DemoX/Demo_Course/problem/PS1_P1, dummy_username), (2013-09-10T00:01:05.123456, blah)
 
         """
-        parsed_tuple_or_none = get_problem_check_event(line)
+        parsed_tuple_or_none = get_problem_check_event(line, self.parse_event)
         if parsed_tuple_or_none is not None:
             yield parsed_tuple_or_none
 
@@ -928,7 +928,7 @@ def try_str_to_float(value_str):
         return None
 
 
-def get_problem_check_event(line):
+def get_problem_check_event(line, parse_event=eventlog.parse_json_event):
     """
     Generates output values for explicit problem_check events.
 
@@ -936,6 +936,8 @@ def get_problem_check_event(line):
 
         line: text line from a tracking event log.
 
+        parse_event: the function used to parse the line.
+
     Returns:
 
         (problem_id, username), (timestamp, problem_check_info)
@@ -953,7 +955,7 @@ def get_problem_check_event(line):
 
     """
     # Parse the line into a dict.
-    event = eventlog.parse_json_server_event(line, 'problem_check')
+    event = eventlog.parse_json_server_event(line, 'problem_check', parse_event)
     if event is None:
         return None
 
@@ -7,7 +7,7 @@ import datetime
 
 from edx.analytics.tasks.util.overwrite import OverwriteOutputMixin
 from edx.analytics.tasks.mapreduce import MapReduceJobTask, MapReduceJobTaskMixin
-from edx.analytics.tasks.pathutil import PathSetTask
+from edx.analytics.tasks.pathutil import EventLogParsingMixin, PathSetTask
 from edx.analytics.tasks.url import get_target_from_url, url_path_join
 import edx.analytics.tasks.util.eventlog as eventlog
 import edx.analytics.tasks.util.opaque_key_util as opaque_key_util
@@ -23,7 +23,7 @@ ENROLLED = 1
 ################################
 
 
-class CourseEnrollmentEventsPerDayMixin(object):
+class CourseEnrollmentEventsPerDayMixin(EventLogParsingMixin):
     """Calculates daily change in enrollment for a user in a course, given raw event log input."""
 
     def mapper(self, line):
@@ -42,7 +42,7 @@ class CourseEnrollmentEventsPerDayMixin(object):
         Example:
             (edX/DemoX/Demo_Course, dummy_userid), (2013-09-10T00:01:05.123456, 1)
         """
-        parsed_tuple_or_none = get_explicit_enrollment_output(line)
+        parsed_tuple_or_none = get_explicit_enrollment_output(line, self.parse_event)
         if parsed_tuple_or_none is not None:
             yield parsed_tuple_or_none
 
@@ -263,7 +263,7 @@ class CourseEnrollmentChangesPerDay(
 # Helper methods
 ################################
 
-def get_explicit_enrollment_output(line):
+def get_explicit_enrollment_output(line, parse_event=eventlog.parse_json_event):
     """
     Generates output values for explicit enrollment events.
 
@@ -271,6 +271,8 @@ def get_explicit_enrollment_output(line):
 
       line: text line from a tracking event log.
 
+      parse_event: the function used to parse the line.
+
     Returns:
 
       (course_id, user_id), (timestamp, action_value)
@@ -290,7 +292,7 @@ def get_explicit_enrollment_output(line):
         return None
 
     # try to parse the line into a dict:
-    event = eventlog.parse_json_event(line)
+    event = parse_event(line)
     if event is None:
         # The line didn't parse.  For this specific purpose,
         # we can assume that all enrollment-related lines would parse,
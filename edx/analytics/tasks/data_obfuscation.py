@@ -649,6 +649,7 @@ class ObfuscatedCourseDumpTask(ObfuscatorDownstreamMixin, luigi.WrapperTask):
             'log_context': self.log_context,
             'auth_user_path': self.auth_user_path,
             'auth_userprofile_path': self.auth_userprofile_path,
+            'user_info_index_path': self.user_info_index_path,
         }
         yield (
             ObfuscateAuthUserTask(**kwargs),
@@ -689,5 +690,6 @@ class DataObfuscationTask(ObfuscatorDownstreamMixin, luigi.WrapperTask):
                 'log_context': self.log_context,
                 'auth_user_path': self.auth_user_path,
                 'auth_userprofile_path': self.auth_userprofile_path,
+                'user_info_index_path': self.user_info_index_path,
             }
             yield ObfuscatedCourseDumpTask(**kwargs)
@@ -1,8 +1,12 @@
 """Load records into elasticsearch clusters."""
 
+from collections import deque
+import functools
 from itertools import islice
 import logging
+from multiprocessing.pool import ThreadPool
 import random
+import threading
 import time
 
 try:
@@ -31,6 +35,9 @@ REJECTED_REQUEST_STATUS = 429
 HTTP_SERVICE_UNAVAILABLE_STATUS_CODE = 503
 HTTP_GATEWAY_TIMEOUT_STATUS_CODE = 504
 
+# Batches may be rejected, and counted, by several threads at once, but hadoop counters are not thread-safe.
+COUNTER_LOCK = threading.Lock()
+
 
 class ElasticsearchIndexTask(OverwriteOutputMixin, MapReduceJobTask):
     """
@@ -91,6 +98,27 @@ class ElasticsearchIndexTask(OverwriteOutputMixin, MapReduceJobTask):
         description='Number of records to submit to the cluster to be indexed in a single request. A small value here'
                     ' will result in more, smaller, requests and a larger value will result in fewer, bigger requests.'
     )
+    batch_size_bytes = luigi.IntParameter(
+        default=None,
+        significant=False,
+        description='If specified, submit a batch of records as soon as its bulk request body reaches this many bytes,'
+                    ' even if it has fewer than batch_size records. This keeps requests for large documents from'
+                    ' growing too big, without making requests for small documents too small.'
+    )
+    max_concurrent_requests = luigi.IntParameter(
+        default=1,
+        significant=False,
+        description='Number of bulk requests each indexing process can have in flight at the same time. Batches are'
+                    ' sent by a pool of threads, and no more records are read while this many requests are waiting for'
+                    ' a response.'
+    )
+    index_from_mapper = luigi.BooleanParameter(
+        default=False,
+        significant=False,
+        description='If True, index the records directly from the mappers, which makes this a map-only job that does'
+                    ' not shuffle the records. The number of indexing processes is then the number of map tasks,'
+                    ' and indexing_tasks is ignored.'
+    )
     indexing_tasks = luigi.IntParameter(
         default=None,
         significant=False,
@@ -189,40 +217,120 @@ class ElasticsearchIndexTask(OverwriteOutputMixin, MapReduceJobTask):
     def mapper(self, line):
         yield (random.randrange(int(self.n_reduce_tasks)), line.rstrip('\r\n'))
 
-    def reducer(self, _key, lines):
-        """
-        Given a batch of records, transmit them to the elasticsearch cluster to be indexed.
+    def _map_input(self, input_stream):
+        if not self.index_from_mapper:
+            for output in super(ElasticsearchIndexTask, self)._map_input(input_stream):
+                yield output
+            return
 
-        There should be one reducer per parallel indexing thread. Controlling the number of reducers is the way to
-        control the level of parallelism in the load process.
-        """
-        elasticsearch_client = self.create_elasticsearch_client()
+        lines = (line for _key, line in super(ElasticsearchIndexTask, self)._map_input(input_stream))
+        self.index_documents(self.document_generator(lines))
+        self._flush_batch_incr_counter()
 
-        document_iterator = self.document_generator(lines)
-        first_batch = True
-        while True:
-            bulk_action_batch = self.next_bulk_action_batch(document_iterator)
+        # Like the reducer, return something that is written to a temp file and cleaned up after the job finishes.
+        yield ('', '')
 
-            if not bulk_action_batch:
-                break
+    @property
+    def reducer(self):
+        """
+        The reducer that indexes the records, or NotImplemented if they are indexed by the mappers instead.
 
-            if not first_batch and self.throttle:
-                time.sleep(self.throttle)
-            first_batch = False
+        Luigi runs a map-only job when the reducer is NotImplemented.
+        """
+        if self.index_from_mapper:
+            return NotImplemented
+        return self.index_reducer
 
-            if self.send_bulk_action_batch(elasticsearch_client, bulk_action_batch):
-                self.incr_counter('Elasticsearch', 'Committed Batches', 1)
+    def index_reducer(self, _key, lines):
+        """
+        Given a batch of records, transmit them to the elasticsearch cluster to be indexed.
 
-                # Note that each document produces two entries in the bulk_action_batch list.
-                num_records = len(bulk_action_batch) / 2
-                self.incr_counter('Elasticsearch', 'Records Indexed', num_records)
-            else:
-                raise IndexingError('Batch of records rejected too many times. Aborting.')
+        There should be one reducer per parallel indexing process. Controlling the number of reducers and the number of
+        concurrent requests each one makes is the way to control the level of parallelism in the load process.
+        """
+        self.index_documents(self.document_generator(lines))
 
         # Luigi requires the reducer to actually return something, so we just return empty strings that are written
         # to a temp file in HDFS that is immediately cleaned up after the job finishes.
         yield ('', '')
 
+    def index_documents(self, document_iterator):
+        """
+        Transmit documents to the elasticsearch cluster to be indexed, in batches.
+
+        If `max_concurrent_requests` is greater than one, the batches are sent by a pool of threads that each use their
+        own client, and the next batch is only read once fewer than that many requests are in flight.
+
+        Arguments:
+            document_iterator (iterator of dicts): The documents to index, as generated by `document_generator`.
+
+        Raises:
+            IndexingError: If a batch of records could not be indexed.
+        """
+        if self.max_concurrent_requests > 1:
+            pool = ThreadPool(self.max_concurrent_requests)
+            send_bulk_action_batch = functools.partial(self.send_bulk_action_batch_from_thread, threading.local())
+        else:
+            pool = None
+            elasticsearch_client = self.create_elasticsearch_client()
+
+        pending_requests = deque()
+        try:
+            first_batch = True
+            while True:
+                bulk_action_batch = self.next_bulk_action_batch(document_iterator)
+
+                if not bulk_action_batch:
+                    break
+
+                if not first_batch and self.throttle:
+                    time.sleep(self.throttle)
+                first_batch = False
+
+                if pool is None:
+                    self.record_bulk_action_batch(
+                        bulk_action_batch, self.send_bulk_action_batch(elasticsearch_client, bulk_action_batch)
+                    )
+                    continue
+
+                if len(pending_requests) >= self.max_concurrent_requests:
+                    self.wait_for_bulk_request(*pending_requests.popleft())
+                pending_requests.append(
+                    (bulk_action_batch, pool.apply_async(send_bulk_action_batch, (bulk_action_batch,)))
+                )
+
+            while pending_requests:
+                self.wait_for_bulk_request(*pending_requests.popleft())
+        finally:
+            if pool is not None:
+                # Requests that are still in flight after a failure are abandoned.
+                pool.terminate()
+
+    def send_bulk_action_batch_from_thread(self, thread_state, bulk_action_batch):
+        """Transmit a batch of actions from a pool thread, using a client that is only used by that thread."""
+        if not hasattr(thread_state, 'elasticsearch_client'):
+            thread_state.elasticsearch_client = self.create_elasticsearch_client()
+        return self.send_bulk_action_batch(thread_state.elasticsearch_client, bulk_action_batch)
+
+    def wait_for_bulk_request(self, bulk_action_batch, async_result):
+        """Wait for a batch of actions sent by a pool thread to be transmitted, re-raising any error it raised."""
+        self.record_bulk_action_batch(bulk_action_batch, async_result.get())
+
+    def record_bulk_action_batch(self, bulk_action_batch, batch_written_successfully):
+        """Count a batch of actions that has been transmitted, or fail if it was rejected too many times."""
+        if not batch_written_successfully:
+            raise IndexingError('Batch of records rejected too many times. Aborting.')
+
+        self.incr_counter('Elasticsearch', 'Committed Batches', 1)
+
+        # Note that each document produces two entries in the bulk_action_batch list.
+        num_records = len(bulk_action_batch) / 2
+        self.incr_counter('Elasticsearch', 'Records Indexed', num_records)
+
+    def incr_counter(self, *args, **kwargs):
+        with COUNTER_LOCK:
+            super(ElasticsearchIndexTask, self).incr_counter(*args, **kwargs)
+
     def next_bulk_action_batch(self, document_iterator):
         """
         Read a batch of documents from the iterator and convert them into bulk index actions.
@@ -232,17 +340,32 @@ class ElasticsearchIndexTask(OverwriteOutputMixin, MapReduceJobTask):
 
         See the `Cheaper in Bulk <https://www.elastic.co/guide/en/elasticsearch/guide/1.x/bulk.html>`_ guide.
 
+        The batch holds at most `batch_size` documents, and if `batch_size_bytes` is specified, it ends with the first
+        document that brings the size of the request body to at least that many bytes.
+
         Arguments:
             document_iterator (iterator of dicts):
 
         Returns: A list of dicts that can be transmitted to elasticsearch using the "bulk" request.
         """
+        if self.batch_size_bytes is not None:
+            serializer = elasticsearch.serializer.JSONSerializer()
+
         bulk_action_batch = []
+        batch_bytes = 0
         for raw_data in islice(document_iterator, self.batch_size):
             action, data = elasticsearch.helpers.expand_action(raw_data)
             bulk_action_batch.append(action)
             if data is not None:
                 bulk_action_batch.append(data)
+
+            if self.batch_size_bytes is not None:
+                # Each action and document is serialized on its own line of the request body.
+                batch_bytes += len(serializer.dumps(action)) + 1
+                if data is not None:
+                    batch_bytes += len(serializer.dumps(data)) + 1
+                if batch_bytes >= self.batch_size_bytes:
+                    break
         return bulk_action_batch
 
     def send_bulk_action_batch(self, elasticsearch_client, bulk_action_batch):
@@ -356,6 +479,8 @@ class ElasticsearchIndexTask(OverwriteOutputMixin, MapReduceJobTask):
     def jobconfs(self):
         jcs = super(ElasticsearchIndexTask, self).jobconfs()
         jcs.append('mapred.reduce.tasks.speculative.execution=false')
+        if self.index_from_mapper:
+            jcs.append('mapred.map.tasks.speculative.execution=false')
         return jcs
 
     def update_id(self):
@@ -3,7 +3,10 @@ Tasks for performing encryption on export files.
 """
 from contextlib import contextmanager
 import logging
+import subprocess
+import sys
 import tempfile
+import threading
 
 import gnupg
 
@@ -35,7 +38,7 @@ def get_key_from_target(key_file_target):
 
 
 @contextmanager
-def make_encrypted_file(output_file, key_file_targets, recipients=None, progress=None, dir=None):
+def make_encrypted_file(output_file, key_file_targets, recipients=None, progress=None, dir=None, streaming=False):
     """
     Creates a file object to be written to, whose contents will afterwards be encrypted.
 
@@ -44,6 +47,8 @@ def make_encrypted_file(output_file, key_file_targets, recipients=None, progress
         key_file_targets: a list of luigi.Target objects defining the gpg public key files to be loaded.
         recipients:  an optional list of recipients to be loaded.  If not specified, uses all loaded keys.
         progress:  a function that is called periodically as progress is made.
+        streaming:  if True, the data is piped through a gpg process and encrypted as it is written, instead of being
+            written to a temporary file that is encrypted into a second temporary file once it is complete.
     """
     with make_temp_directory(prefix="encrypt", dir=dir) as temp_dir:
         # Use temp directory to hold gpg keys.
@@ -51,6 +56,13 @@ def make_encrypted_file(output_file, key_file_targets, recipients=None, progress
         gpg.encoding = 'utf-8'
         _import_key_files(gpg, key_file_targets)
 
+        if streaming:
+            if recipients is None:
+                recipients = [key['keyid'] for key in gpg.list_keys()]
+            with _make_encrypted_stream(gpg, output_file, recipients, progress) as encrypted_stream:
+                yield encrypted_stream
+            return
+
         # Create a temp file to contain the unencrypted output, in the same temp directory.
         with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp_input_file:
             temp_input_filepath = temp_input_file.name
@@ -89,3 +101,138 @@ def _encrypt_file(gpg_instance, input_file, encrypted_filepath, recipients):
         armor=False,
     )
     log.info('Encryption complete.')
+
+
+@contextmanager
+def _make_encrypted_stream(gpg_instance, output_file, recipients, progress=None):
+    """
+    Yields a file object whose contents are encrypted by a gpg process as they are written.
+
+    A thread copies the output of gpg to the output file while the data is being written.  The only buffering between
+    the writer, gpg and the output file is done by the pipes, so writes block when the output file falls behind.
+    """
+    command = [
+        gpg_instance.gpgbinary,
+        '--homedir', gpg_instance.gnupghome,
+        '--batch',
+        '--no-tty',
+        '--quiet',
+        '--trust-model', 'always',
+        '--encrypt',
+    ]
+    for recipient in recipients:
+        command.extend(['--recipient', recipient])
+
+    with tempfile.TemporaryFile(dir=gpg_instance.gnupghome) as error_file:
+        log.info('Streaming encrypted output for recipients: %s', recipients)
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=error_file)
+        encrypted_stream = EncryptedStreamWriter(process, output_file, progress)
+        try:
+            yield encrypted_stream
+        except Exception:
+            encrypted_stream.abort()
+            raise
+        encrypted_stream.close()
+
+        if process.returncode != 0:
+            error_file.seek(0)
+            raise IOError('gpg exited with status {0}: {1}'.format(process.returncode, error_file.read().strip()))
+        log.info('Encryption complete.')
+
+
+class EncryptedStreamWriter(object):
+    """
+    A file object that writes to the input of a gpg process, while a thread copies its output to an output file.
+
+    Progress is reported from the thread that writes to this object rather than from the copying thread, since
+    progress functions usually update hadoop counters, which are not safe to update from more than one thread.
+    """
+
+    def __init__(self, process, output_file, progress=None):
+        self.process = process
+        self.output_file = output_file
+        self.progress = progress
+        self.closed = False
+
+        self.lock = threading.Lock()
+        self.unreported_bytes = 0
+        self.copy_error = None
+
+        self.copy_thread = threading.Thread(target=self._copy_output)
+        self.copy_thread.daemon = True
+        self.copy_thread.start()
+
+    def _copy_output(self):
+        """Copies the output of gpg to the output file until gpg exits."""
+        try:
+            copy_file_to_file(self.process.stdout, self.output_file, self._count_output)
+        except Exception:  # pylint: disable=broad-except
+            self.copy_error = sys.exc_info()
+            # Otherwise gpg would block once the pipe is full, and the writer would block along with it.
+            self._kill_process()
+
+    def _count_output(self, num_bytes):
+        """Records bytes written to the output file, to be reported by the writing thread."""
+        with self.lock:
+            self.unreported_bytes += num_bytes
+
+    def _report_progress(self):
+        """Passes the number of bytes written to the output file since the last report to the progress function."""
+        with self.lock:
+            num_bytes = self.unreported_bytes
+            self.unreported_bytes = 0
+        if self.progress and num_bytes:
+            try:
+                self.progress(num_bytes)
+            except:  # pylint: disable=bare-except
+                pass
+
+    def _kill_process(self):
+        """Terminates gpg, if it is still running."""
+        try:
+            self.process.kill()
+        except OSError:
+            pass
+
+    def _raise_copy_error(self):
+        """Re-raises any exception that occurred while copying the output of gpg to the output file."""
+        if self.copy_error is not None:
+            raise self.copy_error[0], self.copy_error[1], self.copy_error[2]
+
+    def write(self, data):
+        """Writes data to be encrypted."""
+        try:
+            self.process.stdin.write(data)
+        except IOError:
+            # A broken pipe here is usually a symptom of a failure to write the output.
+            self._raise_copy_error()
+            raise
+        self._report_progress()
+
+    def flush(self):
+        """Flushes buffered data to gpg."""
+        self.process.stdin.flush()
+
+    def close(self):
+        """Waits for gpg to encrypt all of the data written and for its output to be copied to the output file."""
+        if self.closed:
+            return
+        self.closed = True
+        self.process.stdin.close()
+        self.copy_thread.join()
+        self.process.wait()
+        self._report_progress()
+        self._raise_copy_error()
+
+    def abort(self):
+        """Stops gpg without waiting for the data that has been written to be encrypted."""
+        if self.closed:
+            return
+        self.closed = True
+        self._kill_process()
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+        self.copy_thread.join()
+        self.process.wait()
@@ -43,6 +43,8 @@ class CourseEnrollmentEventsTask(
     # We use warehouse_path to generate the output path, so we make this a non-param.
     output_root = None
 
+    required_event_types = (DEACTIVATED, ACTIVATED, MODE_CHANGED)
+
     def mapper(self, line):
         value = self.get_event_and_date_string(line)
         if value is None:
@@ -116,7 +118,10 @@ class CourseEnrollmentEventsTask(
     def run(self):
         self.remove_output_on_overwrite()
         super(CourseEnrollmentEventsTask, self).run()
+        self.ensure_output_for_each_date()
 
+    def ensure_output_for_each_date(self):
+        """Create an empty output file for each date in the interval that had no events."""
         # This makes sure that a output file exists for each date in the interval
         # as downstream tasks require that they exist.
         for date in self.interval:
@@ -388,6 +393,42 @@ class DaysEnrolledForEvents(object):
 
                 self.previous_state = self.state
 
+    def enrollment_intervals(self):
+        """
+        A record is yielded for each range of days during which the user's enrollment state and mode didn't change.
+
+        This is a compact encoding of the records produced by `days_enrolled()`: each interval covers a contiguous run
+        of those records with the same `enrolled_at_end` and `mode_at_end` values. The `change_since_last_day` of the
+        first record in the run is implied by the state of the preceding interval, or is equal to `enrolled_at_end` if
+        there is no preceding interval. Note that only one of these two methods should be called on each instance.
+
+        Yields:
+            tuple: (course_id, user_id, start_date, end_date, enrolled_at_end, mode_at_end) where the start date is
+                inclusive and the end date is exclusive.
+
+        """
+        start_date = end_date = state = mode = None
+        for index in range(len(self.sorted_events) - 1):
+            self.event = self.sorted_events[index]
+            self.next_event = self.sorted_events[index + 1]
+
+            self.change_state()
+
+            if self.event.datestamp != self.next_event.datestamp:
+                # Each range of days starts where the previous one ended, so only state and mode changes matter.
+                if start_date is not None and (state, mode) != (self.state, self.mode):
+                    yield (self.course_id, self.user_id, start_date, end_date, state, mode)
+                    start_date = None
+
+                if start_date is None:
+                    start_date = self.event.datestamp
+                    state = self.state
+                    mode = self.mode
+                end_date = self.next_event.datestamp
+
+        if start_date is not None:
+            yield (self.course_id, self.user_id, start_date, end_date, state, mode)
+
     def all_dates_between(self, start_date_str, end_date_str):
         """
         All dates from the start date up to the end date.
@@ -403,7 +444,8 @@ class DaysEnrolledForEvents(object):
             yield current_date.isoformat()
             current_date += datetime.timedelta(days=1)
 
-    def parse_date_string(self, date_str):
+    @staticmethod
+    def parse_date_string(date_str):
         """Efficiently parse an ISO 8601 date stamp into a datetime.date() object."""
         date_parts = [int(p) for p in date_str.split('-')[:3]]
         return datetime.date(*date_parts)
@@ -475,6 +517,126 @@ class ExternalCourseEnrollmentTableTask(CourseEnrollmentTableTask):
         )
 
 
+class CourseEnrollmentIntervalTask(CourseEnrollmentTask):
+    """
+    Produce a data set that shows the ranges of days during which each user's enrollment in each course was unchanged.
+
+    This contains the same information as the output of CourseEnrollmentTask, but its size is proportional to the number
+    of enrollment state changes instead of the number of days since each user enrolled.
+    """
+
+    def reducer(self, key, values):
+        """Emit a record for each range of days during which the user's enrollment state and mode didn't change."""
+        course_id, user_id = key
+
+        event_stream_processor = DaysEnrolledForEvents(course_id, user_id, self.interval, values)
+        for enrollment_interval_record in event_stream_processor.enrollment_intervals():
+            yield enrollment_interval_record
+
+
+def sweep_enrollment_intervals(intervals):
+    """
+    Count the enrollment intervals that include each day.
+
+    Rather than expanding each interval into individual days, the changes in the counts at the start and the end of each
+    interval are accumulated and then summed in date order.
+
+    Args:
+        intervals (iterable): Tuples of (start_date, end_date, enrolled_at_end) as produced by
+            CourseEnrollmentIntervalTask. The end date is exclusive.
+
+    Yields:
+        tuple: (datestamp, count, cumulative_count) for each day that is included in at least one interval, in date
+            order. The count is the number of intervals in which the user was enrolled at the end of the day, the
+            cumulative count is the number of intervals that include the day.
+
+    """
+    deltas = {}
+    for start_date, end_date, enrolled_at_end in intervals:
+        start_delta = deltas.setdefault(start_date, [0, 0])
+        start_delta[0] += enrolled_at_end
+        start_delta[1] += 1
+        end_delta = deltas.setdefault(end_date, [0, 0])
+        end_delta[0] -= enrolled_at_end
+        end_delta[1] -= 1
+
+    count = cumulative_count = 0
+    boundaries = sorted(deltas)
+    for index in range(len(boundaries) - 1):
+        count += deltas[boundaries[index]][0]
+        cumulative_count += deltas[boundaries[index]][1]
+        if cumulative_count == 0:
+            continue
+
+        current_date = DaysEnrolledForEvents.parse_date_string(boundaries[index])
+        next_boundary_date = DaysEnrolledForEvents.parse_date_string(boundaries[index + 1])
+        while current_date < next_boundary_date:
+            yield (current_date.isoformat(), count, cumulative_count)
+            current_date += datetime.timedelta(days=1)
+
+
+class EnrollmentIntervalCountsTask(CourseEnrollmentDownstreamMixin, MapReduceJobTask):
+    """Base class for per-day enrollment counts that are computed from the output of CourseEnrollmentIntervalTask."""
+
+    output_root = luigi.Parameter()
+
+    def requires_hadoop(self):
+        return CourseEnrollmentIntervalTask(
+            mapreduce_engine=self.mapreduce_engine,
+            n_reduce_tasks=self.n_reduce_tasks,
+            source=self.source,
+            interval=self.interval,
+            pattern=self.pattern,
+            warehouse_path=self.warehouse_path,
+            overwrite_n_days=self.overwrite_n_days,
+            output_root=url_path_join(
+                self.warehouse_path,
+                'course_enrollment_interval',
+                HivePartition('dt', self.interval.date_b.isoformat()).path_spec  # pylint: disable=no-member
+            ) + '/',
+        )
+
+    def mapper(self, line):
+        course_id, _user_id, start_date, end_date, enrolled_at_end, mode = line.split('\t')
+        yield self.get_count_key(course_id, mode), (start_date, end_date, int(enrolled_at_end))
+
+    def reducer(self, key, values):
+        for datestamp, count, cumulative_count in sweep_enrollment_intervals(values):
+            yield self.get_count_record(key, datestamp, count, cumulative_count)
+
+    def get_count_key(self, course_id, mode):
+        """The key of the group of users that are counted together."""
+        raise NotImplementedError
+
+    def get_count_record(self, key, datestamp, count, cumulative_count):
+        """The output record for a group of users on a particular day."""
+        raise NotImplementedError
+
+    def output(self):
+        return get_target_from_url(self.output_root)
+
+
+class EnrollmentDailyCountsTask(EnrollmentIntervalCountsTask):
+    """The number of users enrolled in each course at the end of each day, in the format of EnrollmentDailyTask."""
+
+    def get_count_key(self, course_id, mode):
+        return course_id
+
+    def get_count_record(self, key, datestamp, count, cumulative_count):
+        return (key, datestamp, count, cumulative_count)
+
+
+class EnrollmentByModeCountsTask(EnrollmentIntervalCountsTask):
+    """The number of users enrolled in each course and mode on each day, in the format of EnrollmentByModeTask."""
+
+    def get_count_key(self, course_id, mode):
+        return (course_id, mode)
+
+    def get_count_record(self, key, datestamp, count, cumulative_count):
+        course_id, mode = key
+        return (datestamp, course_id, mode, count, cumulative_count)
+
+
 class EnrollmentSummaryRecord(Record):
     """Summarizes a user's enrollment history for a particular course."""
 
@@ -859,10 +1021,59 @@ class EnrollmentDailyTask(EnrollmentTask):
         ]
 
 
+class EnrollmentIntervalCountsMysqlMixin(object):
+    """
+    Load a breakdown of enrollments that is computed from enrollment intervals instead of a Hive query.
+
+    The counts are produced by a map reduce job and don't require the course_enrollment table.
+    """
+
+    counts_task_class = None
+
+    @property
+    def insert_source_task(self):
+        return self.counts_task_class(
+            mapreduce_engine=self.mapreduce_engine,
+            n_reduce_tasks=self.n_reduce_tasks,
+            source=self.source,
+            interval=self.interval,
+            pattern=self.pattern,
+            warehouse_path=self.warehouse_path,
+            overwrite_n_days=self.overwrite_n_days,
+            output_root=url_path_join(
+                self.warehouse_path, 'enrollment_interval_counts', self.table, self.partition.path_spec
+            ) + '/',
+        )
+
+    @property
+    def required_table_tasks(self):
+        return []
+
+
+class EnrollmentByModeFromIntervalsTask(EnrollmentIntervalCountsMysqlMixin, EnrollmentByModeTask):
+    """Breakdown of enrollments by mode, computed from enrollment intervals."""
+
+    counts_task_class = EnrollmentByModeCountsTask
+
+
+class EnrollmentDailyFromIntervalsTask(EnrollmentIntervalCountsMysqlMixin, EnrollmentDailyTask):
+    """A history of the number of students enrolled in each course, computed from enrollment intervals."""
+
+    counts_task_class = EnrollmentDailyCountsTask
+
+
 @workflow_entry_point
 class ImportEnrollmentsIntoMysql(CourseEnrollmentDownstreamMixin, luigi.WrapperTask):
     """Import all breakdowns of enrollment into MySQL"""
 
+    enrollment_intervals = luigi.BooleanParameter(
+        default=False,
+        config_path={'section': 'enrollments', 'name': 'enrollment_intervals'},
+        significant=False,
+        description='If True, compute the daily and mode breakdowns from enrollment intervals instead of querying '
+                    'the course_enrollment table.',
+    )
+
     def requires(self):
         kwargs = {
             'n_reduce_tasks': self.n_reduce_tasks,
@@ -872,11 +1083,15 @@ class ImportEnrollmentsIntoMysql(CourseEnrollmentDownstreamMixin, luigi.WrapperT
             'warehouse_path': self.warehouse_path,
             'overwrite_n_days': self.overwrite_n_days,
         }
+        if self.enrollment_intervals:
+            by_mode_task_class, daily_task_class = EnrollmentByModeFromIntervalsTask, EnrollmentDailyFromIntervalsTask
+        else:
+            by_mode_task_class, daily_task_class = EnrollmentByModeTask, EnrollmentDailyTask
         yield (
             CourseEnrollmentSummaryTableTask(**kwargs),
             EnrollmentByGenderTask(**kwargs),
             EnrollmentByBirthYearTask(**kwargs),
             EnrollmentByEducationLevelTask(**kwargs),
-            EnrollmentByModeTask(**kwargs),
-            EnrollmentDailyTask(**kwargs),
+            by_mode_task_class(**kwargs),
+            daily_task_class(**kwargs),
         )
@@ -176,7 +176,9 @@ class EventExportTask(EventLogSelectionMixin, MultiOutputMapReduceJobTask):
             self.incr_counter('Event Export', 'Bytes Written to Output', num_bytes)
 
         key_file_targets = [get_target_from_url(url_path_join(self.gpg_key_dir, recipient)) for recipient in recipients]
-        with make_encrypted_file(output_file, key_file_targets, progress=report_progress) as encrypted_output_file:
+        with make_encrypted_file(
+            output_file, key_file_targets, progress=report_progress, streaming=True
+        ) as encrypted_output_file:
             outfile = gzip.GzipFile(mode='wb', fileobj=encrypted_output_file)
             try:
                 for value in values:
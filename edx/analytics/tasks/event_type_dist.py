@@ -3,7 +3,7 @@
 import logging
 import luigi
 import luigi.task
-from edx.analytics.tasks.mapreduce import MapReduceJobTask
+from edx.analytics.tasks.mapreduce import MapReduceJobTask, SummingJobTaskMixin
 from edx.analytics.tasks.pathutil import EventLogSelectionMixin
 from edx.analytics.tasks.url import ExternalURL, get_target_from_url, url_path_join
 from edx.analytics.tasks.vertica_load import VerticaCopyTask
@@ -11,7 +11,7 @@ from edx.analytics.tasks.vertica_load import VerticaCopyTask
 log = logging.getLogger(__name__)
 
 
-class EventTypeDistributionTask(EventLogSelectionMixin, MapReduceJobTask):
+class EventTypeDistributionTask(SummingJobTaskMixin, EventLogSelectionMixin, MapReduceJobTask):
     """Task to compute event_type and event_source values being encountered on each day in a given time interval."""
     output_root = luigi.Parameter()
     events_list_file_path = luigi.Parameter(default=None)
@@ -52,6 +52,9 @@ class ObfuscateCourseEventsTask(ObfuscatorMixin, GeolocationMixin, MultiOutputMa
 
         if os.path.basename(self.explicit_event_whitelist) != self.explicit_event_whitelist:
             results['explicit_events'] = ExternalURL(url=self.explicit_event_whitelist)
+        if self.user_info_index_path is not None:
+            # Build the index before the job runs, so that it can be memory-mapped by the reducers.
+            results.update(self.user_info_requirements())
         return results
 
     def init_local(self):
@@ -376,5 +379,6 @@ class EventObfuscationTask(ObfuscatorDownstreamMixin, MapReduceJobTaskMixin, lui
                 'log_context': self.log_context,
                 'auth_user_path': self.auth_user_path,
                 'auth_userprofile_path': self.auth_userprofile_path,
+                'user_info_index_path': self.user_info_index_path,
             }
             yield ObfuscateCourseEventsTask(**kwargs)
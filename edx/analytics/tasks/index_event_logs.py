@@ -0,0 +1,67 @@
+"""Build indexes that summarize the contents of tracking log files."""
+
+import logging
+
+from edx.analytics.tasks.mapreduce import MultiOutputMapReduceJobTask
+from edx.analytics.tasks.pathutil import EventLogSelectionMixin
+from edx.analytics.tasks.util import eventlog
+from edx.analytics.tasks.util.event_log_index import EventLogIndex, get_index_url
+
+log = logging.getLogger(__name__)
+
+
+class IndexEventLogsTask(EventLogSelectionMixin, MultiOutputMapReduceJobTask):
+    """
+    Write an index next to each tracking log file selected for the interval.
+
+    The index records the number of events of each type in the file and the range of dates of those events. It is
+    consulted by PathSelectionByDateIntervalTask to skip files that cannot contain events that are relevant to a job.
+    This task should be run once the log files for a day are complete, for example right after they are rotated.
+
+    Note that every event in each file is indexed, even the ones that are outside of the interval.
+    """
+
+    # Index files are written next to the files they describe, so we make this a non-param.
+    output_root = None
+
+    def init_mapper(self):
+        super(IndexEventLogsTask, self).init_mapper()
+        self.indexes = {}
+
+    def mapper(self, line):
+        input_file = self.get_map_input_file()
+        index = self.indexes.get(input_file)
+        if index is None:
+            index = self.indexes[input_file] = EventLogIndex()
+
+        event = eventlog.parse_json_event(line)
+        if event is None:
+            index.unparsed_count += 1
+            return iter(tuple())
+
+        event_time = event.get('time')
+        if not isinstance(event_time, basestring):
+            # Events without a timestamp are discarded by all event log jobs, so there is no need to index them.
+            return iter(tuple())
+
+        event_type = event.get('event_type')
+        if not isinstance(event_type, basestring):
+            event_type = ''
+
+        index.add(event_type, event_time.split('T')[0])
+
+        # The indexes are only output once the entire input has been processed, see final_mapper.
+        return iter(tuple())
+
+    def final_mapper(self):
+        for input_file, index in self.indexes.iteritems():
+            yield input_file, index.to_json()
+
+    def multi_output_reducer(self, _key, values, output_file):
+        index = EventLogIndex()
+        for value in values:
+            index.update(EventLogIndex.from_json(value))
+        output_file.write(index.to_json())
+
+    def output_path_for_key(self, key):
+        return get_index_url(key)
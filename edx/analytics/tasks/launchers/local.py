@@ -10,6 +10,7 @@ Main method for running tasks on a local machine.
 from contextlib import contextmanager
 import logging
 import os
+import sys
 
 import boto
 import filechunkio
@@ -17,7 +18,7 @@ import cjson
 import ciso8601
 import opaque_keys
 import bson
-import pyinstrument
+import pkg_resources
 import stevedore
 import requests
 
@@ -25,6 +26,8 @@ import luigi
 import luigi.configuration
 import luigi.hadoop
 
+from edx.analytics.tasks import EXTENSION_NAMESPACE
+
 # Tell urllib3 to switch the ssl backend to PyOpenSSL.
 # see https://urllib3.readthedocs.org/en/latest/security.html#pyopenssl
 import urllib3.contrib.pyopenssl
@@ -40,9 +43,12 @@ def main():
     # In order to see errors during extension loading, you can uncomment the next line.
     logging.basicConfig(level=logging.DEBUG)
 
-    # Load tasks configured using entry_points
-    # TODO: launch tasks by their entry_point name
-    stevedore.ExtensionManager('edx.analytics.tasks')
+    # Load only the task that is being launched, since importing every task module and its dependencies is slow.  Tasks
+    # that are not configured using entry_points can only be found by loading all of them.
+    cmdline_args = load_task(sys.argv[1:])
+    if cmdline_args is None:
+        cmdline_args = sys.argv[1:]
+        stevedore.ExtensionManager(EXTENSION_NAMESPACE)
 
     configuration = luigi.configuration.get_config()
     if os.path.exists(OVERRIDE_CONFIGURATION_FILE):
@@ -69,12 +75,59 @@ def main():
     # Launch Luigi using the default builder
 
     with profile_if_necessary(os.getenv('WORKFLOW_PROFILER', ''), os.getenv('WORKFLOW_PROFILER_PATH', '')):
-        luigi.run()
+        luigi.run(cmdline_args)
+
+
+def load_task(cmdline_args):
+    """
+    Imports the module of the task named on the command line, using the entry_points that are configured for tasks.
+
+    The task may be named either by its class name or by the name of its entry point.  Returns the command line
+    arguments with an entry point name replaced by the class name that luigi expects, or None if the task is not
+    configured using entry_points.
+    """
+    index = find_task_argument(cmdline_args)
+    if index is None:
+        return None
+    task_name = cmdline_args[index]
+
+    entry_points = list(pkg_resources.iter_entry_points(EXTENSION_NAMESPACE))
+    # Luigi treats class names that are defined more than once as ambiguous, so load all of them.
+    matching_entry_points = [entry_point for entry_point in entry_points if entry_point.attrs[0] == task_name]
+    if not matching_entry_points:
+        matching_entry_points = [entry_point for entry_point in entry_points if entry_point.name == task_name]
+    if not matching_entry_points:
+        return None
+
+    for entry_point in matching_entry_points:
+        log.debug('Loading task %s from %s', entry_point.name, entry_point.module_name)
+        task_cls = entry_point.resolve()
+
+    cmdline_args = list(cmdline_args)
+    cmdline_args[index] = task_cls.task_family
+    return cmdline_args
+
+
+def find_task_argument(cmdline_args):
+    """Returns the index of the task name in luigi command line arguments, or None if there is no task name."""
+    options_with_values = set(
+        '--' + param_name.replace('_', '-')
+        for param_name, param in luigi.task.Register.get_global_params()
+        if not param.is_boolean
+    )
+    args = iter(enumerate(cmdline_args))
+    for index, arg in args:
+        if not arg.startswith('-'):
+            return index
+        elif arg in options_with_values:
+            next(args, None)
+    return None
 
 
 @contextmanager
 def profile_if_necessary(profiler_name, file_path):
     if profiler_name == 'pyinstrument':
+        import pyinstrument
         profiler = pyinstrument.Profiler(use_signal=False)
         profiler.start()
 
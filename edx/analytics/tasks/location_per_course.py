@@ -158,7 +158,10 @@ class LastDailyIpAddressOfUserTask(
     def run(self):
         self.remove_output_on_overwrite()
         super(LastDailyIpAddressOfUserTask, self).run()
+        self.ensure_output_for_each_date()
 
+    def ensure_output_for_each_date(self):
+        """Create an empty output file for each date in the interval that had no events."""
         # This makes sure that a output file exists for each date in the interval
         # as downstream tasks require that they exist (as provided by downstream_input_tasks()).
         for date in self.interval:
@@ -325,7 +328,7 @@ class LastCountryOfUser(LastCountryOfUserDownstreamMixin, GeolocationMixin, MapR
 
 
     def mapper(self, line):
-        record = LastIpAddressRecord.from_tsv(line)
+        record = LastIpAddressRecord.from_tsv(line, validate=False)
 
         # Output all events for a username, regardless of course (for now).
         # (When including course_id, it should be included in the value, not the key.
@@ -3,10 +3,13 @@ Support executing map reduce tasks.
 """
 from __future__ import absolute_import
 
-import gzip
-from hashlib import md5
+import heapq
+import itertools
+import multiprocessing
 import os
+import shutil
 import StringIO
+import tempfile
 import logging
 import logging.config
 
@@ -17,6 +20,7 @@ import luigi.task
 from luigi import configuration
 
 from edx.analytics.tasks.url import get_target_from_url, url_path_join
+from edx.analytics.tasks.util.file_util import open_gzip_stream
 from edx.analytics.tasks.util.manifest import convert_to_manifest_input_if_necessary
 
 
@@ -163,83 +167,350 @@ class MapReduceJobRunner(luigi.hadoop.HadoopJobRunner):
 
 class EmulatedMapReduceJobRunner(luigi.hadoop.JobRunner):
     """
-    Execute map reduce tasks in process on the machine that is running luigi.
+    Execute map reduce tasks on the machine that is running luigi.
 
     This is a modified version of luigi.hadoop.LocalJobRunner. The key differences are:
 
     * It gracefully handles .gz input files, decompressing them and streaming them directly to the mapper. This mirrors
-      the behavior of hadoop's default file input format. Note this only works for files that support `tell()` and
-      `seek()` since those methods are used by the gzip decompression library.
+      the behavior of hadoop's default file input format. Files are read sequentially, with a background thread reading
+      ahead, so this also works for files that don't support `tell()` and `seek()`, such as files streamed from S3.
     * It detects ".manifest" files and assumes that they are in fact just a file that contains paths to the real files
       that should be processed by the task. It makes use of this information to "do the right thing". This mirrors the
       behavior of a manifest input format in hadoop.
     * It sets the "map_input_file" environment variable when running the mapper just like the hadoop streaming library.
+    * It runs a separate map task for each input file and a separate reduce task for each partition of the map output,
+      using a pool of worker processes. Map output is hash partitioned by key into files in a temporary directory, and
+      each partition is sorted using a bounded amount of memory, so it is never held in memory all at once. The
+      "mapreduce_task_partition" environment variable is set while running each reduce task, also like the hadoop
+      streaming library.
+    * If the job defines a combiner, it is run on the output of each map task before it is reduced.
 
     Other than that it should behave identically to LocalJobRunner.
 
+    Args:
+        num_processes (int): The number of worker processes to use. Defaults to the "local_processes" setting in the
+            "map-reduce" section of the configuration, or 1 if that is not set. Tasks are run in the current process if
+            this is 1. Note that with several processes, any state that a job changes in its mapper or reducer is only
+            changed in the worker process that ran it.
+        num_partitions (int): The number of partitions of the map output, and therefore the number of reduce tasks.
+            Defaults to the "local_partitions" setting in the "map-reduce" section of the configuration, or the number
+            of processes if that is not set, so by default all of the map output is reduced by a single task. The
+            `n_reduce_tasks` of the job is not used, since it is sized for a hadoop cluster.
+        sort_buffer_size (int): The approximate amount of memory, in bytes, used by each reduce task to sort its input
+            before spilling it to disk. Defaults to the "local_sort_buffer_mb" setting in the "map-reduce" section of
+            the configuration, or 100MB if that is not set.
+
     """
 
+    def __init__(self, num_processes=None, num_partitions=None, sort_buffer_size=None):
+        config = configuration.get_config()
+        if num_processes is None:
+            num_processes = config.getint('map-reduce', 'local_processes', 1)
+        if num_partitions is None:
+            num_partitions = config.getint('map-reduce', 'local_partitions', num_processes)
+        if sort_buffer_size is None:
+            sort_buffer_size = config.getint('map-reduce', 'local_sort_buffer_mb', 100) * 1024 * 1024
+        self.num_processes = max(num_processes, 1)
+        self.num_partitions = max(num_partitions, 1)
+        self.sort_buffer_size = sort_buffer_size
+
+        # These are set for the duration of run_job() so that they are inherited by the worker processes.
+        self.job = None
+        self.input_targets = None
+        self.temp_dir = None
+
     def group(self, input):
-        output = StringIO.StringIO()
-        lines = []
-        for i, line in enumerate(input):
-            parts = line.rstrip('\n').split('\t')
-            blob = md5(str(i)).hexdigest()  # pseudo-random blob to make sure the input isn't sorted
-            lines.append((parts[:-1], blob, line))
-        for k, _, line in sorted(lines):
-            output.write(line)
-        output.seek(0)
-        return output
+        """
+        Sort lines of map output by key, so that all of the values for each key are adjacent.
+
+        Lines are sorted in memory in batches of at most `sort_buffer_size` bytes. If the input does not fit in a single
+        batch, each sorted batch is spilled to a temporary file and the files are merged. The values for each key are
+        returned in the order they were read.
+        """
+        runs = []
+        try:
+            batch = []
+            batch_size = 0
+            for line in input:
+                batch.append(line)
+                batch_size += len(line) + SORT_LINE_OVERHEAD
+                if batch_size >= self.sort_buffer_size:
+                    runs.append(self.spill(batch))
+                    batch = []
+                    batch_size = 0
+
+            batch.sort(key=get_sort_key)
+            if not runs:
+                for line in batch:
+                    yield line
+                return
+
+            if batch:
+                runs.append(self.spill(batch))
+            del batch
+            for _key, _run_index, _line_number, line in heapq.merge(*[
+                    self.read_run(run_file, run_index) for run_index, run_file in enumerate(runs)]):
+                yield line
+        finally:
+            for run_file in runs:
+                run_file.close()
+
+    def spill(self, lines):
+        """Sort a batch of lines and write them to a temporary file, which is deleted once it is closed."""
+        lines.sort(key=get_sort_key)
+        run_file = tempfile.TemporaryFile(dir=self.temp_dir)
+        run_file.writelines(lines)
+        run_file.seek(0)
+        return run_file
+
+    @staticmethod
+    def read_run(run_file, run_index):
+        """Read a sorted file written by `spill`, decorating each line so that values are merged in input order."""
+        for line_number, line in enumerate(run_file):
+            yield get_sort_key(line), run_index, line_number, line
 
     def run_job(self, job):
         job.init_hadoop()
-        job.init_mapper()
-        map_output = StringIO.StringIO()
-        input_targets = luigi.task.flatten(job.input_hadoop())
-        for input_target in input_targets:
+        self.job = job
+        self.input_targets = self.get_input_targets(job)
+        self.temp_dir = tempfile.mkdtemp(prefix='emulated-map-reduce-')
+        try:
+            map_task_ids = range(len(self.input_targets))
+            if job.reducer == NotImplemented:
+                # Map only job, the output of the mappers is the output of the job.
+                self.write_output(self.run_tasks('run_map_only_task', map_task_ids))
+            else:
+                self.run_tasks('run_map_task', map_task_ids)
+                self.write_output(self.run_tasks('run_reduce_task', range(self.num_partitions)))
+        finally:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.job = None
+            self.input_targets = None
+            self.temp_dir = None
+
+    def get_input_targets(self, job):
+        """Returns the list of files to map, replacing directories and manifests with the files they refer to."""
+        input_targets = []
+        pending_targets = luigi.task.flatten(job.input_hadoop())
+        while pending_targets:
+            input_target = pending_targets.pop(0)
             # if file is a directory, then assume that it's Hadoop output,
             # and actually loop through its contents:
             if os.path.isdir(input_target.path):
                 filenames = os.listdir(input_target.path)
                 for filename in filenames:
                     url = url_path_join(input_target.path, filename)
-                    input_targets.append(get_target_from_url(url.strip()))
-                continue
+                    pending_targets.append(get_target_from_url(url.strip()))
+            elif input_target.path.endswith('.manifest'):
+                with input_target.open('r') as manifest_file:
+                    for url in manifest_file:
+                        pending_targets.append(get_target_from_url(url.strip()))
+            else:
+                input_targets.append(input_target)
+
+        return input_targets
+
+    def run_tasks(self, method_name, task_ids):
+        """Run the given method of this runner once for each task, possibly in parallel, and return the results."""
+        if self.num_processes == 1 or len(task_ids) <= 1:
+            return [getattr(self, method_name)(task_id) for task_id in task_ids]
+
+        global _EMULATED_RUNNER  # pylint: disable=global-statement
+        _EMULATED_RUNNER = self
+        try:
+            # The worker processes are forked here, and inherit the job and the state of this runner.
+            pool = multiprocessing.Pool(min(self.num_processes, len(task_ids)))
+        finally:
+            _EMULATED_RUNNER = None
+
+        try:
+            results = pool.map(_run_emulated_task, [(method_name, task_id) for task_id in task_ids], chunksize=1)
+            pool.close()
+            return results
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
 
-            with input_target.open('r') as input_file:
+    def read_input(self, map_task_id):
+        """Returns an iterator over the lines of the input file for a map task, without line endings."""
+        input_target = self.input_targets[map_task_id]
+        input_file = input_target.open('r')
+        if input_target.path.endswith('.gz'):
+            input_file = open_gzip_stream(input_file)
 
-                # S3 files not yet supported since they don't support tell() and seek()
-                if input_target.path.endswith('.gz'):
-                    input_file = gzip.GzipFile(fileobj=input_file)
-                elif input_target.path.endswith('.manifest'):
-                    for url in input_file:
-                        input_targets.append(get_target_from_url(url.strip()))
-                    continue
+        try:
+            for line in input_file:
+                yield line.rstrip('\n')
+        finally:
+            input_file.close()
+
+    def run_map_task(self, map_task_id):
+        """Map a single input file and split the output into one file per partition."""
+        job = self.job
+        partition_files = [
+            open(self.get_map_output_path(map_task_id, partition), 'w') for partition in range(self.num_partitions)
+        ]
+        os.environ['map_input_file'] = self.input_targets[map_task_id].path
+        try:
+            job.init_mapper()
+            for output in job._map_input(self.read_input(map_task_id)):
+                partition_file = partition_files[hash(repr(output[0])) % self.num_partitions]
+                job.internal_writer((output,), partition_file)
+        finally:
+            del os.environ['map_input_file']
+            for partition_file in partition_files:
+                partition_file.close()
+
+        if job.combiner != NotImplemented:
+            for partition in range(self.num_partitions):
+                self.run_combiner(map_task_id, partition)
+
+    def run_combiner(self, map_task_id, partition):
+        """Sort and combine the output of a map task for a partition, replacing the original output."""
+        map_output_path = self.get_map_output_path(map_task_id, partition)
+        uncombined_path = map_output_path + '.uncombined'
+        os.rename(map_output_path, uncombined_path)
+        with open(uncombined_path, 'r') as input_file:
+            with open(map_output_path, 'w') as output_file:
+                self.job._run_combiner(self.group(input_file), output_file)
+        os.remove(uncombined_path)
+
+    def run_map_only_task(self, map_task_id):
+        """Map a single input file and write the final output of the mapper to a temporary file."""
+        output_path = os.path.join(self.temp_dir, 'map-{0:05d}'.format(map_task_id))
+        os.environ['map_input_file'] = self.input_targets[map_task_id].path
+        try:
+            with open(output_path, 'w') as output_file:
+                self.job.init_mapper()
+                self.job.writer(self.job._map_input(self.read_input(map_task_id)), output_file)
+        finally:
+            del os.environ['map_input_file']
+
+        return output_path
+
+    def run_reduce_task(self, partition):
+        """Sort and reduce a single partition of the map output, writing the result to a temporary file."""
+        input_files = [
+            open(self.get_map_output_path(map_task_id, partition), 'r')
+            for map_task_id in range(len(self.input_targets))
+        ]
+        output_path = os.path.join(self.temp_dir, 'reduce-{0:05d}'.format(partition))
+        os.environ['mapreduce_task_partition'] = str(partition)
+        try:
+            reduce_input = self.group(itertools.chain.from_iterable(input_files))
+            with open(output_path, 'w') as output_file:
+                self.job._run_reducer(reduce_input, output_file)
+        finally:
+            del os.environ['mapreduce_task_partition']
+            for input_file in input_files:
+                input_file.close()
 
-                os.environ['map_input_file'] = input_target.path
-                try:
-                    outputs = job._map_input((line[:-1] for line in input_file))
-                    job.internal_writer(outputs, map_output)
-                finally:
-                    del os.environ['map_input_file']
+        return output_path
 
-        map_output.seek(0)
+    def get_map_output_path(self, map_task_id, partition):
+        """Returns the path of the file containing the output of a map task for a partition."""
+        return os.path.join(self.temp_dir, 'map-{0:05d}-part-{1:05d}'.format(map_task_id, partition))
 
-        reduce_input = self.group(map_output)
+    def write_output(self, paths):
+        """Concatenate the output of all tasks into the output of the job."""
         try:
-            reduce_output = job.output().open('w')
+            output_file = self.job.output().open('w')
         except Exception:
-            reduce_output = StringIO.StringIO()
+            output_file = StringIO.StringIO()
 
         try:
-            job._run_reducer(reduce_input, reduce_output)
+            for path in paths:
+                with open(path, 'r') as task_output_file:
+                    shutil.copyfileobj(task_output_file, output_file)
         finally:
             try:
-                reduce_output.close()
+                output_file.close()
             except Exception:
                 pass
 
 
+# The approximate amount of memory used to hold a line in addition to its characters, for sorting purposes.
+SORT_LINE_OVERHEAD = 64
+
+
+def get_sort_key(line):
+    """Returns the part of a line of map output that contains the key."""
+    return line.rsplit('\t', 1)[0]
+
+
+# The runner whose tasks are being executed by a pool of worker processes, see EmulatedMapReduceJobRunner.run_tasks.
+_EMULATED_RUNNER = None
+
+
+def _run_emulated_task(args):
+    """Run a task of an EmulatedMapReduceJobRunner in a worker process."""
+    method_name, task_id = args
+    return getattr(_EMULATED_RUNNER, method_name)(task_id)
+
+
+class SummingJobTaskMixin(object):
+    """
+    Reduce the volume of map output for jobs that add up the values output by the mapper, for example to count events.
+
+    The values for each key are summed in the mapper itself, using a dictionary that is flushed whenever it holds
+    `max_in_mapper_keys` keys, and once more by a combiner before they are sent to the reducers. The reducer must
+    accept partial sums as values, which is true for any reducer that only adds them up.
+    """
+
+    max_in_mapper_keys = luigi.IntParameter(
+        config_path={'section': 'map-reduce', 'name': 'max_in_mapper_keys'},
+        default=10000,
+        significant=False,
+        description='The maximum number of distinct keys each mapper keeps partial sums for before writing them out. '
+                    'Set to 0 to disable summing in the mapper.',
+    )
+
+    # The partial sums that have not been output yet, keyed by the mapper output key.
+    partial_sums = None
+
+    def _map_input(self, input_stream):
+        outputs = super(SummingJobTaskMixin, self)._map_input(input_stream)
+        self.partial_sums = {}
+        for output in self.sum_map_output(outputs):
+            yield output
+        for output in self.flush_partial_sums():
+            yield output
+
+    def sum_map_output(self, outputs):
+        """
+        Add the values output by the mapper to the partial sums for their keys.
+
+        The partial sums are output whenever `max_in_mapper_keys` keys are held, and the rest are output by
+        `flush_partial_sums`. The outputs are passed through unchanged if summing in the mapper is disabled.
+        """
+        if self.max_in_mapper_keys <= 0:
+            for output in outputs:
+                yield output
+            return
+
+        if self.partial_sums is None:
+            self.partial_sums = {}
+        partial_sums = self.partial_sums
+        for key, value in outputs:
+            partial_sums[key] = partial_sums.get(key, 0) + value
+            if len(partial_sums) >= self.max_in_mapper_keys:
+                for output in self.flush_partial_sums():
+                    yield output
+
+    def flush_partial_sums(self):
+        """Output the partial sums that are held, and forget them."""
+        partial_sums = self.partial_sums or {}
+        for output in partial_sums.iteritems():
+            yield output
+        partial_sums.clear()
+
+    def combiner(self, key, values):
+        """Add up the partial sums for a key."""
+        yield key, sum(values)
+
+
 class MultiOutputMapReduceJobTask(MapReduceJobTask):
     """
     Produces multiple output files from a map reduce job.
@@ -6,6 +6,7 @@ See ModuleEngagementWorkflowTask for more extensive documentation.
 
 from collections import defaultdict
 import datetime
+import itertools
 import logging
 import random
 
@@ -28,7 +29,7 @@ from edx.analytics.tasks.decorators import workflow_entry_point
 from edx.analytics.tasks.elasticsearch_load import ElasticsearchIndexTask
 from edx.analytics.tasks.enrollments import ExternalCourseEnrollmentTableTask
 
-from edx.analytics.tasks.mapreduce import MapReduceJobTask, MapReduceJobTaskMixin
+from edx.analytics.tasks.mapreduce import MapReduceJobTask, MapReduceJobTaskMixin, SummingJobTaskMixin
 from edx.analytics.tasks.pathutil import EventLogSelectionMixin, EventLogSelectionDownstreamMixin
 from edx.analytics.tasks.url import get_target_from_url, url_path_join, ExternalURL
 from edx.analytics.tasks.util import eventlog
@@ -85,7 +86,7 @@ class ModuleEngagementDownstreamMixin(WarehouseMixin, MapReduceJobTaskMixin, Eve
     interval = None
 
 
-class ModuleEngagementDataTask(EventLogSelectionMixin, OverwriteOutputMixin, MapReduceJobTask):
+class ModuleEngagementDataTask(SummingJobTaskMixin, EventLogSelectionMixin, OverwriteOutputMixin, MapReduceJobTask):
     """
     Process the event log and categorize user engagement with various types of content.
 
@@ -393,9 +394,15 @@ class ModuleEngagementSummaryRecord(Record):
         Returns: A generator of tuples whose first element is the metric name, and the second is the value of the metric
             for this particular record.
         """
-        for field_name, field_obj in self.get_fields().items():
-            if getattr(field_obj, 'is_metric', False):
-                yield field_name, getattr(self, field_name)
+        for field_name in self.get_metric_names():
+            yield field_name, getattr(self, field_name)
+
+    @classmethod
+    def get_metric_names(cls):
+        """Returns: A list of the names of all fields that are metrics, in order of declaration."""
+        return [
+            field_name for field_name, field_obj in cls.get_fields().items() if getattr(field_obj, 'is_metric', False)
+        ]
 
 
 class ModuleEngagementSummaryRecordBuilder(object):
@@ -521,7 +528,7 @@ class ModuleEngagementSummaryDataTask(WeekIntervalMixin, ModuleEngagementDownstr
         return list(self.requires_local().get_raw_data_tasks())
 
     def mapper(self, line):
-        record = ModuleEngagementRecord.from_tsv(line)
+        record = ModuleEngagementRecord.from_tsv(line, validate=False)
         yield ((record.course_id, record.username), line.rstrip('\r\n'))
 
     def reducer(self, key, lines):
@@ -530,7 +537,7 @@ class ModuleEngagementSummaryDataTask(WeekIntervalMixin, ModuleEngagementDownstr
 
         output_record_builder = ModuleEngagementSummaryRecordBuilder()
         for line in lines:
-            record = ModuleEngagementRecord.from_tsv(line)
+            record = ModuleEngagementRecord.from_tsv(line, validate=False)
 
             output_record_builder.add_record(record)
 
@@ -635,7 +642,7 @@ class ModuleEngagementSummaryMetricRangesDataTask(ModuleEngagementDownstreamMixi
         return partition_task.data_task
 
     def mapper(self, line):
-        record = ModuleEngagementSummaryRecord.from_tsv(line)
+        record = ModuleEngagementSummaryRecord.from_tsv(line, validate=False)
         yield record.course_id, line.rstrip('\n')
 
     def reducer(self, course_id, lines):
@@ -644,31 +651,38 @@ class ModuleEngagementSummaryMetricRangesDataTask(ModuleEngagementDownstreamMixi
 
         This will include all students who performed any activity of interest in the past week.
         """
-        metric_values = defaultdict(list)
+        # There is some information we need to copy out of the summary records, so just grab one of them. There will be
+        # at least one, or else the reduce function would have never been called.
+        lines = iter(lines)
+        first_line = next(lines)
+        first_record = ModuleEngagementSummaryRecord.from_tsv(first_line, validate=False)
+
+        metrics = ModuleEngagementSummaryRecord.get_metric_names()
+        columns = ModuleEngagementSummaryRecord.columns_from_tsv(
+            itertools.chain([first_line], lines),
+            field_names=metrics + ['days_active'],
+        )
 
-        unprocessed_metrics = set()
-        first_record = None
-        for line in lines:
-            record = ModuleEngagementSummaryRecord.from_tsv(line)
-            if first_record is None:
-                # There is some information we need to copy out of the summary records, so just grab one of them. There
-                # will be at least one, or else the reduce function would have never been called.
-                first_record = record
-
-            # don't include inactive learners in metric range computations
-            if record.days_active == 0:
-                continue
+        # don't include inactive learners in metric range computations
+        is_active = columns['days_active'] != 0
+        if not is_active.any():
+            return
 
-            for metric, value in record.get_metrics():
+        metric_values = {}
+        unprocessed_metrics = set()
+        for metric in metrics:
+            is_included = is_active
+            if metric == 'problem_attempts_per_completed':
+                # The learner needs to have at least attempted one problem in order for their float('inf') to be
+                # included in the metric ranges. If the ratio is 0/0 we ignore the record.
+                is_included = is_included & (columns['problem_attempts'] != 0)
+
+            if is_included.any():
+                metric_values[metric] = columns[metric][is_included]
+            else:
                 unprocessed_metrics.add(metric)
-                if metric == 'problem_attempts_per_completed' and record.problem_attempts == 0:
-                    # The learner needs to have at least attempted one problem in order for their float('inf') to be
-                    # included in the metric ranges. If the ratio is 0/0 we ignore the record.
-                    continue
-                metric_values[metric].append(value)
 
         for metric in sorted(metric_values):
-            unprocessed_metrics.remove(metric)
             values = metric_values[metric]
             normal_lower_bound, normal_upper_bound = numpy.percentile(  # pylint: disable=no-member
                 values, [self.low_percentile, self.high_percentile]
@@ -859,19 +873,19 @@ class ModuleEngagementUserSegmentDataTask(ModuleEngagementDownstreamMixin, Overw
         # relatively small number (thousands).
         with self.input_local()['range_data'].open('r') as metric_ranges_target:
             for line in metric_ranges_target:
-                range_record = ModuleEngagementSummaryMetricRangeRecord.from_tsv(line)
+                range_record = ModuleEngagementSummaryMetricRangeRecord.from_tsv(line, validate=False)
                 if range_record.range_type == METRIC_RANGE_HIGH:
                     self.high_metric_ranges[range_record.course_id][range_record.metric] = range_record
 
     def mapper(self, line):
-        record = ModuleEngagementSummaryRecord.from_tsv(line)
+        record = ModuleEngagementSummaryRecord.from_tsv(line, validate=False)
         yield (record.course_id, record.username), line.rstrip('\n')
 
     def reducer(self, key, lines):
         """Given a particular user in a particular course, look at their summary and assign appropriate segments."""
         course_id, username = key
 
-        records = [ModuleEngagementSummaryRecord.from_tsv(line) for line in lines]
+        records = [ModuleEngagementSummaryRecord.from_tsv(line, validate=False) for line in lines]
 
         if len(records) > 1:
             raise RuntimeError('There should be exactly one summary record per user per course.')
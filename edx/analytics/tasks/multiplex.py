@@ -0,0 +1,300 @@
+"""
+Feed several event log map reduce jobs from a single pass over the tracking logs.
+"""
+from __future__ import absolute_import
+
+import itertools
+import logging
+import os
+
+import luigi
+import luigi.task
+
+from edx.analytics.tasks.enrollments import CourseEnrollmentEventsTask
+from edx.analytics.tasks.location_per_course import LastDailyIpAddressOfUserTask
+from edx.analytics.tasks.mapreduce import MapReduceJobTask, MultiOutputMapReduceJobTask, SummingJobTaskMixin
+from edx.analytics.tasks.pathutil import EventLogParsingMixin, EventLogSelectionMixin
+from edx.analytics.tasks.url import get_target_from_url, url_path_join
+from edx.analytics.tasks.user_activity import UserActivityTableTask, UserActivityTask
+from edx.analytics.tasks.util import eventlog
+from edx.analytics.tasks.util.hive import WarehouseMixin
+
+
+log = logging.getLogger(__name__)
+
+
+class MultiplexedEventLogTask(EventLogSelectionMixin, MapReduceJobTask):
+    """
+    Read each tracking log file once and fan the events out to several consumer tasks.
+
+    Every consumer is a regular event log job: a map reduce job with a mapper and a reducer that parses its input lines
+    with `parse_event` (see EventLogParsingMixin). Each input line is parsed exactly once, the parsed event is handed to
+    the `mapper` of every consumer and the mapper output is tagged with the index of the consumer that produced it.
+    Consumers that sum their map output (see SummingJobTaskMixin) still do so in the mapper, and the combiner of each
+    consumer is run on its own map output. The reducer routes each key back to the `reducer` of the consumer that
+    emitted it and writes the results to that consumer's output.
+
+    Consumers that use EventLogSelectionMixin must select their events from the same source with the same patterns,
+    and their interval must be contained in the interval of this task. Other consumers must read exactly the same
+    files as this task, which is checked before the job is run.
+
+    Consumers that write to a single output directory get one "part-NNNNN" file per reduce task in that directory
+    plus a "_SUCCESS" flag once the job completes, exactly like a stand-alone hadoop run. Consumers that are instances
+    of MultiOutputMapReduceJobTask write their own files from their reducer, their marker is written once the job
+    completes. The `run` method of the consumers is not called, instead `remove_output_on_overwrite` is called before
+    the job and `ensure_output_for_each_date` after it, for the consumers that define them.
+
+    Note that the parsed event is shared by all consumers, so their mappers must treat it as read-only.
+
+    Subclasses must implement `consumers()`.
+    """
+
+    marker = luigi.Parameter(
+        config_path={'section': 'map-reduce', 'name': 'marker'},
+        significant=False,
+        description='A URL location to a directory where a marker file will be written on task completion.',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(MultiplexedEventLogTask, self).__init__(*args, **kwargs)
+        self.consumer_tasks = list(self.consumers())
+        for consumer in self.consumer_tasks:
+            self.validate_consumer(consumer)
+        self.consumer_outputs = None
+
+    def consumers(self):
+        """Returns an iterable of the event log tasks that should be fed by this job."""
+        raise NotImplementedError
+
+    def validate_consumer(self, consumer):
+        """Raise a ValueError if the consumer cannot be computed from the input read by this task."""
+        if not isinstance(consumer, EventLogParsingMixin) or not isinstance(consumer, MapReduceJobTask):
+            raise ValueError('Consumer {0} is not an event log map reduce job.'.format(consumer))
+
+        if consumer.reducer == NotImplemented:
+            raise ValueError('Consumer {0} does not implement a reducer.'.format(consumer))
+
+        if not isinstance(consumer, MultiOutputMapReduceJobTask) and not isinstance(consumer.output(), luigi.Target):
+            raise ValueError('Consumer {0} does not write to a single output directory.'.format(consumer))
+
+        if not isinstance(consumer, EventLogSelectionMixin):
+            # The input of these consumers can only be compared with ours once it has been listed, see run().
+            return
+
+        for param_name in ('source', 'pattern', 'date_pattern'):
+            if getattr(consumer, param_name) != getattr(self, param_name):
+                raise ValueError(
+                    'Consumer {0} reads events from a different {1}: {2!r}.'.format(
+                        consumer, param_name, getattr(consumer, param_name)
+                    )
+                )
+
+        # pylint: disable=no-member
+        if consumer.interval.date_a < self.interval.date_a or consumer.interval.date_b > self.interval.date_b:
+            raise ValueError('Consumer {0} interval is not contained in {1}.'.format(consumer, self.interval))
+
+    def validate_consumer_inputs(self):
+        """Raise a ValueError if a consumer that selects its own input files does not read the files read by this task."""
+        input_paths = None
+        for consumer in self.consumer_tasks:
+            if isinstance(consumer, EventLogSelectionMixin):
+                continue
+
+            if input_paths is None:
+                input_paths = set(target.path for target in luigi.task.flatten(self.input()))
+            consumer_paths = set(target.path for target in luigi.task.flatten(consumer.input()))
+            if consumer_paths != input_paths:
+                raise ValueError('Consumer {0} does not read the same files as {1}.'.format(consumer, self))
+
+    def init_local(self):
+        super(MultiplexedEventLogTask, self).init_local()
+        for consumer in self.consumer_tasks:
+            consumer.init_local()
+
+    def init_hadoop(self):
+        for consumer in self.consumer_tasks:
+            consumer.init_hadoop()
+        return super(MultiplexedEventLogTask, self).init_hadoop()
+
+    def init_mapper(self):
+        super(MultiplexedEventLogTask, self).init_mapper()
+        for consumer in self.consumer_tasks:
+            consumer.init_mapper()
+
+    def init_combiner(self):
+        super(MultiplexedEventLogTask, self).init_combiner()
+        for consumer in self.consumer_tasks:
+            consumer.init_combiner()
+
+    def init_reducer(self):
+        super(MultiplexedEventLogTask, self).init_reducer()
+        for consumer in self.consumer_tasks:
+            consumer.init_reducer()
+        self.consumer_outputs = {}
+
+    def extra_modules(self):
+        """The modules needed by this task and by every consumer, since they all run in the same hadoop job."""
+        modules = []
+        for task in [super(MultiplexedEventLogTask, self)] + self.consumer_tasks:
+            # Some mixins return None after appending to the list returned by their parent class.
+            for module in task.extra_modules() or []:
+                if module not in modules:
+                    modules.append(module)
+        return modules
+
+    def mapper(self, line):
+        event = eventlog.parse_json_event(line)
+        if isinstance(event, dict):
+            # Several consumers may read the payload of the same event, so only decode it once.
+            event = eventlog.Event(event)
+        parsed_line = (line, event)
+        for index, consumer in enumerate(self.consumer_tasks):
+            consumer.parsed_line = parsed_line
+            outputs = consumer.mapper(line)
+            if isinstance(consumer, SummingJobTaskMixin):
+                outputs = consumer.sum_map_output(outputs)
+            for key, value in outputs:
+                yield (index, key), value
+
+    def final_mapper(self):
+        for index, consumer in enumerate(self.consumer_tasks):
+            outputs = ()
+            if consumer.final_mapper != NotImplemented:
+                outputs = consumer.final_mapper()
+            if isinstance(consumer, SummingJobTaskMixin):
+                outputs = itertools.chain(consumer.sum_map_output(outputs), consumer.flush_partial_sums())
+            for key, value in outputs:
+                yield (index, key), value
+
+    @property
+    def combiner(self):
+        """
+        The combiner that runs the combiner of each consumer on its map output, or NotImplemented if none have one.
+
+        Luigi does not run a combiner when it is NotImplemented.
+        """
+        if all(consumer.combiner == NotImplemented for consumer in self.consumer_tasks):
+            return NotImplemented
+        return self.consumer_combiner
+
+    def consumer_combiner(self, key, values):
+        """Route each key to the combiner of the consumer that emitted it, passing it through if there is none."""
+        index, consumer_key = key
+        consumer = self.consumer_tasks[index]
+        if consumer.combiner == NotImplemented:
+            for value in values:
+                yield key, value
+            return
+
+        for output_key, value in consumer.combiner(consumer_key, values):
+            yield (index, output_key), value
+
+    def final_combiner(self):
+        for index, consumer in enumerate(self.consumer_tasks):
+            if consumer.combiner == NotImplemented or consumer.final_combiner == NotImplemented:
+                continue
+            for key, value in consumer.final_combiner():
+                yield (index, key), value
+
+    def reducer(self, key, values):
+        index, consumer_key = key
+        consumer = self.consumer_tasks[index]
+        self.write_consumer_output(index, consumer.reducer(consumer_key, values))
+
+        # Luigi requires the reducer to return an iterable
+        return iter(tuple())
+
+    def final_reducer(self):
+        try:
+            for index, consumer in enumerate(self.consumer_tasks):
+                if consumer.final_reducer != NotImplemented:
+                    self.write_consumer_output(index, consumer.final_reducer())
+        finally:
+            for output_file in self.consumer_outputs.itervalues():
+                output_file.close()
+            self.consumer_outputs = {}
+
+        return iter(tuple())
+
+    def write_consumer_output(self, index, outputs):
+        """Write the records generated by a consumer reducer to the part file of that consumer."""
+        consumer = self.consumer_tasks[index]
+        if isinstance(consumer, MultiOutputMapReduceJobTask):
+            # These write their own output files, just make sure the reducer is actually evaluated.
+            for _output in outputs:
+                pass
+            return
+
+        output_file = self.consumer_outputs.get(index)
+        if output_file is None:
+            output_url = url_path_join(consumer.output().path, self.get_part_file_name())
+            log.info('Writing output file: %s', output_url)
+            output_file = get_target_from_url(output_url).open('w')
+            self.consumer_outputs[index] = output_file
+
+        consumer.writer(outputs, output_file)
+
+    def get_part_file_name(self):
+        """Returns a file name that is unique to the current reduce task."""
+        partition = os.environ.get('mapreduce_task_partition', os.environ.get('mapred_task_partition', '0'))
+        return 'part-{0:05d}'.format(int(partition))
+
+    def run(self):
+        self.validate_consumer_inputs()
+        for consumer in self.consumer_tasks:
+            if hasattr(consumer, 'remove_output_on_overwrite'):
+                consumer.remove_output_on_overwrite()
+
+        super(MultiplexedEventLogTask, self).run()
+
+        for consumer in self.consumer_tasks:
+            if hasattr(consumer, 'ensure_output_for_each_date'):
+                consumer.ensure_output_for_each_date()
+
+            if isinstance(consumer, MultiOutputMapReduceJobTask):
+                marker_target = consumer.output()
+            else:
+                marker_target = get_target_from_url(url_path_join(consumer.output().path, '_SUCCESS'))
+            if not marker_target.exists():
+                with marker_target.open('w'):
+                    pass
+
+    def output(self):
+        marker_url = url_path_join(self.marker, str(hash(self)))
+        return get_target_from_url(marker_url)
+
+
+class MultiplexedWarehouseEventsTask(WarehouseMixin, MultiplexedEventLogTask):
+    """
+    Compute the warehouse datasets that are derived directly from the tracking logs, from a single pass over the logs.
+
+    The user activity, enrollment event and last IP address datasets are written to the same locations in the
+    warehouse as UserActivityTableTask, ImportEnrollmentsIntoMysql and LastCountryOfUser expect them, so running this
+    task for an interval before those workflows saves each of them from reading the tracking logs again.
+    """
+
+    overwrite = luigi.BooleanParameter(
+        default=False,
+        significant=False,
+        description='Whether or not to overwrite the existing enrollment event and last IP address datasets.',
+    )
+
+    def consumers(self):
+        common_args = {
+            'source': self.source,
+            'interval': self.interval,
+            'pattern': self.pattern,
+            'date_pattern': self.date_pattern,
+            'mapreduce_engine': self.mapreduce_engine,
+            'n_reduce_tasks': self.n_reduce_tasks,
+        }
+        user_activity_table = UserActivityTableTask(warehouse_path=self.warehouse_path, **common_args)
+        yield UserActivityTask(output_root=user_activity_table.partition_location, **common_args)
+        warehouse_args = {
+            'warehouse_path': self.warehouse_path,
+            'overwrite': self.overwrite,
+            'marker': self.marker,
+        }
+        warehouse_args.update(common_args)
+        yield CourseEnrollmentEventsTask(**warehouse_args)
+        yield LastDailyIpAddressOfUserTask(**warehouse_args)
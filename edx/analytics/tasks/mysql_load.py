@@ -1,8 +1,13 @@
 """
 Support for loading data into a Mysql database.
 """
+import hashlib
 import json
 import logging
+import os
+import sys
+import threading
+from collections import defaultdict
 from itertools import chain
 
 import luigi
@@ -11,6 +16,7 @@ from luigi.contrib.mysqldb import MySqlTarget
 
 from edx.analytics.tasks.url import ExternalURL
 from edx.analytics.tasks.util.overwrite import OverwriteOutputMixin
+from edx.analytics.tasks.util.tempdir import make_temp_directory
 
 log = logging.getLogger(__name__)
 
@@ -25,6 +31,12 @@ except ImportError:
     # them, instead just fail noisily if we attempt to use these libraries.
     mysql_client_available = False
 
+PIPE_BUFFER_SIZE = 64 * 1024
+STAGING_TABLE_SUFFIX = '_staging'
+OLD_TABLE_SUFFIX = '_old'
+MAX_IDENTIFIER_LENGTH = 64
+ROW_DIGEST_COLUMN = 'row_digest'
+
 
 class MysqlInsertTaskMixin(OverwriteOutputMixin):
     """
@@ -44,6 +56,20 @@ class MysqlInsertTaskMixin(OverwriteOutputMixin):
         significant=False,
         description='The number of rows to insert at a time.',
     )
+    bulk_load = luigi.BooleanParameter(
+        default=False,
+        config_path={'section': 'database-export', 'name': 'bulk_load'},
+        significant=False,
+        description='If True, stream the rows to the database using LOAD DATA LOCAL INFILE instead of inserting them '
+        'insert_chunk_size rows at a time.  The database server must have local_infile enabled.',
+    )
+    use_staging_table = luigi.BooleanParameter(
+        default=False,
+        config_path={'section': 'database-export', 'name': 'use_staging_table'},
+        significant=False,
+        description='If True, overwrite the table by loading the rows into a new staging table, building its indexes, '
+        'and then renaming it over the table, instead of deleting and inserting the rows in a single transaction.',
+    )
 
 
 class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
@@ -54,6 +80,7 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
     required_tasks = None
     output_target = None
     allow_empty_insert = False
+    allow_staging_table = True
 
     def requires(self):
         if self.required_tasks is None:
@@ -115,7 +142,17 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
         up the table in order to create the table and insert data
         using the same transaction.
         """
+        query = self.get_create_table_query(self.table)
+        log.debug(query)
+        connection.cursor().execute(query)
+
+    def get_create_table_query(self, table, include_indexes=True):
+        """
+        Returns a query that creates a table using the types specified in columns, if it does not exist.
 
+        If include_indexes is False, only primary keys are included in the table definition, and the other indexes and
+        keys can be added once the table has been loaded, using the query returned by get_add_indexes_query().
+        """
         if len(self.columns[0]) != 2:
             # only names of columns specified, no types
             raise NotImplementedError(
@@ -131,19 +168,38 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
         columns.extend(self.default_columns)
         if self.auto_primary_key is not None:
             columns.append(("PRIMARY KEY", "({name})".format(name=self.auto_primary_key[0])))
-        for indexed_cols in self.indexes:
-            columns.append(("INDEX", "({cols})".format(cols=','.join(indexed_cols))))
-        for key in self.keys:
-            columns.append((key[0], "({cols})".format(cols=','.join(key[1]))))
+        for name, definition in self._get_index_definitions():
+            if include_indexes or name.upper().startswith('PRIMARY'):
+                columns.append((name, definition))
 
         coldefs = ','.join(
             '{name} {definition}'.format(name=name, definition=definition) for name, definition in columns
         )
-        query = "CREATE TABLE IF NOT EXISTS {table} ({coldefs})".format(
-            table=self.table, coldefs=coldefs
+        return "CREATE TABLE IF NOT EXISTS {table} ({coldefs})".format(
+            table=table, coldefs=coldefs
+        )
+
+    def get_add_indexes_query(self, table):
+        """Returns a query that adds the indexes and keys other than primary keys to a table, or None if there are none."""
+        index_definitions = [
+            'ADD {name} {definition}'.format(name=name, definition=definition)
+            for name, definition in self._get_index_definitions()
+            if not name.upper().startswith('PRIMARY')
+        ]
+        if not index_definitions:
+            return None
+        return "ALTER TABLE {table} {index_definitions}".format(
+            table=table, index_definitions=', '.join(index_definitions)
         )
-        log.debug(query)
-        connection.cursor().execute(query)
+
+    def _get_index_definitions(self):
+        """Returns a list of (name, definition) tuples defining the indexes and keys of the table."""
+        index_definitions = []
+        for indexed_cols in self.indexes:
+            index_definitions.append(("INDEX", "({cols})".format(cols=','.join(indexed_cols))))
+        for key in self.keys:
+            index_definitions.append((key[0], "({cols})".format(cols=','.join(key[1]))))
+        return index_definitions
 
     def create_database(self):
         """Create the database if it doesn't exist yet."""
@@ -173,6 +229,29 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
             for line in fobj:
                 yield line.strip('\n').split('\t')
 
+    def bulk_load_lines(self):
+        """
+        Yield each row to be inserted as a line of tab separated values, for loading with LOAD DATA.
+
+        Fields must be escaped the way LOAD DATA expects, with a backslash before any backslash, tab or newline, and
+        null values represented by \\N.  Hive does not escape its output, so by default the backslashes in the lines
+        of the insert source are escaped, and the lines are otherwise passed through unchanged.  If rows() is
+        overridden, the rows it returns are escaped and joined instead.
+        """
+        num_cols = len(self.columns)
+        if getattr(self.rows, '__func__', None) is MysqlInsertTask.rows.__func__:
+            with self.input()['insert_source'].open('r') as fobj:
+                for line in fobj:
+                    line = line.rstrip('\n')
+                    if line.count('\t') != num_cols - 1:
+                        raise_misaligned_row(line.split('\t'), self._get_column_names())
+                    yield line.replace('\\', '\\\\') + '\n'
+        else:
+            for row in self.rows():
+                if len(row) != num_cols:
+                    raise_misaligned_row(row, self._get_column_names())
+                yield '\t'.join(escape_for_mysql_load_data(elem) for elem in row) + '\n'
+
     def update_id(self):
         """This update id will be a unique identifier for this insert on this table."""
         # The hash of the task is made by hashing the task_id, which
@@ -214,19 +293,7 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
         self.attempted_removal = True
         if self.overwrite:
             # first clear the appropriate rows from the luigi mysql marker table
-            marker_table = self.output().marker_table  # side-effect: sets self.output_target if it's None
-            try:
-                query = "DELETE FROM {marker_table} where `target_table`='{target_table}'".format(
-                    marker_table=marker_table,
-                    target_table=self.table,
-                )
-                log.debug(query)
-                connection.cursor().execute(query)
-            except mysql.connector.Error as excp:  # handle the case where the marker_table has yet to be created
-                if excp.errno == errorcode.ER_NO_SUCH_TABLE:
-                    pass
-                else:
-                    raise
+            self.delete_marker_rows(connection)
 
             # Use "DELETE" instead of TRUNCATE since TRUNCATE forces an implicit commit before it executes which would
             # commit the currently open transaction before continuing with the copy.
@@ -234,7 +301,23 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
             log.debug(query)
             connection.cursor().execute(query)
 
-    def _execute_insert_query(self, cursor, value_list, column_names):
+    def delete_marker_rows(self, connection):
+        """Removes all of the rows for the table from the luigi mysql marker table."""
+        marker_table = self.output().marker_table  # side-effect: sets self.output_target if it's None
+        try:
+            query = "DELETE FROM {marker_table} where `target_table`='{target_table}'".format(
+                marker_table=marker_table,
+                target_table=self.table,
+            )
+            log.debug(query)
+            connection.cursor().execute(query)
+        except mysql.connector.Error as excp:  # handle the case where the marker_table has yet to be created
+            if excp.errno == errorcode.ER_NO_SUCH_TABLE:
+                pass
+            else:
+                raise
+
+    def _execute_insert_query(self, cursor, value_list, column_names, table=None):
         """
         Constructs and executes the insert query.
 
@@ -244,6 +327,7 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
                 corresponds to the number of rows, and each tuple should have
                 an element for each column.
             column_names - a single string holding names of columns, joined by commas.
+            table - the name of the table to insert into, if not the table of this task.
 
         Example:
 
@@ -256,53 +340,100 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
                 VALUES (%s, %s, %s), (%s, %s, %s), (%s, %s, %s)
         """
 
-        num_cols = len(self.columns)
+        num_cols = len(column_names.split(','))
         num_rows = len(value_list)
 
         # Check data squareness.  There should be no rows with missing or extra columns.
         for elem in value_list:
             if len(elem) != num_cols:
-                raise Exception("Misaligned data in mysql_load: "
-                                "row '{row}' does not match columns '{columns}'".format(
-                                    row=elem, columns=column_names
-                                ))
+                raise_misaligned_row(elem, column_names)
 
         # The "%s" placeholder is used by the mysql-connector library
         # to execute the prepared statement, it is not used with a
         # traditional python "%" operator.
         parameters = "(" + ",".join(["%s"] * num_cols) + ")"
         all_parameters = ",".join([parameters] * num_rows)
+        table = table or self.table
         query = "INSERT INTO {table} ({column_names}) VALUES {values}".format(
-            table=self.table, column_names=column_names, values=all_parameters
+            table=table, column_names=column_names, values=all_parameters
         )
         cursor.execute(query, list(chain.from_iterable(value_list)))
-        log.debug("Wrote %d rows to table %s", num_rows, self.table)
+        log.debug("Wrote %d rows to table %s", num_rows, table)
 
-    def insert_rows(self, cursor):
-        """Inserts row values from source into database table."""
+    def _get_column_names(self):
+        """Returns a list of the names of the columns."""
         if isinstance(self.columns[0], basestring):
-            column_names = ','.join([name for name in self.columns])
+            return [name for name in self.columns]
         elif len(self.columns[0]) == 2:
-            column_names = ','.join([name for name, _type in self.columns])
+            return [name for name, _type in self.columns]
         else:
             raise Exception('columns must consist of column strings or '
                             '(column string, type string) tuples (was %r ...)'
                             % (self.columns[0],))
 
+    def insert_rows(self, cursor, table=None):
+        """Inserts row values from source into database table, or into another table with the same columns."""
+        column_names = ','.join(self._get_column_names())
+
         value_list = []
         row_count = 0
         for row_count, row in enumerate(self.rows(), start=1):
             entry = tuple([coerce_for_mysql_connect(elem) for elem in row])
             value_list.append(entry)
             if row_count % self.insert_chunk_size == 0:
-                self._execute_insert_query(cursor, value_list, column_names)
+                self._execute_insert_query(cursor, value_list, column_names, table)
                 value_list = []
 
         if self.overwrite and not self.allow_empty_insert and row_count == 0:
             raise Exception('Cannot overwrite a table with an empty result set.')
 
         if len(value_list) > 0:
-            self._execute_insert_query(cursor, value_list, column_names)
+            self._execute_insert_query(cursor, value_list, column_names, table)
+
+    def bulk_insert_rows(self, cursor, table=None):
+        """
+        Loads the lines from bulk_load_lines() into the database table, or into another table with the same columns,
+        with a single LOAD DATA LOCAL INFILE query.
+
+        The lines are written to a named pipe by a separate thread while the client library reads it and sends the data
+        to the server, so the data is never stored in a file or held in memory.  Like the values that are inserted by
+        insert_rows(), fields that contain exactly \\N, None, inf or -inf are loaded as NULL.  The fields are compared
+        as binary strings, since the default collation would also match other cases, such as none or INF.
+        """
+        table = table or self.table
+        column_names = self._get_column_names()
+        with make_temp_directory(prefix='mysql_load') as temp_dir:
+            pipe_path = os.path.join(temp_dir, table + '.tsv')
+            os.mkfifo(pipe_path)
+            writer = BulkLoadWriter(pipe_path, self.bulk_load_lines())
+
+            variables = ['@' + name for name in column_names]
+            assignments = [
+                "{name} = IF(BINARY {variable} IN ('\\\\N', 'None', 'inf', '-inf'), NULL, {variable})".format(
+                    name=name, variable=variable
+                )
+                for name, variable in zip(column_names, variables)
+            ]
+            query = (
+                "LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table} CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                "({variables}) SET {assignments}"
+            ).format(
+                path=pipe_path,
+                table=table,
+                variables=','.join(variables),
+                assignments=', '.join(assignments),
+            )
+            log.debug(query)
+            try:
+                cursor.execute(query)
+            finally:
+                writer.close()
+            row_count = writer.get_row_count()
+
+        log.debug("Loaded %d rows into table %s", row_count, table)
+        if self.overwrite and not self.allow_empty_insert and row_count == 0:
+            raise Exception('Cannot overwrite a table with an empty result set.')
 
     def run(self):
         """
@@ -318,7 +449,7 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
         # create databases using a separate connection which is not database specific
         self.create_database()
 
-        connection = self.output().connect()
+        connection = self.output().connect(allow_local_infile=self.bulk_load)
         try:
             # create table only if necessary:
             self.create_table(connection)
@@ -327,9 +458,12 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
             # table with impunity from other sessions.
             connection.cursor().execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
 
+            if self.overwrite and self.use_staging_table and self.allow_staging_table:
+                self.swap_staging_table(connection)
+                return
+
             self.init_copy(connection)
-            cursor = connection.cursor()
-            self.insert_rows(cursor)
+            self.load_rows(connection.cursor())
 
             # mark as complete in same transaction
             self.output().touch(connection)
@@ -342,6 +476,89 @@ class MysqlInsertTask(MysqlInsertTaskMixin, luigi.Task):
         finally:
             connection.close()
 
+    def load_rows(self, cursor):
+        """Loads the rows into the table, in the transaction that marks the task as complete."""
+        if self.bulk_load:
+            self.bulk_insert_rows(cursor)
+        else:
+            self.insert_rows(cursor)
+
+    def swap_table_name(self, suffix):
+        """
+        Returns the name of a table that this task uses while swapping in the new rows.
+
+        The name ends with the suffix and a hash of the update id, so that tasks loading the same table at the same time
+        do not use, or drop, each other's tables.  The table name is shortened if needed to stay within MySQL's limit on
+        the length of identifiers.
+        """
+        suffix = '{suffix}_{update_hash}'.format(suffix=suffix, update_hash=hashlib.md5(self.update_id()).hexdigest()[:16])
+        return self.table[:MAX_IDENTIFIER_LENGTH - len(suffix)] + suffix
+
+    def swap_staging_table(self, connection):
+        """
+        Loads the rows into a new staging table, which then atomically replaces the table using RENAME TABLE.
+
+        The indexes of the staging table are built after it has been loaded, and readers of the table see all of the
+        old rows until the rename, instead of waiting on the locks held while all of the rows are deleted and inserted.
+
+        MySQL commits implicitly before the RENAME, so the marker table is updated in the transaction that immediately
+        follows it.  If that fails the new rows are in place but the task is incomplete, and running it again reloads
+        them.
+        """
+        # Like init_copy(), this replaces the output, so the task can be complete once it has run.
+        self.attempted_removal = True
+
+        staging_table = self.swap_table_name(STAGING_TABLE_SUFFIX)
+        old_table = self.swap_table_name(OLD_TABLE_SUFFIX)
+        cursor = connection.cursor()
+
+        query = "DROP TABLE IF EXISTS {staging_table}, {old_table}".format(
+            staging_table=staging_table, old_table=old_table
+        )
+        log.debug(query)
+        cursor.execute(query)
+
+        if len(self.columns[0]) == 2:
+            query = self.get_create_table_query(staging_table, include_indexes=False)
+            add_indexes_query = self.get_add_indexes_query(staging_table)
+        else:
+            # Without column types the table definition has to be copied, and rows are loaded with the indexes in place.
+            query = "CREATE TABLE {staging_table} LIKE {table}".format(staging_table=staging_table, table=self.table)
+            add_indexes_query = None
+        log.debug(query)
+        cursor.execute(query)
+
+        try:
+            if self.bulk_load:
+                self.bulk_insert_rows(cursor, staging_table)
+            else:
+                self.insert_rows(cursor, staging_table)
+            connection.commit()
+
+            if add_indexes_query is not None:
+                log.debug(add_indexes_query)
+                cursor.execute(add_indexes_query)
+
+            query = "RENAME TABLE {table} TO {old_table}, {staging_table} TO {table}".format(
+                table=self.table, old_table=old_table, staging_table=staging_table
+            )
+            log.debug(query)
+            cursor.execute(query)
+        except:
+            connection.rollback()
+            query = "DROP TABLE IF EXISTS {staging_table}".format(staging_table=staging_table)
+            log.debug(query)
+            connection.cursor().execute(query)
+            raise
+
+        self.delete_marker_rows(connection)
+        self.output().touch(connection)
+        connection.commit()
+
+        query = "DROP TABLE {old_table}".format(old_table=old_table)
+        log.debug(query)
+        cursor.execute(query)
+
     def check_mysql_availability(self):
         if not mysql_client_available:
             raise ImportError('mysql client library not available')
@@ -366,6 +583,88 @@ def coerce_for_mysql_connect(input):
     return input
 
 
+def escape_for_mysql_load_data(input):
+    """Given an input which could be any python type, convert it to a field in the format expected by LOAD DATA."""
+    input = coerce_for_mysql_connect(input)
+    if input is None:
+        return '\\N'
+    if isinstance(input, unicode):
+        input = input.encode('utf-8')
+    else:
+        input = str(input)
+    return input.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def get_row_digest(values):
+    """Returns a hex digest of the values of a row, which should already have been coerced for mysql-connect."""
+    return hashlib.md5('\t'.join(escape_for_mysql_load_data(value) for value in values)).hexdigest()
+
+
+def raise_misaligned_row(row, column_names):
+    """Raise an exception for a row that has missing or extra columns."""
+    raise Exception("Misaligned data in mysql_load: "
+                    "row '{row}' does not match columns '{columns}'".format(
+                        row=row, columns=column_names
+                    ))
+
+
+class BulkLoadWriter(object):
+    """
+    Writes lines to a named pipe from a separate thread, while the pipe is read by LOAD DATA LOCAL INFILE.
+
+    Opening a pipe for writing blocks until it is opened for reading, and writing to it blocks while it is full, so if
+    the database stops reading the pipe, or never opens it because the query failed, close() reads it instead until the
+    thread notices that it has been stopped.
+    """
+
+    def __init__(self, pipe_path, lines):
+        self.pipe_path = pipe_path
+        self.lines = lines
+        self.row_count = 0
+        self.error = None
+        self.stopped = False
+        self.thread = threading.Thread(target=self._write_lines)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _write_lines(self):
+        """Writes all of the lines to the pipe."""
+        try:
+            with open(self.pipe_path, 'wb') as pipe_file:
+                for line in self.lines:
+                    if self.stopped:
+                        break
+                    pipe_file.write(line)
+                    self.row_count += 1
+        except Exception:  # pylint: disable=broad-except
+            self.error = sys.exc_info()
+
+    def close(self):
+        """Stops the thread, if it is still writing, and waits for it to finish."""
+        self.stopped = True
+        while self.thread.is_alive():
+            try:
+                pipe_fd = os.open(self.pipe_path, os.O_RDONLY | os.O_NONBLOCK)
+            except OSError:
+                pass
+            else:
+                try:
+                    while os.read(pipe_fd, PIPE_BUFFER_SIZE):
+                        pass
+                except OSError:
+                    # Nothing left to read until the thread writes again.
+                    pass
+                finally:
+                    os.close(pipe_fd)
+            self.thread.join(0.01)
+
+    def get_row_count(self):
+        """Returns the number of lines written, or raises the error that stopped the lines from being written."""
+        if self.error is not None:
+            raise self.error[0], self.error[1], self.error[2]
+        return self.row_count
+
+
 class CredentialFileMysqlTarget(MySqlTarget):
     """
     Represents a table in MySQL, is complete when the update_id is the same as a previous successful execution.
@@ -393,6 +692,20 @@ class CredentialFileMysqlTarget(MySqlTarget):
                 update_id=update_id
             )
 
+    def connect(self, autocommit=False, allow_local_infile=False):
+        if not allow_local_infile:
+            return super(CredentialFileMysqlTarget, self).connect(autocommit=autocommit)
+
+        return mysql.connector.connect(
+            user=self.user,
+            password=self.password,
+            host=self.host,
+            port=self.port,
+            database=self.database,
+            autocommit=autocommit,
+            allow_local_infile=True,
+        )
+
     def exists(self, connection=None):
         # The parent class fails if the database does not exist. This override tolerates that error.
         try:
@@ -441,6 +754,37 @@ class IncrementalMysqlInsertTask(MysqlInsertTask):
     construct a where clause that selects all of the rows generated by this task.
     """
 
+    diff_load = luigi.BooleanParameter(
+        default=False,
+        config_path={'section': 'database-export', 'name': 'diff_load'},
+        significant=False,
+        description='If True, compare a digest of each row with the digests stored in the table, and only insert the '
+        'rows that are new and delete the rows that are gone, instead of deleting all of the rows that match '
+        'record_filter and inserting them again.  Takes precedence over bulk_load.',
+    )
+
+    # Only part of the table is overwritten, so it can't be replaced by a staging table.
+    allow_staging_table = False
+
+    def create_table(self, connection):
+        super(IncrementalMysqlInsertTask, self).create_table(connection)
+        if self.diff_load:
+            self.add_row_digest_column(connection)
+
+    def add_row_digest_column(self, connection):
+        """Adds the column that stores the digest of each row to the table, if it does not already have one."""
+        cursor = connection.cursor()
+        query = "SHOW COLUMNS FROM {table} LIKE '{column}'".format(table=self.table, column=ROW_DIGEST_COLUMN)
+        log.debug(query)
+        cursor.execute(query)
+        if cursor.fetchall():
+            return
+
+        # Rows that are already in the table have no digest, so they are replaced the next time they are overwritten.
+        query = "ALTER TABLE {table} ADD COLUMN {column} CHAR(32)".format(table=self.table, column=ROW_DIGEST_COLUMN)
+        log.debug(query)
+        cursor.execute(query)
+
     def init_copy(self, connection):
         # clear only the data for this date!
 
@@ -462,6 +806,10 @@ class IncrementalMysqlInsertTask(MysqlInsertTask):
                 else:
                     raise
 
+            if self.diff_load:
+                # Only the rows that have changed are deleted, by merge_rows().
+                return
+
             # Use "DELETE" instead of TRUNCATE since TRUNCATE forces an implicit commit before it executes which would
             # commit the currently open transaction before continuing with the copy.
             query = "DELETE FROM {table} WHERE {record_filter}".format(
@@ -471,6 +819,84 @@ class IncrementalMysqlInsertTask(MysqlInsertTask):
             log.debug(query)
             connection.cursor().execute(query)
 
+    def load_rows(self, cursor):
+        if self.diff_load:
+            self.merge_rows(cursor)
+        else:
+            super(IncrementalMysqlInsertTask, self).load_rows(cursor)
+
+    def merge_rows(self, cursor):
+        """
+        Inserts the rows that are not already in the table, and deletes the rows that match record_filter but are no
+        longer in the result set, leaving the rest of the rows untouched.
+
+        Rows are matched using a digest of their values that is stored with them in the row_digest column, so a row
+        that has changed is deleted and inserted again.  The deletes are executed after all of the rows have been read,
+        so the table should not have any unique keys other than its primary key.
+        """
+        if self.auto_primary_key is None:
+            raise Exception('diff_load requires an auto_primary_key to identify the rows to delete.')
+
+        existing_row_ids = self.get_existing_row_ids(cursor) if self.overwrite else {}
+
+        column_names = ','.join(self._get_column_names() + [ROW_DIGEST_COLUMN])
+        num_cols = len(self.columns)
+        value_list = []
+        row_count = 0
+        unchanged_count = 0
+        for row_count, row in enumerate(self.rows(), start=1):
+            if len(row) != num_cols:
+                raise_misaligned_row(row, self._get_column_names())
+            entry = [coerce_for_mysql_connect(elem) for elem in row]
+            digest = get_row_digest(entry)
+            row_ids = existing_row_ids.get(digest)
+            if row_ids:
+                row_ids.pop(0)
+                unchanged_count += 1
+                continue
+
+            value_list.append(tuple(entry + [digest]))
+            if len(value_list) == self.insert_chunk_size:
+                self._execute_insert_query(cursor, value_list, column_names)
+                value_list = []
+
+        if self.overwrite and not self.allow_empty_insert and row_count == 0:
+            raise Exception('Cannot overwrite a table with an empty result set.')
+
+        if len(value_list) > 0:
+            self._execute_insert_query(cursor, value_list, column_names)
+
+        deleted_row_ids = [row_id for row_ids in existing_row_ids.itervalues() for row_id in row_ids]
+        for start in xrange(0, len(deleted_row_ids), self.insert_chunk_size):
+            chunk = deleted_row_ids[start:start + self.insert_chunk_size]
+            query = "DELETE FROM {table} WHERE {id_column} IN ({values})".format(
+                table=self.table,
+                id_column=self.auto_primary_key[0],
+                values=','.join(['%s'] * len(chunk)),
+            )
+            cursor.execute(query, chunk)
+
+        log.info(
+            "Inserted %d rows, deleted %d rows and left %d rows unchanged in table %s",
+            row_count - unchanged_count, len(deleted_row_ids), unchanged_count, self.table
+        )
+
+    def get_existing_row_ids(self, cursor):
+        """Returns a dict mapping the digest of each row that matches record_filter to a list of the ids of those rows."""
+        query = "SELECT {id_column}, {digest_column} FROM {table} WHERE {record_filter}".format(
+            id_column=self.auto_primary_key[0],
+            digest_column=ROW_DIGEST_COLUMN,
+            table=self.table,
+            record_filter=self.record_filter,
+        )
+        log.debug(query)
+        cursor.execute(query)
+
+        existing_row_ids = defaultdict(list)
+        for row_id, digest in cursor.fetchall():
+            existing_row_ids[digest].append(row_id)
+        return existing_row_ids
+
     @property
     def record_filter(self):
         """
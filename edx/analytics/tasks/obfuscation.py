@@ -73,6 +73,7 @@ class ObfuscatedCourseTask(ObfuscatedCourseTaskMixin, luigi.Task):
             log_context=self.log_context,
             auth_user_path=self.auth_user_path,
             auth_userprofile_path=self.auth_userprofile_path,
+            user_info_index_path=self.user_info_index_path,
         )
         yield ObfuscateCourseEventsTask(
             dump_root=self.dump_root,
@@ -82,6 +83,7 @@ class ObfuscatedCourseTask(ObfuscatedCourseTaskMixin, luigi.Task):
             log_context=self.log_context,
             auth_user_path=self.auth_user_path,
             auth_userprofile_path=self.auth_userprofile_path,
+            user_info_index_path=self.user_info_index_path,
             n_reduce_tasks=self.n_reduce_tasks,
         )
 
@@ -156,7 +158,7 @@ class ObfuscatedPackageTask(ObfuscatedPackageTaskMixin, luigi.Task):
 
             with self.output().open('w') as output_file:
                 with make_encrypted_file(
-                    output_file, key_file_targets, progress=report_encrypt_progress, dir=self.temporary_dir
+                    output_file, key_file_targets, progress=report_encrypt_progress, dir=self.temporary_dir, streaming=True
                 ) as encrypted_output_file:
                     with tarfile.open(mode='w:gz', fileobj=encrypted_output_file) as output_archive_file:
                         output_archive_file.add(tmp_directory, arcname='')
@@ -183,6 +185,7 @@ class MultiCourseObfuscatedCourseTask(ObfuscatedCourseTaskMixin, luigi.WrapperTa
                 log_context=self.log_context,
                 auth_user_path=self.auth_user_path,
                 auth_userprofile_path=self.auth_userprofile_path,
+                user_info_index_path=self.user_info_index_path,
             )
 
 
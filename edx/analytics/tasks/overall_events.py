@@ -4,14 +4,14 @@ import logging
 
 import luigi
 
-from edx.analytics.tasks.mapreduce import MapReduceJobTask
+from edx.analytics.tasks.mapreduce import MapReduceJobTask, SummingJobTaskMixin
 from edx.analytics.tasks.pathutil import EventLogSelectionMixin
 from edx.analytics.tasks.url import get_target_from_url
 
 log = logging.getLogger(__name__)
 
 
-class TotalEventsDailyTask(EventLogSelectionMixin, MapReduceJobTask):
+class TotalEventsDailyTask(SummingJobTaskMixin, EventLogSelectionMixin, MapReduceJobTask):
     """Produce a dataset for total events within a given time period."""
 
     output_root = luigi.Parameter()
@@ -29,8 +29,5 @@ class TotalEventsDailyTask(EventLogSelectionMixin, MapReduceJobTask):
         count = sum(values)
         yield key, count
 
-    # Take advantage of a combiner to optimize network hops
-    combiner = reducer
-
     def output(self):
         return get_target_from_url(self.output_root)
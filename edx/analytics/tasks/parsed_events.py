@@ -0,0 +1,215 @@
+"""
+Store tracking log events in a pre-parsed, date partitioned format.
+
+Parsing raw tracking logs is expensive: every line has to be decompressed and fully decoded as JSON, even when a job
+only needs a handful of fields. ParsedEventsTask converts each day of raw events into a tab separated file with the
+commonly used top level fields pre-extracted. Jobs that opt into ParsedEventSelectionMixin read these files instead of
+the raw logs and only decode the parts of each event that they actually use.
+"""
+import logging
+import re
+
+import luigi
+
+from edx.analytics.tasks.mapreduce import MultiOutputMapReduceJobTask
+from edx.analytics.tasks.pathutil import EventLogSelectionMixin
+from edx.analytics.tasks.url import get_target_from_url, url_path_join, UncheckedExternalURL
+from edx.analytics.tasks.util import eventlog
+from edx.analytics.tasks.util.hive import WarehouseMixin
+from edx.analytics.tasks.util.overwrite import OverwriteOutputMixin
+from edx.analytics.tasks.util.record import DEFAULT_NULL_VALUE
+
+log = logging.getLogger(__name__)
+
+# Top level fields whose string values are stored as plain text columns.
+STRING_FIELDS = ('time', 'event_type', 'event_source', 'username')
+# Top level fields whose values are stored as JSON encoded columns.
+JSON_FIELDS = ('context', 'event')
+# All other top level fields are stored together as a single JSON encoded object in the last column.
+NUM_COLUMNS = len(STRING_FIELDS) + len(JSON_FIELDS) + 1
+
+ESCAPED_CHARACTERS = {
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+}
+UNESCAPED_CHARACTERS = {v[1]: k for k, v in ESCAPED_CHARACTERS.iteritems()}
+PATTERN_ESCAPE = re.compile(r'[\\\t\n\r]')
+PATTERN_UNESCAPE = re.compile(r'\\(.)')
+
+
+def escape_column(value):
+    """Escape characters that would break the TSV structure of the file."""
+    if PATTERN_ESCAPE.search(value):
+        return PATTERN_ESCAPE.sub(lambda match: ESCAPED_CHARACTERS[match.group(0)], value)
+    return value
+
+
+def unescape_column(value):
+    """Reverse the transformation applied by `escape_column`."""
+    if '\\' in value:
+        return PATTERN_UNESCAPE.sub(lambda match: UNESCAPED_CHARACTERS.get(match.group(1), match.group(1)), value)
+    return value
+
+
+def encode_parsed_event(event):
+    """
+    Convert a parsed event into a tuple of UTF-8 encoded strings.
+
+    Arguments:
+        event (dict): An event as returned by `eventlog.parse_json_event`.
+
+    Returns: A tuple of strings with one element for each column of the parsed event file.
+    """
+    remaining = dict(event)
+    columns = []
+    for field_name in STRING_FIELDS:
+        value = remaining.get(field_name)
+        if isinstance(value, basestring):
+            del remaining[field_name]
+            if isinstance(value, unicode):
+                value = value.encode('utf8')
+            columns.append(escape_column(value))
+        else:
+            # Missing and non-string values are preserved in the catch-all column.
+            columns.append(DEFAULT_NULL_VALUE)
+
+    for field_name in JSON_FIELDS:
+        if field_name in remaining:
+            columns.append(eventlog.encode_json(remaining.pop(field_name)))
+        else:
+            columns.append(DEFAULT_NULL_VALUE)
+
+    columns.append(eventlog.encode_json(remaining))
+    return tuple(columns)
+
+
+def decode_parsed_event(line, fields=None):
+    """
+    Reconstruct an event from a line of a parsed event file.
+
+    Arguments:
+        line (str): A tab separated line generated from the output of `encode_parsed_event`.
+        fields (iterable): The names of the top level fields that are needed. Columns that don't contain any of these
+            fields are not decoded. By default all fields are decoded and the result is equivalent to the dict
+            originally returned by `eventlog.parse_json_event`.
+
+    Returns: The event as a dict or None if the line is malformed.
+    """
+    columns = line.split('\t')
+    if len(columns) != NUM_COLUMNS:
+        return None
+
+    event = {}
+    if fields is None or any(field_name not in STRING_FIELDS and field_name not in JSON_FIELDS for field_name in fields):
+        try:
+            event.update(eventlog.decode_json(columns[-1]))
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+    for index, field_name in enumerate(STRING_FIELDS):
+        value = columns[index]
+        if value != DEFAULT_NULL_VALUE:
+            event[field_name] = unescape_column(value).decode('utf8')
+
+    for index, field_name in enumerate(JSON_FIELDS, start=len(STRING_FIELDS)):
+        value = columns[index]
+        if value != DEFAULT_NULL_VALUE and (fields is None or field_name in fields):
+            try:
+                event[field_name] = eventlog.decode_json(value)
+            except Exception:  # pylint: disable=broad-except
+                return None
+
+    return event
+
+
+class ParsedEventsTask(OverwriteOutputMixin, WarehouseMixin, EventLogSelectionMixin, MultiOutputMapReduceJobTask):
+    """
+    Parse the raw tracking logs for an interval and store the events in one file per day.
+
+    The output is stored in the warehouse using the same layout as a Hive table partitioned by date. The task is
+    considered complete if a file exists for every date in the interval, so that later jobs covering dates that were
+    already processed, for example backfills, can skip parsing the raw logs entirely.
+    """
+
+    # FILEPATH_PATTERN should match the output files defined by output_path_for_key().
+    FILEPATH_PATTERN = '.*?parsed_events_(?P<date>\\d{4}-\\d{2}-\\d{2})'
+
+    # We use warehouse_path to generate the output path, so we make this a non-param.
+    output_root = None
+
+    def mapper(self, line):
+        value = self.get_event_and_date_string(line)
+        if value is None:
+            return
+        event, date_string = value
+
+        yield date_string, encode_parsed_event(event)
+
+    def multi_output_reducer(self, _date_string, values, output_file):
+        for value in values:
+            output_file.write('\t'.join(value))
+            output_file.write('\n')
+
+    def output_path_for_key(self, key):
+        date_string = key
+        return url_path_join(
+            self.hive_partition_path('parsed_events', date_string),
+            'parsed_events_{date}'.format(
+                date=date_string,
+            ),
+        )
+
+    def downstream_input_tasks(self):
+        """Returns the external tasks which can be used as input in other jobs, one for each date in the interval."""
+        return [UncheckedExternalURL(self.output_path_for_key(date.isoformat())) for date in self.interval]
+
+    def complete(self):
+        if self.overwrite and not self.attempted_removal:
+            return False
+        return all(task.output().exists() for task in self.downstream_input_tasks())
+
+    def run(self):
+        self.remove_output_on_overwrite()
+        super(ParsedEventsTask, self).run()
+
+        # This makes sure that a output file exists for each date in the interval
+        # as downstream tasks require that they exist.
+        for date in self.interval:
+            url = self.output_path_for_key(date.isoformat())
+            target = get_target_from_url(url)
+            if not target.exists():
+                target.open("w").close()  # touch the file
+
+
+class ParsedEventSelectionMixin(WarehouseMixin, EventLogSelectionMixin):
+    """
+    A drop-in replacement for EventLogSelectionMixin that reads pre-parsed events instead of raw tracking logs.
+
+    Tasks can set `parsed_event_fields` to the list of top level event fields their mapper uses, in which case the
+    remaining JSON encoded columns are not decoded at all.
+    """
+
+    parsed_event_fields = None
+
+    def requires(self):
+        return self.requires_local()
+
+    def requires_local(self):
+        return ParsedEventsTask(
+            source=self.source,
+            interval=self.interval,
+            expand_interval=self.expand_interval,
+            pattern=self.pattern,
+            date_pattern=self.date_pattern,
+            warehouse_path=self.warehouse_path,
+            n_reduce_tasks=self.n_reduce_tasks,
+        )
+
+    def requires_hadoop(self):
+        # ParsedEventsTask returns the marker as output, so explicitly pass the parsed files to the hadoop job.
+        return self.requires_local().downstream_input_tasks()
+
+    def parse_event(self, line):
+        return decode_parsed_event(line, self.parsed_event_fields)
@@ -9,9 +9,12 @@ Supports outputs to HDFS, S3, and local FS.
 import boto
 import datetime
 import fnmatch
+import hashlib
 import logging
+from multiprocessing.pool import ThreadPool
 import os
 import re
+import threading
 
 import luigi
 import luigi.hdfs
@@ -20,15 +23,52 @@ import luigi.task
 
 from luigi.date_interval import DateInterval
 
-from edx.analytics.tasks.s3_util import generate_s3_sources, get_s3_bucket_key_names
+from edx.analytics.tasks.s3_util import generate_s3_sources, get_s3_bucket_key_names, get_s3_key, list_s3_keys
 from edx.analytics.tasks.url import ExternalURL, UncheckedExternalURL, url_path_join, get_target_from_url
 from edx.analytics.tasks.util import eventlog
+from edx.analytics.tasks.util.event_log_index import EventLogIndex, get_index_url, is_index_url
+from edx.analytics.tasks.util.listing_cache import ListingCache
 
 
 log = logging.getLogger(__name__)
 
+# boto connections must not be shared by threads, so each thread that reads indexes from S3 opens its own.
+INDEX_CONNECTIONS = threading.local()
 
-class PathSetTask(luigi.Task):
+
+class SourceListingMixin(object):
+    """
+    Lists the contents of S3 and local sources, using a cache of their listings if one is configured.
+
+    Luigi orders parameters by when they were created, so the tasks that use this mixin declare the listing_threads and
+    listing_cache_root parameters themselves, after their other parameters, to keep their positional order.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SourceListingMixin, self).__init__(*args, **kwargs)
+        self.s3_conn = None
+        self.listing_cache = None
+        if self.listing_cache_root is not None:
+            self.listing_cache = ListingCache(self.listing_cache_root, self.listing_threads)
+
+    def get_s3_connection(self):
+        """Returns the connection used to list S3 sources, connecting lazily the first time it is needed."""
+        if self.s3_conn is None:
+            self.s3_conn = boto.connect_s3()
+        return self.s3_conn
+
+    def list_s3_keys(self, bucket_name, prefix):
+        """Yields the keys in a bucket whose names start with the prefix, using the listing cache if there is one."""
+        if self.listing_cache is not None:
+            return self.listing_cache.list_s3_keys(self.get_s3_connection(), bucket_name, prefix)
+        return list_s3_keys(self.get_s3_connection(), bucket_name, prefix, self.listing_threads)
+
+    def iter_local_files(self, source):
+        """Yields the path of each file inside the source directory, using the listing cache if there is one."""
+        return iter_local_files(source, self.listing_cache)
+
+
+class PathSetTask(SourceListingMixin, luigi.Task):
     """
     A task to select a subset of files in an S3 bucket or local FS.
 
@@ -51,19 +91,31 @@ class PathSetTask(luigi.Task):
         default=False,
         description='If True, include files/directories with size zero.',
     )
+    listing_threads = luigi.IntParameter(
+        config_path={'section': 'event-logs', 'name': 'listing_threads'},
+        default=8,
+        significant=False,
+        description='The number of threads used to list the contents of each S3 source.',
+    )
+    listing_cache_root = luigi.Parameter(
+        config_path={'section': 'event-logs', 'name': 'listing_cache_root'},
+        default=None,
+        significant=False,
+        description='A URL to a directory in which the listings of S3 and local sources are stored, so that only '
+        'the files that were added since the last listing need to be found when a source is listed again.',
+    )
 
     def __init__(self, *args, **kwargs):
         super(PathSetTask, self).__init__(*args, **kwargs)
-        self.s3_conn = None
+        self.requirements = None
 
     def generate_file_list(self):
         """Yield each individual path given a source folder and a set of file-matching expressions."""
         for src in self.src:
             if src.startswith('s3'):
-                # connect lazily as needed:
-                if self.s3_conn is None:
-                    self.s3_conn = boto.connect_s3()
-                for _bucket, _root, path in generate_s3_sources(self.s3_conn, src, self.include, self.include_zero_length):
+                for _bucket, _root, path in generate_s3_sources(
+                        self.get_s3_connection(), src, self.include, self.include_zero_length, self.listing_threads,
+                        self.listing_cache):
                     source = url_path_join(src, path)
                     yield ExternalURL(source)
             elif src.startswith('hdfs'):
@@ -75,12 +127,10 @@ class PathSetTask(luigi.Task):
             else:
                 # Apply the include patterns to the relative path below the src directory.
                 # TODO: implement exclude_zero_length to match S3 case.
-                for dirpath, _dirnames, files in os.walk(src):
-                    for filename in files:
-                        filepath = os.path.join(dirpath, filename)
-                        relpath = os.path.relpath(filepath, src)
-                        if any(fnmatch.fnmatch(relpath, include_val) for include_val in self.include):
-                            yield ExternalURL(filepath)
+                for filepath in self.iter_local_files(src):
+                    relpath = os.path.relpath(filepath, src)
+                    if any(fnmatch.fnmatch(relpath, include_val) for include_val in self.include):
+                        yield ExternalURL(filepath)
 
     def manifest_file_list(self):
         """Write each individual path to a manifest file and yield the path to that file."""
@@ -93,10 +143,13 @@ class PathSetTask(luigi.Task):
         yield ExternalURL(self.manifest)
 
     def requires(self):
-        if self.manifest is not None:
-            return self.manifest_file_list()
-        else:
-            return self.generate_file_list()
+        # This method gets called several times. Avoid listing the sources each time by saving the first result.
+        if self.requirements is None:
+            if self.manifest is not None:
+                self.requirements = list(self.manifest_file_list())
+            else:
+                self.requirements = list(self.generate_file_list())
+        return self.requirements
 
     def complete(self):
         # An optimization: just declare that the task is always
@@ -109,6 +162,17 @@ class PathSetTask(luigi.Task):
         return [task.output() for task in self.requires()]
 
 
+def iter_local_files(source, listing_cache=None):
+    """Yields the path of each file inside the source directory on the local filesystem, recursively."""
+    if listing_cache is not None:
+        for listed_file in listing_cache.list_local_files(source):
+            yield listed_file.key
+    else:
+        for directory_path, _subdir_paths, filenames in os.walk(source):
+            for filename in filenames:
+                yield os.path.join(directory_path, filename)
+
+
 class EventLogSelectionDownstreamMixin(object):
     """Defines parameters for passing upstream to tasks that use EventLogSelectionMixin."""
 
@@ -141,7 +205,7 @@ class EventLogSelectionDownstreamMixin(object):
     )
 
 
-class PathSelectionByDateIntervalTask(EventLogSelectionDownstreamMixin, luigi.WrapperTask):
+class PathSelectionByDateIntervalTask(EventLogSelectionDownstreamMixin, SourceListingMixin, luigi.WrapperTask):
     """
     Select all relevant event log input files from a directory.
 
@@ -149,10 +213,46 @@ class PathSelectionByDateIntervalTask(EventLogSelectionDownstreamMixin, luigi.Wr
     that a pattern can be used to find them. Filenames are expected to contain a date which represents an approximation
     of the date found in the events themselves.
 
+    Files that have an index (see IndexEventLogsTask) are only selected if the index shows that they contain events
+    within the requested interval, and of one of the requested `event_types` if any are specified.
+
+    If `selection_cache_root` is specified, the list of selected files is stored in a manifest file in that directory,
+    and the manifest is used instead of listing the sources again when a task with the same source, pattern, interval
+    etc. is scheduled later. Only selections that end before the current date are stored, since files may still be
+    added for recent dates.
+
     """
 
+    event_types = luigi.Parameter(
+        is_list=True,
+        default=(),
+        description='A list of event types of interest. Indexed files that contain no events of these types are not '
+        'selected. By default all event types are of interest.',
+    )
+    listing_threads = luigi.IntParameter(
+        config_path={'section': 'event-logs', 'name': 'listing_threads'},
+        default=8,
+        significant=False,
+        description='The number of threads used to list the contents of each S3 source.',
+    )
+    listing_cache_root = luigi.Parameter(
+        config_path={'section': 'event-logs', 'name': 'listing_cache_root'},
+        default=None,
+        significant=False,
+        description='A URL to a directory in which the listings of S3 and local sources are stored, so that only '
+        'the files that were added since the last listing need to be found when a source is listed again.',
+    )
+    selection_cache_root = luigi.Parameter(
+        config_path={'section': 'event-logs', 'name': 'selection_cache_root'},
+        default=None,
+        significant=False,
+        description='A URL to a directory in which the lists of selected files are cached.',
+    )
+
     def __init__(self, *args, **kwargs):
         super(PathSelectionByDateIntervalTask, self).__init__(*args, **kwargs)
+        self.event_date_a = self.interval.date_a.isoformat()
+        self.event_date_b = self.interval.date_b.isoformat()
         self.interval = DateInterval(
             self.interval.date_a - self.expand_interval,
             self.interval.date_b + self.expand_interval
@@ -162,12 +262,30 @@ class PathSelectionByDateIntervalTask(EventLogSelectionDownstreamMixin, luigi.Wr
     def requires(self):
         # This method gets called several times. Avoid making multiple round trips to S3 by caching the first result.
         if self.requirements is None:
-            log.debug('No saved requirements found, refreshing requirements list.')
-            self.requirements = self._get_requirements()
+            cache_target = self.get_selection_cache_target()
+            if cache_target is not None and cache_target.exists():
+                log.debug('Reading requirements list from %s.', cache_target.path)
+                with cache_target.open('r') as cache_file:
+                    self.requirements = [UncheckedExternalURL(line.rstrip('\n')) for line in cache_file]
+            else:
+                log.debug('No saved requirements found, refreshing requirements list.')
+                self.requirements = self._get_requirements()
+                if cache_target is not None:
+                    with cache_target.open('w') as cache_file:
+                        for task in self.requirements:
+                            cache_file.write(task.url + '\n')
         else:
             log.debug('Using cached requirements.')
         return self.requirements
 
+    def get_selection_cache_target(self):
+        """Returns the target used to cache the list of selected files, or None if it should not be cached."""
+        if self.selection_cache_root is None or self.interval.date_b >= datetime.date.today():
+            return None
+        # The task ID contains the values of all of the significant parameters.
+        cache_key = hashlib.md5(self.task_id).hexdigest()
+        return get_target_from_url(url_path_join(self.selection_cache_root, cache_key + '.manifest'))
+
     def _get_requirements(self):
         """
         Gather the set of requirements needed to run the task.
@@ -189,14 +307,19 @@ class PathSelectionByDateIntervalTask(EventLogSelectionDownstreamMixin, luigi.Wr
             'Date interval: %s <= date < %s', self.interval.date_a.isoformat(), self.interval.date_b.isoformat()
         )
 
-        return [UncheckedExternalURL(url) for url_gen in url_gens for url in url_gen if self.should_include_url(url)]
+        urls = [url for url_gen in url_gens for url in url_gen]
+        index_urls = set(url for url in urls if is_index_url(url))
+
+        selected_urls = [url for url in urls if self.should_include_url(url)]
+        excluded_urls = self.get_excluded_indexed_urls(
+            [url for url in selected_urls if get_index_url(url) in index_urls]
+        )
+        return [UncheckedExternalURL(url) for url in selected_urls if url not in excluded_urls]
 
     def _get_s3_urls(self, source):
         """Recursively list all files inside the source URL directory."""
-        s3_conn = boto.connect_s3()
         bucket_name, root = get_s3_bucket_key_names(source)
-        bucket = s3_conn.get_bucket(bucket_name)
-        for key_metadata in bucket.list(root):
+        for key_metadata in self.list_s3_keys(bucket_name, root):
             if key_metadata.size > 0:
                 key_path = key_metadata.key[len(root):].lstrip('/')
                 yield url_path_join(source, key_path)
@@ -210,9 +333,7 @@ class PathSelectionByDateIntervalTask(EventLogSelectionDownstreamMixin, luigi.Wr
 
     def _get_local_urls(self, source):
         """Recursively list all files inside the source directory on the local filesystem."""
-        for directory_path, _subdir_paths, filenames in os.walk(source):
-            for filename in filenames:
-                yield os.path.join(directory_path, filename)
+        return self.iter_local_files(source)
 
     def should_include_url(self, url):
         """
@@ -220,6 +341,9 @@ class PathSelectionByDateIntervalTask(EventLogSelectionDownstreamMixin, luigi.Wr
 
         Presently filters first on pattern match and then on the datestamp extracted from the file name.
         """
+        if is_index_url(url):
+            return False
+
         # Find the first pattern (if any) that matches the URL.
         match = None
         for pattern in self.pattern:
@@ -240,16 +364,76 @@ class PathSelectionByDateIntervalTask(EventLogSelectionDownstreamMixin, luigi.Wr
 
         return should_include
 
+    def get_excluded_indexed_urls(self, indexed_urls):
+        """
+        Returns the set of indexed URLs whose indexes show that they contain no relevant events.
+
+        There is a round trip for each index that is read from S3, so the indexes are read by `listing_threads` threads.
+        """
+        if not indexed_urls:
+            return set()
+
+        pool = ThreadPool(max(min(self.listing_threads, len(indexed_urls)), 1))
+        try:
+            should_include = pool.map(self.should_include_indexed_url, indexed_urls)
+        finally:
+            pool.terminate()
+
+        return set(url for url, include in zip(indexed_urls, should_include) if not include)
+
+    def should_include_indexed_url(self, url):
+        """Use the index of the file to determine if it contains any events that are relevant to the analysis."""
+        index_url = get_index_url(url)
+        try:
+            if index_url.startswith('s3'):
+                s3_conn = getattr(INDEX_CONNECTIONS, 's3_conn', None)
+                if s3_conn is None:
+                    s3_conn = INDEX_CONNECTIONS.s3_conn = boto.connect_s3()
+                index_json = get_s3_key(s3_conn, index_url).get_contents_as_string()
+            else:
+                with get_target_from_url(index_url).open('r') as index_file:
+                    index_json = index_file.read()
+            index = EventLogIndex.from_json(index_json)
+        except Exception:  # pylint: disable=broad-except
+            log.warning('Unable to read index %s, assuming the file is relevant.', index_url, exc_info=True)
+            return True
+
+        return index.may_contain(self.event_types, self.event_date_a, self.event_date_b)
+
     def output(self):
         return [task.output() for task in self.requires()]
 
 
-class EventLogSelectionMixin(EventLogSelectionDownstreamMixin):
+class EventLogParsingMixin(object):
+    """
+    Parses the tracking log lines read by a mapper.
+
+    When the task is fed by a MultiplexedEventLogTask, the event that was already parsed for the current line is reused.
+    """
+
+    # A (line, event) tuple set by a task that has already parsed the current input line on our behalf, see
+    # MultiplexedEventLogTask.
+    parsed_line = None
+
+    def parse_event(self, line):
+        """Parse a tracking log line, reusing the event that was already parsed for this exact line if possible."""
+        parsed_line = self.parsed_line
+        if parsed_line is not None and parsed_line[0] is line:
+            return parsed_line[1]
+        return eventlog.parse_json_event(line)
+
+
+class EventLogSelectionMixin(EventLogSelectionDownstreamMixin, EventLogParsingMixin):
     """
     Extract events corresponding to a specified time interval and outputs them from a mapper.
 
+    Tasks that only process a few types of events can list them in `required_event_types` so that tracking log files
+    that are known not to contain any of them are not read at all.
+
     """
 
+    required_event_types = None
+
     def requires(self):
         """Use PathSelectionByDateIntervalTask to define inputs."""
         return PathSelectionByDateIntervalTask(
@@ -257,6 +441,7 @@ class EventLogSelectionMixin(EventLogSelectionDownstreamMixin):
             interval=self.interval,
             pattern=self.pattern,
             date_pattern=self.date_pattern,
+            event_types=tuple(sorted(self.required_event_types or ())),
         )
 
     def init_local(self):
@@ -267,7 +452,7 @@ class EventLogSelectionMixin(EventLogSelectionDownstreamMixin):
 
     def get_event_and_date_string(self, line):
         """Default mapper implementation, that always outputs the log line, but with a configurable key."""
-        event = eventlog.parse_json_event(line)
+        event = self.parse_event(line)
         if event is None:
             return None
 
@@ -4,12 +4,16 @@ Utility methods for interacting with S3 via boto.
 import os
 import math
 import logging
+from multiprocessing.pool import ThreadPool
+import threading
 import time
 
 from fnmatch import fnmatch
 from urlparse import urlparse
 
+import boto
 from boto.s3.key import Key
+from boto.s3.prefix import Prefix
 from filechunkio import FileChunkIO
 from luigi.s3 import S3Client, AtomicS3File
 from luigi.hdfs import HdfsTarget, Plain
@@ -76,7 +80,63 @@ def get_s3_key(s3_conn, url):
     return key
 
 
-def generate_s3_sources(s3_conn, source, patterns=['*'], include_zero_length=False):
+def list_s3_keys(s3_conn, bucket_name, prefix, num_threads=1, get_marker=None):
+    """
+    Yields the keys in a bucket whose names start with the prefix, in lexicographic order.
+
+    If `num_threads` is greater than one, the listing is split by the "folders" found below the prefix, and each folder
+    is listed by a separate thread, using its own connection. A folder that is the only entry below the prefix is
+    descended into, so that the listing is split at the first level that contains several entries.
+
+    If `get_marker` is specified, the listing is always split by folder, and `get_marker` is called with the name of
+    each folder. It should return the name of the last key in that folder that is already known, in which case only the
+    keys that come after it are listed, or None to list the entire folder.
+    """
+    bucket = s3_conn.get_bucket(bucket_name)
+    if num_threads <= 1 and get_marker is None:
+        for key in bucket.list(prefix):
+            yield key
+        return
+
+    while True:
+        entries = list(bucket.list(prefix, delimiter='/'))
+        if len(entries) == 1 and isinstance(entries[0], Prefix):
+            prefix = entries[0].name
+        else:
+            break
+
+    folder_names = [entry.name for entry in entries if isinstance(entry, Prefix)]
+    pool = ThreadPool(max(min(num_threads, len(folder_names)), 1))
+    try:
+        folder_listings = pool.imap(_ListFolder(bucket_name, get_marker), folder_names)
+        for entry in entries:
+            if isinstance(entry, Prefix):
+                for key in next(folder_listings):
+                    yield key
+            else:
+                yield entry
+    finally:
+        pool.terminate()
+
+
+class _ListFolder(object):
+    """List all of the keys in a folder of a bucket, using a connection that belongs to the current thread."""
+
+    connections = threading.local()
+
+    def __init__(self, bucket_name, get_marker=None):
+        self.bucket_name = bucket_name
+        self.get_marker = get_marker
+
+    def __call__(self, folder_name):
+        s3_conn = getattr(self.connections, 's3_conn', None)
+        if s3_conn is None:
+            s3_conn = self.connections.s3_conn = boto.connect_s3()
+        marker = self.get_marker(folder_name) if self.get_marker is not None else None
+        return list(s3_conn.get_bucket(self.bucket_name, validate=False).list(folder_name, marker=marker or ''))
+
+
+def generate_s3_sources(s3_conn, source, patterns=['*'], include_zero_length=False, num_threads=1, listing_cache=None):
     """
     Returns a list of S3 sources that match filters.
 
@@ -85,6 +145,8 @@ def generate_s3_sources(s3_conn, source, patterns=['*'], include_zero_length=Fal
       s3_conn: a boto connection to S3.
       source:  a url to S3.
       patterns:  a list of strings, each of which defines a pattern to match.
+      num_threads:  the number of threads used to list the source, see `list_s3_keys`.
+      listing_cache:  an optional ListingCache used to avoid listing keys that were already seen.
 
     Yields:
 
@@ -106,7 +168,11 @@ def generate_s3_sources(s3_conn, source, patterns=['*'], include_zero_length=Fal
     # Skip keys that have zero size.  This allows directories
     # to be skipped, but also skips legitimate files that are
     # also zero-length.
-    keys = (s.key for s in bucket.list(root_with_slash) if s.size > 0 or include_zero_length)
+    if listing_cache is not None:
+        listing = listing_cache.list_s3_keys(s3_conn, bucket_name, root_with_slash)
+    else:
+        listing = list_s3_keys(s3_conn, bucket_name, root_with_slash, num_threads)
+    keys = (s.key for s in listing if s.size > 0 or include_zero_length)
 
     # Make paths relative by removing root
     paths = (k[len(root_with_slash):].lstrip('/') for k in keys)
@@ -1,6 +1,12 @@
 """Tests for elasticsearch loading."""
 
+import BaseHTTPServer
 import datetime
+import json
+import SocketServer
+import threading
+import time
+
 import luigi.hdfs
 from elasticsearch import TransportError
 from mock import patch, call
@@ -422,3 +428,121 @@ class ElasticsearchIndexTaskCommitTest(BaseIndexTest, ReducerTestMixin, unittest
                 call.indices.delete(index='foo_alias_old'),
             ]
         )
+
+
+class FakeElasticsearchBulkHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers bulk indexing requests like an elasticsearch cluster, recording the documents it is sent."""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Indexes the documents in a bulk request, failing any whose text is known to the server to be invalid."""
+        request_body = self.rfile.read(int(self.headers['Content-Length']))
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            self.server.request_bodies.append(request_body)
+
+        # Give other requests a chance to arrive while this one is being "indexed".
+        time.sleep(0.02)
+
+        documents = [json.loads(line) for line in request_body.splitlines()[1::2]]
+        items = [
+            {'index': {'status': 500 if document['all_text'] in self.server.invalid_text else 201}}
+            for document in documents
+        ]
+        with self.server.lock:
+            self.server.in_flight -= 1
+            self.server.indexed_text.extend(document['all_text'] for document in documents)
+
+        body = json.dumps({'took': 1, 'errors': False, 'items': items})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class FakeElasticsearchServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """A local stand-in for an elasticsearch cluster that handles concurrent requests."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), FakeElasticsearchBulkHandler)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.request_bodies = []
+        self.indexed_text = []
+        self.invalid_text = set()
+
+
+class ElasticsearchIndexTaskBulkRequestTest(unittest.TestCase):
+    """Tests concurrent and direct-from-mapper indexing against a local stand-in for an elasticsearch cluster."""
+
+    def setUp(self):
+        self.server = FakeElasticsearchServer()
+        thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.01})
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.lines = ['record {0:02d}'.format(index) for index in range(20)]
+
+    def create_task(self, **kwargs):
+        """Create a sample indexing task that sends its requests to the stand-in cluster."""
+        luigi.task.Register.clear_instance_cache()
+        self.task = RawIndexTask(
+            host='http://127.0.0.1:{0}'.format(self.server.server_address[1]),
+            alias='foo_alias',
+            throttle=0,
+            **kwargs
+        )
+
+    def test_concurrent_requests(self):
+        self.create_task(batch_size=2, max_concurrent_requests=4)
+        self.assertEqual(list(self.task.reducer(0, iter(self.lines))), [('', '')])
+
+        self.assertEqual(len(self.server.request_bodies), 10)
+        self.assertItemsEqual(self.server.indexed_text, self.lines)
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, 4)
+
+    def test_sequential_requests(self):
+        self.create_task(batch_size=2)
+        list(self.task.reducer(0, iter(self.lines)))
+
+        self.assertEqual(self.server.indexed_text, self.lines)
+        self.assertEqual(self.server.max_in_flight, 1)
+
+    def test_batch_size_bytes(self):
+        self.create_task(batch_size=1000, batch_size_bytes=100, max_concurrent_requests=2)
+        list(self.task.reducer(0, iter(self.lines)))
+
+        # Each document takes 13 bytes for its action and 29 bytes for its source, so a batch ends with its third.
+        self.assertEqual(len(self.server.request_bodies), 7)
+        self.assertEqual(
+            [len(request_body.splitlines()) / 2 for request_body in self.server.request_bodies], [3] * 6 + [2]
+        )
+        self.assertItemsEqual(self.server.indexed_text, self.lines)
+
+    def test_concurrent_indexing_failure(self):
+        self.server.invalid_text.add('record 13')
+        self.create_task(batch_size=2, max_concurrent_requests=4)
+
+        with self.assertRaisesRegexp(IndexingError, 'Failed to index 1 records. Aborting.'):
+            list(self.task.reducer(0, iter(self.lines)))
+
+    def test_index_from_mapper(self):
+        self.create_task(batch_size=5, max_concurrent_requests=2, index_from_mapper=True)
+
+        self.assertIs(self.task.reducer, NotImplemented)
+        self.assertIn('mapred.map.tasks.speculative.execution=false', self.task.jobconfs())
+        map_output = self.task._map_input(line + '\r\n' for line in self.lines)  # pylint: disable=protected-access
+        self.assertEqual(list(map_output), [('', '')])
+
+        self.assertEqual(len(self.server.request_bodies), 4)
+        self.assertItemsEqual(self.server.indexed_text, self.lines)
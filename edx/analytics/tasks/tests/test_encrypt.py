@@ -1,8 +1,11 @@
 """Tests of utilities to encrypt files."""
 
-import gnupg
+import os
 import tempfile
 
+import gnupg
+from mock import MagicMock
+
 from edx.analytics.tasks.encrypt import make_encrypted_file, _import_key_files
 from edx.analytics.tasks.tests import unittest
 from edx.analytics.tasks.url import get_target_from_url
@@ -55,3 +58,58 @@ class MakeEncryptedFileTest(unittest.TestCase):
 
             output_file.seek(0)
             self.check_encrypted_data(output_file, values)
+
+    def test_make_encrypted_file_streaming(self):
+        values = ['this', 'is', 'a', 'test']
+        progress = []
+        with tempfile.NamedTemporaryFile() as output_file:
+            with make_encrypted_file(
+                output_file, self.key_file_targets, [self.recipient], progress=progress.append, streaming=True
+            ) as encrypted_output_file:
+                for value in values:
+                    encrypted_output_file.write(value)
+                    encrypted_output_file.write('\n')
+
+            output_file.flush()
+            self.assertEquals(sum(progress), os.path.getsize(output_file.name))
+            output_file.seek(0)
+            self.check_encrypted_data(output_file, values)
+
+    def test_make_encrypted_file_streaming_with_implied_recipients(self):
+        values = ['this', 'is', 'a', 'test']
+        with tempfile.NamedTemporaryFile() as output_file:
+            with make_encrypted_file(output_file, self.key_file_targets, streaming=True) as encrypted_output_file:
+                for value in values:
+                    encrypted_output_file.write(value)
+                    encrypted_output_file.write('\n')
+
+            output_file.seek(0)
+            self.check_encrypted_data(output_file, values)
+
+    def test_make_encrypted_file_streaming_more_than_pipe_buffers(self):
+        # Random data doesn't compress, so this is larger than the pipe buffers in both directions.
+        values = [os.urandom(512).encode('hex') for _ in xrange(4096)]
+        with tempfile.NamedTemporaryFile() as output_file:
+            with make_encrypted_file(output_file, self.key_file_targets, streaming=True) as encrypted_output_file:
+                for value in values:
+                    encrypted_output_file.write(value)
+                    encrypted_output_file.write('\n')
+
+            output_file.seek(0)
+            self.check_encrypted_data(output_file, values)
+
+    def test_make_encrypted_file_streaming_with_unknown_recipient(self):
+        with tempfile.NamedTemporaryFile() as output_file:
+            with self.assertRaises(IOError):
+                with make_encrypted_file(
+                    output_file, self.key_file_targets, ['unknown@example.com'], streaming=True
+                ) as encrypted_output_file:
+                    encrypted_output_file.write('test\n')
+
+    def test_make_encrypted_file_streaming_output_error(self):
+        output_file = MagicMock()
+        output_file.write.side_effect = IOError('disk full')
+        with self.assertRaisesRegexp(IOError, 'disk full'):
+            with make_encrypted_file(output_file, self.key_file_targets, streaming=True) as encrypted_output_file:
+                for _ in xrange(4096):
+                    encrypted_output_file.write(os.urandom(1024))
@@ -1,6 +1,8 @@
 """Test enrollment computations"""
 
+import datetime
 import json
+import random
 
 import luigi
 
@@ -10,7 +12,12 @@ from edx.analytics.tasks.enrollments import (
     DEACTIVATED,
     ACTIVATED,
     MODE_CHANGED,
-    CourseEnrollmentSummaryTask
+    CourseEnrollmentSummaryTask,
+    CourseEnrollmentIntervalTask,
+    DaysEnrolledForEvents,
+    EnrollmentByModeCountsTask,
+    EnrollmentDailyCountsTask,
+    sweep_enrollment_intervals,
 )
 from edx.analytics.tasks.tests import unittest
 from edx.analytics.tasks.tests.map_reduce_mixins import MapperTestMixin, ReducerTestMixin
@@ -562,3 +569,180 @@ class CourseEnrollmentSummaryTaskReducerTest(ReducerTestMixin, unittest.TestCase
         expected = ((self.course_id, self.user_id, 'credit', '1', 'honor', '2013-01-01 00:00:01.000000',
                      '2013-01-01 00:00:03.000000', '\\N', '2013-01-01 00:00:02.000000', '2013-01-02 00:00:00.000000'),)
         self._check_output_complete_tuple(inputs, expected)
+
+
+class CourseEnrollmentIntervalTaskReducerTest(ReducerTestMixin, unittest.TestCase):
+    """Tests to verify that the enrollment interval reducer works correctly."""
+
+    def setUp(self):
+        self.task_class = CourseEnrollmentIntervalTask
+        self.create_enrollment_task()
+        self.user_id = 0
+        self.course_id = 'foo/bar/baz'
+        self.reduce_key = (self.course_id, self.user_id)
+
+    def create_enrollment_task(self, interval='2013-01-01'):
+        """Create a task for testing purposes."""
+        self.task = self.task_class(
+            interval=luigi.DateIntervalParameter().parse(interval),
+            output_root="/fake/output",
+            overwrite_n_days=5,
+        )
+
+    def test_no_events(self):
+        self.assert_no_output([])
+
+    def test_single_enrollment(self):
+        inputs = [('2013-01-01T00:00:01', ACTIVATED, 'honor'), ]
+        expected = ((self.course_id, self.user_id, '2013-01-01', '2013-01-02', 1, 'honor'),)
+        self._check_output_complete_tuple(inputs, expected)
+
+    def test_multiple_events_on_same_day(self):
+        inputs = [
+            ('2013-01-01T00:00:01', ACTIVATED, 'honor'),
+            ('2013-01-01T00:00:02', DEACTIVATED, 'honor'),
+        ]
+        expected = ((self.course_id, self.user_id, '2013-01-01', '2013-01-02', 0, 'honor'),)
+        self._check_output_complete_tuple(inputs, expected)
+
+    def test_missing_days(self):
+        self.create_enrollment_task('2012-12-30-2013-01-07')
+        inputs = [
+            ('2013-01-01T00:00:01', ACTIVATED, 'honor'),
+            ('2013-01-04T00:00:01', DEACTIVATED, 'honor'),
+            ('2013-01-06T00:00:01', ACTIVATED, 'honor'),
+        ]
+        expected = (
+            (self.course_id, self.user_id, '2013-01-01', '2013-01-04', 1, 'honor'),
+            (self.course_id, self.user_id, '2013-01-04', '2013-01-06', 0, 'honor'),
+            (self.course_id, self.user_id, '2013-01-06', '2013-01-07', 1, 'honor'),
+        )
+        self._check_output_complete_tuple(inputs, expected)
+
+    def test_mode_change_multi_day(self):
+        self.create_enrollment_task('2013-01-01-2013-01-05')
+        inputs = [
+            ('2013-01-01T00:00:01', ACTIVATED, 'honor'),
+            ('2013-01-02T00:00:01', MODE_CHANGED, 'audit'),
+            ('2013-01-03T00:00:01', MODE_CHANGED, 'audit'),
+        ]
+        expected = (
+            (self.course_id, self.user_id, '2013-01-01', '2013-01-02', 1, 'honor'),
+            (self.course_id, self.user_id, '2013-01-02', '2013-01-05', 1, 'audit'),
+        )
+        self._check_output_complete_tuple(inputs, expected)
+
+    def test_equivalent_to_days_enrolled(self):
+        interval = luigi.DateIntervalParameter().parse('2013-01-01-2013-01-20')
+        generator = random.Random(0)
+        for _ in range(100):
+            events = [
+                (
+                    '2013-01-{0:02d}T00:00:{1:02d}'.format(generator.randint(1, 19), generator.randint(0, 59)),
+                    generator.choice((ACTIVATED, DEACTIVATED, MODE_CHANGED)),
+                    generator.choice(('honor', 'verified')),
+                )
+                for _ in range(generator.randint(1, 8))
+            ]
+            days = list(DaysEnrolledForEvents(self.course_id, self.user_id, interval, events).days_enrolled())
+
+            expanded = []
+            previous_state = 0
+            for _, _, start_date, end_date, state, mode in DaysEnrolledForEvents(
+                    self.course_id, self.user_id, interval, events).enrollment_intervals():
+                start = DaysEnrolledForEvents.parse_date_string(start_date)
+                for offset in range((DaysEnrolledForEvents.parse_date_string(end_date) - start).days):
+                    datestamp = (start + datetime.timedelta(days=offset)).isoformat()
+                    change = state - previous_state if offset == 0 else 0
+                    expanded.append((datestamp, self.course_id, self.user_id, state, change, mode))
+                previous_state = state
+
+            self.assertEquals(expanded, days)
+
+
+class SweepEnrollmentIntervalsTest(unittest.TestCase):
+    """Test counting enrollment intervals per day."""
+
+    def test_no_intervals(self):
+        self.assertEquals(list(sweep_enrollment_intervals([])), [])
+
+    def test_overlapping_intervals(self):
+        intervals = [
+            ('2013-01-01', '2013-01-03', 1),
+            ('2013-01-02', '2013-01-04', 0),
+            ('2013-01-06', '2013-01-07', 1),
+            ('2013-01-03', '2013-01-04', 1),
+        ]
+        self.assertEquals(
+            list(sweep_enrollment_intervals(intervals)),
+            [
+                ('2013-01-01', 1, 1),
+                ('2013-01-02', 1, 2),
+                ('2013-01-03', 1, 2),
+                ('2013-01-06', 1, 1),
+            ]
+        )
+
+
+class EnrollmentIntervalCountsTaskTest(unittest.TestCase):
+    """Test the tasks that compute enrollment breakdowns from enrollment intervals."""
+
+    def create_task(self, task_class):
+        """Create a task for testing purposes."""
+        return task_class(
+            interval=luigi.DateIntervalParameter().parse('2013-01-01-2013-01-04'),
+            output_root='/fake/output',
+            warehouse_path='/fake/warehouse/',
+            overwrite_n_days=0,
+        )
+
+    def run_job(self, task, lines):
+        """Run the mapper and the reducer of the task over the lines."""
+        grouped = {}
+        for line in lines:
+            for key, value in task.mapper(line):
+                grouped.setdefault(key, []).append(value)
+        return sorted(record for key in grouped for record in task.reducer(key, grouped[key]))
+
+    def test_daily_counts(self):
+        task = self.create_task(EnrollmentDailyCountsTask)
+        lines = [
+            'foo/bar/baz\t1\t2013-01-01\t2013-01-02\t1\thonor',
+            'foo/bar/baz\t1\t2013-01-02\t2013-01-04\t1\tverified',
+            'foo/bar/baz\t2\t2013-01-02\t2013-01-03\t1\thonor',
+            'foo/bar/baz\t2\t2013-01-03\t2013-01-04\t0\thonor',
+            'foo/bar/qux\t1\t2013-01-03\t2013-01-04\t0\thonor',
+        ]
+        self.assertEquals(
+            self.run_job(task, lines),
+            [
+                ('foo/bar/baz', '2013-01-01', 1, 1),
+                ('foo/bar/baz', '2013-01-02', 2, 2),
+                ('foo/bar/baz', '2013-01-03', 1, 2),
+                ('foo/bar/qux', '2013-01-03', 0, 1),
+            ]
+        )
+
+    def test_counts_by_mode(self):
+        task = self.create_task(EnrollmentByModeCountsTask)
+        lines = [
+            'foo/bar/baz\t1\t2013-01-01\t2013-01-02\t1\thonor',
+            'foo/bar/baz\t1\t2013-01-02\t2013-01-04\t1\tverified',
+            'foo/bar/baz\t2\t2013-01-02\t2013-01-04\t0\thonor',
+        ]
+        self.assertEquals(
+            self.run_job(task, lines),
+            [
+                ('2013-01-01', 'foo/bar/baz', 'honor', 1, 1),
+                ('2013-01-02', 'foo/bar/baz', 'honor', 0, 1),
+                ('2013-01-02', 'foo/bar/baz', 'verified', 1, 1),
+                ('2013-01-03', 'foo/bar/baz', 'honor', 0, 1),
+                ('2013-01-03', 'foo/bar/baz', 'verified', 1, 1),
+            ]
+        )
+
+    def test_requires_interval_task(self):
+        task = self.create_task(EnrollmentDailyCountsTask)
+        interval_task = task.requires_hadoop()
+        self.assertIsInstance(interval_task, CourseEnrollmentIntervalTask)
+        self.assertEquals(interval_task.output_root, '/fake/warehouse/course_enrollment_interval/dt=2013-01-04/')
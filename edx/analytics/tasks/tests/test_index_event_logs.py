@@ -0,0 +1,65 @@
+"""Tests for indexing of tracking log files."""
+
+import json
+import os
+
+from mock import patch, MagicMock
+
+from edx.analytics.tasks.index_event_logs import IndexEventLogsTask
+from edx.analytics.tasks.tests import unittest
+from edx.analytics.tasks.tests.map_reduce_mixins import MapperTestMixin
+from edx.analytics.tasks.util.event_log_index import EventLogIndex
+
+
+class IndexEventLogsTaskTest(MapperTestMixin, unittest.TestCase):
+    """Tests for IndexEventLogsTask."""
+
+    task_class = IndexEventLogsTask
+    INPUT_FILE = 's3://foo/bar/tracking.log-20131217.gz'
+
+    def setUp(self):
+        super(IndexEventLogsTaskTest, self).setUp()
+        self.task.init_mapper()
+
+        patcher = patch.dict(os.environ, {'map_input_file': self.INPUT_FILE})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def map_lines(self, lines):
+        """Run the mapper over the lines and return the index produced for the input file."""
+        for line in lines:
+            self.assertEquals(list(self.task.mapper(line)), [])
+        output = list(self.task.final_mapper())
+        self.assertEquals(len(output), 1)
+        self.assertEquals(output[0][0], self.INPUT_FILE)
+        return EventLogIndex.from_json(output[0][1])
+
+    def test_mapper(self):
+        index = self.map_lines([
+            json.dumps({'event_type': 'play_video', 'time': '2013-12-18T00:00:01.123456+00:00'}),
+            json.dumps({'event_type': 'play_video', 'time': '2013-12-17T15:38:32.805444+00:00'}),
+            json.dumps({'event_type': '/courses/foo/bar/baz/info', 'time': '2013-12-17T15:38:32+00:00'}),
+            json.dumps({'time': '2013-12-16T15:38:32+00:00'}),
+            json.dumps({'event_type': 'play_video'}),
+            'this is not an event',
+        ])
+
+        self.assertEquals(index.event_type_counts, {'play_video': 2, '/': 1, '': 1})
+        self.assertEquals(index.min_date, '2013-12-16')
+        self.assertEquals(index.max_date, '2013-12-18')
+        self.assertEquals(index.unparsed_count, 1)
+
+    def test_reducer(self):
+        output_file = MagicMock()
+        self.task.multi_output_reducer(self.INPUT_FILE, [
+            EventLogIndex({'play_video': 1}, '2013-12-17', '2013-12-17').to_json(),
+            EventLogIndex({'play_video': 2, 'seek_video': 1}, '2013-12-16', '2013-12-17', 1).to_json(),
+        ], output_file)
+
+        index = EventLogIndex.from_json(output_file.write.call_args[0][0])
+        self.assertEquals(index.event_type_counts, {'play_video': 3, 'seek_video': 1})
+        self.assertEquals(index.min_date, '2013-12-16')
+        self.assertEquals(index.unparsed_count, 1)
+
+    def test_output_path_for_key(self):
+        self.assertEquals(self.task.output_path_for_key(self.INPUT_FILE), self.INPUT_FILE + '.index.json')
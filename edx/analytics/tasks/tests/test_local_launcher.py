@@ -0,0 +1,41 @@
+"""Tests for loading tasks in the local launcher."""
+
+from mock import patch
+import pkg_resources
+
+from edx.analytics.tasks.launchers import local
+from edx.analytics.tasks.tests import unittest
+
+
+class LoadTaskTest(unittest.TestCase):
+    """Test loading only the task named on the command line."""
+
+    def setUp(self):
+        entry_points = [
+            pkg_resources.EntryPoint.parse('export-events = edx.analytics.tasks.event_exports:EventExportTask'),
+            pkg_resources.EntryPoint.parse('insert-into-table = edx.analytics.tasks.mysql_load:MysqlInsertTask'),
+        ]
+        patcher = patch.object(local.pkg_resources, 'iter_entry_points', return_value=entry_points)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_task_class_name(self):
+        args = ['EventExportTask', '--interval', '2014-01-01']
+        self.assertEquals(local.load_task(args), args)
+
+    def test_entry_point_name(self):
+        args = ['--local-scheduler', 'export-events', '--interval', '2014-01-01']
+        self.assertEquals(
+            local.load_task(args),
+            ['--local-scheduler', 'EventExportTask', '--interval', '2014-01-01']
+        )
+
+    def test_global_parameter_values(self):
+        args = ['--workers', 'export-events', 'insert-into-table']
+        self.assertEquals(local.load_task(args), ['--workers', 'export-events', 'MysqlInsertTask'])
+
+    def test_unknown_task(self):
+        self.assertIsNone(local.load_task(['SomeOtherTask', '--name', 'export-events']))
+
+    def test_no_task(self):
+        self.assertIsNone(local.load_task(['--help']))
@@ -2,6 +2,7 @@
 
 from __future__ import absolute_import
 
+import gzip
 from mock import patch, call
 import os
 import tempfile
@@ -10,8 +11,11 @@ import shutil
 import luigi
 import luigi.hdfs
 
-from edx.analytics.tasks.mapreduce import MultiOutputMapReduceJobTask, MapReduceJobTask
+from edx.analytics.tasks.mapreduce import (
+    MultiOutputMapReduceJobTask, MapReduceJobTask, EmulatedMapReduceJobRunner, SummingJobTaskMixin, SORT_LINE_OVERHEAD
+)
 from edx.analytics.tasks.tests import unittest
+from edx.analytics.tasks.tests.config import with_luigi_config, OPTION_REMOVED
 
 
 class MapReduceJobTaskTest(unittest.TestCase):
@@ -177,3 +181,207 @@ class TestJobTask(MultiOutputMapReduceJobTask):
     def multi_output_reducer(self, _key, values, output_file):
         for value in values:
             output_file.write(value + '\n')
+
+
+class EmulatedMapReduceJobRunnerTest(unittest.TestCase):
+    """Tests for EmulatedMapReduceJobRunner."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        self.input_paths = []
+        self.create_input_file('input-0', ['a b', 'c a'])
+        self.create_input_file('input-1.gz', ['b a', 'd'], compress=True)
+        self.create_input_file('input-2', [])
+
+    def create_input_file(self, filename, lines, compress=False):
+        """Write the given lines to a file in the temporary directory."""
+        path = os.path.join(self.temp_dir, filename)
+        input_file = gzip.open(path, 'wb') if compress else open(path, 'w')
+        with input_file:
+            for line in lines:
+                input_file.write(line + '\n')
+        self.input_paths.append(path)
+
+    def run_job(self, job, **kwargs):
+        """Run the job using an emulated runner, and return the sorted lines of output."""
+        job.input_paths = self.input_paths
+        job.output_path = os.path.join(self.temp_dir, 'output')
+        EmulatedMapReduceJobRunner(**kwargs).run_job(job)
+        with open(job.output_path, 'r') as output_file:
+            return sorted(output_file.read().splitlines())
+
+    def test_single_process(self):
+        output = self.run_job(WordCountJobTask(), num_processes=1, num_partitions=1)
+        self.assertEquals(output, ['a\t3', 'b\t2', 'c\t1', 'd\t1'])
+
+    def test_multiple_processes(self):
+        output = self.run_job(WordCountJobTask(), num_processes=3, num_partitions=4)
+        self.assertEquals(output, ['a\t3', 'b\t2', 'c\t1', 'd\t1'])
+
+    def test_reduce_task_partitions(self):
+        output = self.run_job(PartitionReportingJobTask(), num_processes=2, num_partitions=2)
+        self.assertEquals(output, ['0', '1'])
+
+    def test_spilled_sort(self):
+        output = self.run_job(WordCountJobTask(), num_processes=2, num_partitions=2, sort_buffer_size=1)
+        self.assertEquals(output, ['a\t3', 'b\t2', 'c\t1', 'd\t1'])
+
+    def test_combiner(self):
+        output = self.run_job(ValuesReportingJobTask(max_in_mapper_keys=0), num_processes=2, num_partitions=2)
+        # The combiner sums the values output by each map task, so only one value is reduced per key and input file.
+        self.assertEquals(output, ['a\t1,2', 'b\t1,1', 'c\t1', 'd\t1'])
+
+    def test_map_only(self):
+        output = self.run_job(MapOnlyJobTask(), num_processes=2)
+        self.assertEquals(output, ['a b\tinput-0', 'b a\tinput-1.gz', 'c a\tinput-0', 'd\tinput-1.gz'])
+
+    def test_manifest(self):
+        manifest_path = os.path.join(self.temp_dir, 'input.manifest')
+        with open(manifest_path, 'w') as manifest_file:
+            manifest_file.write('\n'.join(self.input_paths) + '\n')
+        self.input_paths = [manifest_path]
+
+        output = self.run_job(WordCountJobTask(), num_processes=2, num_partitions=2)
+        self.assertEquals(output, ['a\t3', 'b\t2', 'c\t1', 'd\t1'])
+
+
+class SummingJobTaskMixinTest(unittest.TestCase):
+    """Tests for SummingJobTaskMixin."""
+
+    LINES = ['a b a', 'c a', 'b']
+
+    def map_input(self, max_in_mapper_keys):
+        """Returns the output of the mapper for some sample input."""
+        job = SummingWordCountJobTask(max_in_mapper_keys=max_in_mapper_keys)
+        return list(job._map_input(iter(self.LINES)))  # pylint: disable=protected-access
+
+    def test_sum_in_mapper(self):
+        self.assertItemsEqual(self.map_input(10), [('a', 3), ('b', 2), ('c', 1)])
+
+    def test_flush_partial_sums(self):
+        output = self.map_input(3)
+        self.assertItemsEqual(output, [('a', 2), ('b', 1), ('c', 1), ('a', 1), ('b', 1)])
+
+    def test_disabled(self):
+        output = self.map_input(0)
+        self.assertEquals(output, [('a', 1), ('b', 1), ('a', 1), ('c', 1), ('a', 1), ('b', 1)])
+
+    def test_combiner(self):
+        job = SummingWordCountJobTask()
+        self.assertEquals(list(job.combiner('a', iter([1, 3, 2]))), [('a', 6)])
+
+
+class EmulatedMapReduceJobRunnerConfigTest(unittest.TestCase):
+    """Tests for configuring the number of processes and partitions used by EmulatedMapReduceJobRunner."""
+
+    @with_luigi_config(
+        ('map-reduce', 'local_processes', OPTION_REMOVED),
+        ('map-reduce', 'local_partitions', OPTION_REMOVED),
+    )
+    def test_single_process_by_default(self):
+        runner = EmulatedMapReduceJobRunner()
+        self.assertEquals(runner.num_processes, 1)
+        self.assertEquals(runner.num_partitions, 1)
+
+    @with_luigi_config(
+        ('map-reduce', 'local_processes', '4'),
+        ('map-reduce', 'local_partitions', OPTION_REMOVED),
+    )
+    def test_configured_processes(self):
+        runner = EmulatedMapReduceJobRunner()
+        self.assertEquals(runner.num_processes, 4)
+        self.assertEquals(runner.num_partitions, 4)
+
+    @with_luigi_config(
+        ('map-reduce', 'local_processes', '4'),
+        ('map-reduce', 'local_partitions', '8'),
+    )
+    def test_configured_partitions(self):
+        runner = EmulatedMapReduceJobRunner()
+        self.assertEquals(runner.num_processes, 4)
+        self.assertEquals(runner.num_partitions, 8)
+
+
+class EmulatedMapReduceJobRunnerGroupTest(unittest.TestCase):
+    """Tests for sorting map output in EmulatedMapReduceJobRunner."""
+
+    INPUT = ["'b'\t1\n", "'a'\t2\n", "'c'\t3\n", "'a'\t1\n", "'b'\t0\n", "'a'\t3\n"]
+    EXPECTED_OUTPUT = ["'a'\t2\n", "'a'\t1\n", "'a'\t3\n", "'b'\t1\n", "'b'\t0\n", "'c'\t3\n"]
+
+    def assert_grouped(self, sort_buffer_size):
+        """Assert that keys are sorted, and the values for each key remain in input order."""
+        runner = EmulatedMapReduceJobRunner(num_processes=1, sort_buffer_size=sort_buffer_size)
+        self.assertEquals(list(runner.group(iter(self.INPUT))), self.EXPECTED_OUTPUT)
+
+    def test_in_memory(self):
+        self.assert_grouped(1024 * 1024)
+
+    def test_spill_every_line(self):
+        self.assert_grouped(1)
+
+    def test_spill_partial_batches(self):
+        self.assert_grouped((len(self.INPUT[0]) + SORT_LINE_OVERHEAD) * 2)
+
+    def test_empty_input(self):
+        runner = EmulatedMapReduceJobRunner(num_processes=1, sort_buffer_size=1)
+        self.assertEquals(list(runner.group(iter([]))), [])
+
+
+class LocalFilesJobTask(MapReduceJobTask):
+    """A job that reads a list of local files and writes to a local file."""
+
+    input_paths = []
+    output_path = None
+
+    def input_hadoop(self):
+        return [luigi.LocalTarget(path) for path in self.input_paths]
+
+    def output(self):
+        return luigi.LocalTarget(self.output_path)
+
+
+class WordCountJobTask(LocalFilesJobTask):
+    """Count the occurrences of each word."""
+
+    def mapper(self, line):
+        for word in line.split():
+            yield word, 1
+
+    def reducer(self, key, values):
+        yield key, sum(values)
+
+
+class SummingWordCountJobTask(SummingJobTaskMixin, WordCountJobTask):
+    """Count the occurrences of each word, summing the counts in the mapper and the combiner."""
+
+    pass
+
+
+class ValuesReportingJobTask(SummingWordCountJobTask):
+    """Output the values that were reduced for each word, instead of their sum."""
+
+    def reducer(self, key, values):
+        yield key, ','.join(str(value) for value in sorted(values))
+
+
+class PartitionReportingJobTask(WordCountJobTask):
+    """Output the partition of each reduce task that was given at least one key."""
+
+    def init_reducer(self):
+        self.reported = False
+
+    def reducer(self, key, values):
+        if not self.reported:
+            self.reported = True
+            yield (os.environ['mapreduce_task_partition'],)
+
+
+class MapOnlyJobTask(LocalFilesJobTask):
+    """Output each line along with the name of the file it came from."""
+
+    reducer = NotImplemented
+
+    def mapper(self, line):
+        yield line, os.path.basename(os.environ['map_input_file'])
@@ -514,6 +514,28 @@ class ModuleEngagementSummaryMetricRangesDataTaskReducerTest(ReducerTestMixin, u
         values = [0, 0, 0] + ([1] * 10) + ([2]*4)
         self.assert_ranges(values, [('low', 0, 0.4), ('normal', 0.4, 2.0), ('high', 2.0, 'inf')])
 
+    def test_active_learners(self):
+        active_record = self.input_record.replace(days_active=1)
+        records = [
+            active_record.replace(videos_viewed=v, problem_attempts=a, problem_attempts_per_completed=float(a))
+            for v, a in [(1, 0), (2, 3), (3, 0), (4, 0), (5, 2)]
+        ]
+        records.append(self.input_record.replace(videos_viewed=100, problem_attempts=100))
+
+        output = self._get_reducer_output([record.to_separated_values() for record in records])
+        ranges = {record[3:5]: record[5:] for record in output}
+        self.assertEqual(ranges[('videos_viewed', 'low')], ('0', '1.6'))
+        self.assertEqual(ranges[('videos_viewed', 'normal')], ('1.6', '4.4'))
+        self.assertEqual(ranges[('videos_viewed', 'high')], ('4.4', 'inf'))
+        # Only the learners that attempted a problem are included in this metric.
+        low_value, high_value = ranges[('problem_attempts_per_completed', 'normal')]
+        self.assertAlmostEqual(float(low_value), 2.15)
+        self.assertAlmostEqual(float(high_value), 2.85)
+        # Nobody completed a problem or contributed to a discussion.
+        self.assertEqual(ranges[('problems_completed', 'normal')], ('0.0', 'inf'))
+        self.assertEqual(ranges[('discussion_contributions', 'normal')], ('0.0', 'inf'))
+        self.assertEqual(output[0][:3], ('foo/bar/baz', '2014-03-25', '2014-04-01'))
+
 
 @ddt
 class ModuleEngagementUserSegmentDataTaskReducerTest(ReducerTestMixin, unittest.TestCase):
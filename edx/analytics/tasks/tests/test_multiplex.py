@@ -0,0 +1,342 @@
+"""Tests for feeding several event log jobs from a single pass over the logs."""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from mock import patch
+import luigi
+import luigi.task
+
+from edx.analytics.tasks.answer_dist import ProblemCheckEvent
+from edx.analytics.tasks.enrollments import CourseEnrollmentEventsTask
+from edx.analytics.tasks.location_per_course import LastDailyIpAddressOfUserTask
+from edx.analytics.tasks.multiplex import MultiplexedEventLogTask, MultiplexedWarehouseEventsTask
+from edx.analytics.tasks.overall_events import TotalEventsDailyTask
+from edx.analytics.tasks.tests import unittest
+from edx.analytics.tasks.user_activity import UserActivityTask
+from edx.analytics.tasks.util import eventlog
+
+
+class DailyEventsAndActivityTask(MultiplexedEventLogTask):
+    """Computes total events and user activity from a single scan of the event logs."""
+
+    output_root = luigi.Parameter()
+
+    def consumers(self):
+        common_args = {
+            'source': self.source,
+            'interval': self.interval,
+            'pattern': self.pattern,
+            'date_pattern': self.date_pattern,
+            'mapreduce_engine': self.mapreduce_engine,
+        }
+        yield TotalEventsDailyTask(output_root=os.path.join(self.output_root, 'total_events'), **common_args)
+        yield UserActivityTask(output_root=os.path.join(self.output_root, 'user_activity'), **common_args)
+
+
+class MultiplexedEventLogTaskTest(unittest.TestCase):
+    """Tests for MultiplexedEventLogTask."""
+
+    def setUp(self):
+        luigi.task.Register.clear_instance_cache()
+        self.output_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_root)
+
+        self.task = DailyEventsAndActivityTask(
+            source=['test://input/'],
+            interval=luigi.DateIntervalParameter().parse('2013-12-17'),
+            pattern=['.*'],
+            mapreduce_engine='local',
+            marker=os.path.join(self.output_root, 'marker'),
+            output_root=self.output_root,
+        )
+        self.task.init_local()
+
+        self.event = {
+            'username': 'test_user',
+            'event_source': 'server',
+            'event_type': 'problem_check',
+            'context': {'course_id': 'foo/bar/baz'},
+            'time': '2013-12-17T15:38:32.805444+00:00',
+            'event': {},
+        }
+
+    def test_mapper_parses_each_line_once(self):
+        line = json.dumps(self.event)
+        with patch('edx.analytics.tasks.util.eventlog.parse_json_event', wraps=eventlog.parse_json_event) as mock_parse:
+            output = list(self.task.mapper(line))
+
+        self.assertEqual(mock_parse.call_count, 1)
+        # Both consumers sum their map output, so it is only written once the input has been mapped.
+        self.assertEqual(output, [])
+        output = list(self.task.final_mapper())
+        self.assertItemsEqual(output, [
+            ((0, '2013-12-17'), 1),
+            ((1, ('foo/bar/baz', 'test_user', '2013-12-17', 'ACTIVE')), 1),
+            ((1, ('foo/bar/baz', 'test_user', '2013-12-17', 'ATTEMPTED_PROBLEM')), 1),
+        ])
+
+    def test_mapper_decodes_event_data_once(self):
+        self.event['event'] = json.dumps({'problem_id': 'p1'})
+        line = json.dumps(self.event)
+        event_data = []
+
+        def read_event_data(consumer):
+            """Returns a mapper for the consumer that only reads the payload of the event."""
+            def mapper(consumer_line):
+                """Read the payload of the event."""
+                event_data.append(eventlog.get_event_data(consumer.parse_event(consumer_line)))
+                return []
+            return mapper
+
+        for consumer in self.task.consumer_tasks:
+            consumer.mapper = read_event_data(consumer)
+        with patch('edx.analytics.tasks.util.eventlog.decode_json', wraps=eventlog.decode_json) as mock_decode:
+            self.assertEqual(list(self.task.mapper(line)), [])
+
+        self.assertEqual(event_data, [{'problem_id': 'p1'}, {'problem_id': 'p1'}])
+        self.assertEqual(mock_decode.call_count, 2)
+
+    def test_mapper_invalid_line(self):
+        self.assertEqual(list(self.task.mapper('this is not json')), [])
+
+    def test_consumer_without_multiplexing(self):
+        consumer = self.task.consumer_tasks[0]
+        consumer.parsed_line = ('some other line', None)
+        self.assertEqual(list(consumer.mapper(json.dumps(self.event))), [('2013-12-17', 1)])
+
+    def test_reducer_writes_to_consumer_outputs(self):
+        self.task.init_reducer()
+        self.assertEqual(list(self.task.reducer((0, '2013-12-17'), iter([1, 1, 1]))), [])
+        self.task.reducer((1, ('foo/bar/baz', 'test_user', '2013-12-17', 'ACTIVE')), iter([1, 1]))
+        self.task.final_reducer()
+
+        with open(os.path.join(self.output_root, 'total_events', 'part-00000')) as output_file:
+            self.assertEqual(output_file.read(), '2013-12-17\t3\n')
+        with open(os.path.join(self.output_root, 'user_activity', 'part-00000')) as output_file:
+            self.assertEqual(output_file.read(), 'foo/bar/baz\ttest_user\t2013-12-17\tACTIVE\t2\n')
+
+    def test_extra_modules_of_consumers(self):
+        total_events, user_activity = self.task.consumer_tasks
+        with patch.object(total_events, 'extra_modules', return_value=[json, os]):
+            with patch.object(user_activity, 'extra_modules', return_value=[os, shutil]):
+                self.assertEqual(self.task.extra_modules(), [json, os, shutil])
+
+    def test_extra_modules_of_consumer_returning_none(self):
+        with patch.object(self.task.consumer_tasks[0], 'extra_modules', return_value=None):
+            with patch.object(self.task.consumer_tasks[1], 'extra_modules', return_value=[tempfile]):
+                self.assertEqual(self.task.extra_modules(), [tempfile])
+
+    def test_part_file_per_reduce_task(self):
+        with patch.dict(os.environ, {'mapreduce_task_partition': '12'}):
+            self.assertEqual(self.task.get_part_file_name(), 'part-00012')
+
+    def test_consumer_with_different_source(self):
+        class MismatchedSourceTask(DailyEventsAndActivityTask):
+            """Feeds a consumer that reads a different set of logs."""
+            def consumers(self):
+                yield TotalEventsDailyTask(
+                    source=['test://other/'],
+                    interval=self.interval,
+                    pattern=self.pattern,
+                    mapreduce_engine=self.mapreduce_engine,
+                    output_root=self.output_root,
+                )
+
+        with self.assertRaises(ValueError):
+            MismatchedSourceTask(
+                source=['test://input/'],
+                interval=luigi.DateIntervalParameter().parse('2013-12-17'),
+                pattern=['.*'],
+                mapreduce_engine='local',
+                output_root=self.output_root,
+            )
+
+    def test_consumers_sum_in_mapper(self):
+        line = json.dumps(self.event)
+        output = list(self.task.mapper(line)) + list(self.task.mapper(line)) + list(self.task.final_mapper())
+        self.assertItemsEqual(output, [
+            ((0, '2013-12-17'), 2),
+            ((1, ('foo/bar/baz', 'test_user', '2013-12-17', 'ACTIVE')), 2),
+            ((1, ('foo/bar/baz', 'test_user', '2013-12-17', 'ATTEMPTED_PROBLEM')), 2),
+        ])
+
+    def test_combiner(self):
+        self.assertEqual(list(self.task.combiner((0, '2013-12-17'), iter([1, 2]))), [((0, '2013-12-17'), 3)])
+
+    def test_combiner_of_consumer_without_combiner(self):
+        with patch.object(self.task.consumer_tasks[0], 'combiner', NotImplemented):
+            self.assertEqual(
+                list(self.task.combiner((0, '2013-12-17'), iter([1, 2]))),
+                [((0, '2013-12-17'), 1), ((0, '2013-12-17'), 2)]
+            )
+
+            with patch.object(self.task.consumer_tasks[1], 'combiner', NotImplemented):
+                self.assertEqual(self.task.combiner, NotImplemented)
+
+
+class ProblemCheckEventConsumerTest(unittest.TestCase):
+    """Tests for feeding a consumer that selects its own input files."""
+
+    def setUp(self):
+        luigi.task.Register.clear_instance_cache()
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.source = os.path.join(self.temp_dir, 'input')
+        os.mkdir(self.source)
+        open(os.path.join(self.source, 'tracking.log-20131217.gz'), 'w').close()
+
+    def create_task(self, include=('*.gz',)):
+        """Returns a multiplexed task that feeds ProblemCheckEvent."""
+        source = self.source
+        dest = os.path.join(self.temp_dir, 'output')
+
+        class ProblemCheckEventsTask(MultiplexedEventLogTask):
+            """Feeds ProblemCheckEvent from the tracking logs."""
+            def consumers(self):
+                yield ProblemCheckEvent(
+                    name='test', src=[source], dest=dest, include=include, mapreduce_engine=self.mapreduce_engine
+                )
+
+        return ProblemCheckEventsTask(
+            source=[self.source],
+            interval=luigi.DateIntervalParameter().parse('2013-12-17'),
+            pattern=[r'.*tracking.log-(?P<date>\d{8}).*\.gz'],
+            mapreduce_engine='local',
+            marker=os.path.join(self.temp_dir, 'marker'),
+        )
+
+    def test_mapper_parses_each_line_once(self):
+        task = self.create_task()
+        task.init_local()
+        line = json.dumps({
+            'username': 'test_user',
+            'event_source': 'server',
+            'event_type': 'problem_check',
+            'context': {'course_id': 'foo/bar/baz'},
+            'time': '2013-12-17T15:38:32.805444+00:00',
+            'event': {'problem_id': 'i4x://foo/bar/problem/p1', 'answers': {'p1_2_1': 'a'}},
+        })
+        with patch('edx.analytics.tasks.util.eventlog.parse_json_event', wraps=eventlog.parse_json_event) as mock_parse:
+            output = list(task.mapper(line))
+
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(len(output), 1)
+        (index, key), _value = output[0]
+        self.assertEqual((index, key), (0, ('foo/bar/baz', 'i4x://foo/bar/problem/p1', 'test_user')))
+
+    def test_same_input_files(self):
+        open(os.path.join(self.source, 'other.gz'), 'w').close()
+        self.create_task(include=('tracking.log-*',)).validate_consumer_inputs()
+
+    def test_different_input_files(self):
+        open(os.path.join(self.source, 'other.gz'), 'w').close()
+        with self.assertRaises(ValueError):
+            self.create_task().validate_consumer_inputs()
+
+
+class MultiplexedWarehouseEventsTaskTest(unittest.TestCase):
+    """Run the consumers of MultiplexedWarehouseEventsTask together and on their own, and compare their outputs."""
+
+    INTERVAL = '2013-12-17-2013-12-19'
+
+    def setUp(self):
+        luigi.task.Register.clear_instance_cache()
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.source = os.path.join(self.temp_dir, 'input')
+        os.mkdir(self.source)
+
+        events = [
+            self.create_event('edx.course.enrollment.activated', event={
+                'course_id': 'foo/bar/baz', 'user_id': 10, 'mode': 'honor'
+            }),
+            self.create_event('problem_check', ip='10.0.0.2'),
+            self.create_event('problem_check', time='2013-12-17T16:00:00.000000+00:00'),
+            self.create_event('play_video', event_source='browser', username='other_user'),
+            self.create_event('problem_check', time='2013-12-19T10:00:00.000000+00:00'),
+        ]
+        for date_string in ('20131217', '20131218'):
+            with gzip.open(os.path.join(self.source, 'tracking.log-{0}.gz'.format(date_string)), 'wb') as log_file:
+                for event in events:
+                    log_file.write(json.dumps(event) + '\n')
+                log_file.write('this is not json\n')
+
+    def create_event(self, event_type, **kwargs):
+        """Returns a tracking log event of the given type."""
+        event = {
+            'username': 'test_user',
+            'event_source': 'server',
+            'event_type': event_type,
+            'context': {'course_id': 'foo/bar/baz'},
+            'time': '2013-12-17T15:38:32.805444+00:00',
+            'ip': '10.0.0.1',
+            'event': {},
+        }
+        event.update(kwargs)
+        return event
+
+    def create_task(self, cls, name, **kwargs):
+        """Returns a task that reads the test tracking logs and writes its output below a directory with the name."""
+        return cls(
+            source=[self.source],
+            interval=luigi.DateIntervalParameter().parse(self.INTERVAL),
+            pattern=[r'.*tracking.log-(?P<date>\d{8}).*\.gz'],
+            mapreduce_engine='emu',
+            marker=os.path.join(self.temp_dir, name, 'marker'),
+            **kwargs
+        )
+
+    def read_outputs(self, root):
+        """Returns the sorted lines of every file written below the root, keyed by the path relative to the root."""
+        outputs = {}
+        for dir_path, _dir_names, file_names in os.walk(root):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                with open(path, 'r') as output_file:
+                    outputs[os.path.relpath(path, root)] = sorted(output_file)
+        return outputs
+
+    def test_outputs(self):
+        warehouse_path = os.path.join(self.temp_dir, 'multiplexed', 'warehouse')
+        task = self.create_task(MultiplexedWarehouseEventsTask, 'multiplexed', warehouse_path=warehouse_path)
+        task.run()
+        outputs = self.read_outputs(warehouse_path)
+
+        user_activity_root = 'user_activity_daily/dt=2013-12-19/'
+        self.assertEqual(outputs.pop(os.path.join(user_activity_root, '_SUCCESS')), [])
+        self.assertEqual(
+            outputs.pop(os.path.join(user_activity_root, 'part-00000')),
+            [
+                'foo/bar/baz\tother_user\t2013-12-17\tACTIVE\t2\n',
+                'foo/bar/baz\tother_user\t2013-12-17\tPLAYED_VIDEO\t2\n',
+                'foo/bar/baz\ttest_user\t2013-12-17\tACTIVE\t4\n',
+                'foo/bar/baz\ttest_user\t2013-12-17\tATTEMPTED_PROBLEM\t4\n',
+            ]
+        )
+
+        standalone_root = os.path.join(self.temp_dir, 'standalone')
+        standalone_warehouse_path = os.path.join(standalone_root, 'warehouse')
+        for cls in (CourseEnrollmentEventsTask, LastDailyIpAddressOfUserTask):
+            self.create_task(cls, 'standalone', warehouse_path=standalone_warehouse_path).run()
+        user_activity_path = os.path.join(standalone_root, 'user_activity')
+        UserActivityTask(
+            source=[self.source],
+            interval=luigi.DateIntervalParameter().parse(self.INTERVAL),
+            pattern=[r'.*tracking.log-(?P<date>\d{8}).*\.gz'],
+            mapreduce_engine='emu',
+            output_root=user_activity_path,
+        ).run()
+
+        self.assertEqual(outputs, self.read_outputs(standalone_warehouse_path))
+        with open(user_activity_path, 'r') as user_activity_file:
+            self.assertEqual(
+                sorted(user_activity_file),
+                self.read_outputs(warehouse_path)[os.path.join(user_activity_root, 'part-00000')]
+            )
+        self.assertTrue(task.complete())
+        for consumer in task.consumer_tasks:
+            self.assertTrue(consumer.complete())
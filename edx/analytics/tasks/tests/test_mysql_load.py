@@ -3,6 +3,8 @@ Ensure we can write to MySQL data sources.
 """
 from __future__ import absolute_import
 
+import hashlib
+import re
 import textwrap
 
 import luigi
@@ -13,7 +15,9 @@ from mock import MagicMock
 from mock import patch
 from mock import sentinel
 
-from edx.analytics.tasks.mysql_load import MysqlInsertTask, coerce_for_mysql_connect
+from edx.analytics.tasks.mysql_load import (
+    MysqlInsertTask, IncrementalMysqlInsertTask, coerce_for_mysql_connect, escape_for_mysql_load_data, get_row_digest
+)
 from edx.analytics.tasks.tests import unittest
 from edx.analytics.tasks.tests.target import FakeTarget
 from edx.analytics.tasks.tests.config import with_luigi_config
@@ -61,6 +65,30 @@ class InsertToPredefinedMysqlDummyTable(InsertToMysqlDummyTable):
         return ['course_id', 'interval_start', 'interval_end', 'label', 'count']
 
 
+class InsertToMysqlDummyTableFromRows(InsertToMysqlDummyTable):
+    """
+    Define table for testing, with rows that are not read directly from the insert source.
+    """
+    def rows(self):
+        yield ('course1', '2014-05-01', '2014-05-08', u'\u5305\tzi', 1)
+        yield ('course2', None, '2014-05-08', 'back\\slash', 2)
+
+
+class IncrementalInsertToMysqlDummyTable(IncrementalMysqlInsertTask, InsertToMysqlDummyTable):
+    """
+    Define table for testing, where only the rows for a single interval are overwritten.
+    """
+    @property
+    def record_filter(self):
+        return "interval_start='2014-05-01'"
+
+
+def read_load_data_file(query):
+    """Emulates the client library reading the file named in a LOAD DATA LOCAL INFILE query."""
+    with open(re.search(r"INFILE '([^']*)'", query).group(1), 'rb') as load_data_file:
+        return load_data_file.read()
+
+
 class MysqlInsertTaskTestCase(unittest.TestCase):
     """
     Ensure we can connect to and write data to MySQL data sources.
@@ -71,7 +99,8 @@ class MysqlInsertTaskTestCase(unittest.TestCase):
         self.mock_mysql_connector = patcher.start()
         self.addCleanup(patcher.stop)
 
-    def create_task(self, credentials=None, source=None, insert_chunk_size=100, overwrite=False, cls=InsertToMysqlDummyTable):
+    def create_task(self, credentials=None, source=None, insert_chunk_size=100, overwrite=False, cls=InsertToMysqlDummyTable,
+                    bulk_load=False, use_staging_table=False, **kwargs):
         """
          Emulate execution of a generic MysqlTask.
         """
@@ -81,7 +110,10 @@ class MysqlInsertTaskTestCase(unittest.TestCase):
         task = cls(
             credentials=sentinel.ignored,
             insert_chunk_size=insert_chunk_size,
-            overwrite=overwrite
+            overwrite=overwrite,
+            bulk_load=bulk_load,
+            use_staging_table=use_staging_table,
+            **kwargs
         )
 
         if not credentials:
@@ -266,6 +298,298 @@ class MysqlInsertTaskTestCase(unittest.TestCase):
         with self.assertRaisesRegexp(Exception, 'Cannot overwrite a table with an empty result set.'):
             task.insert_rows(MagicMock())
 
+    def test_bulk_insert_rows(self):
+        source = self._get_source_string(2).replace('ACTIVE', 'back\\slash', 1).replace('ACTIVE', '\\N')
+        task = self.create_task(source=source, bulk_load=True)
+        cursor = MagicMock()
+        loaded_data = []
+        cursor.execute.side_effect = lambda query: loaded_data.append(read_load_data_file(query))
+        task.bulk_insert_rows(cursor)
+
+        query = cursor.execute.call_args[0][0]
+        self.assertRegexpMatches(query, r"^LOAD DATA LOCAL INFILE '[^']*' INTO TABLE dummy_table ")
+        self.assertIn("(@course_id,@interval_start,@interval_end,@label,@count) SET ", query)
+        self.assertIn("label = IF(BINARY @label IN ('\\\\N', 'None', 'inf', '-inf'), NULL, @label)", query)
+        self.assertEquals(
+            loaded_data,
+            [
+                'course1\t2014-05-01\t2014-05-08\tback\\\\slash\t50\n'
+                'course2\t2014-05-01\t2014-05-08\t\\\\N\t51\n'
+            ]
+        )
+
+    def test_bulk_insert_rows_null_values_are_case_sensitive(self):
+        source = self._get_source_string(4)
+        for value in ('none', 'NONE', 'Inf', '\\n'):
+            source = source.replace('ACTIVE', value, 1)
+        task = self.create_task(source=source, bulk_load=True)
+        cursor = MagicMock()
+        loaded_data = []
+        cursor.execute.side_effect = lambda query: loaded_data.append(read_load_data_file(query))
+        task.bulk_insert_rows(cursor)
+
+        query = cursor.execute.call_args[0][0]
+        for name in ('course_id', 'interval_start', 'interval_end', 'label', 'count'):
+            self.assertIn(
+                "{0} = IF(BINARY @{0} IN ('\\\\N', 'None', 'inf', '-inf'), NULL, @{0})".format(name), query
+            )
+        self.assertEquals(
+            [line.split('\t')[3] for line in loaded_data[0].splitlines()],
+            ['none', 'NONE', 'Inf', '\\\\n']
+        )
+        self.assertEquals(
+            [coerce_for_mysql_connect(value) for value in ('none', 'NONE', 'Inf', '\\n')],
+            [u'none', u'NONE', u'Inf', u'\\n']
+        )
+
+    def test_bulk_insert_rows_from_rows(self):
+        task = self.create_task(cls=InsertToMysqlDummyTableFromRows, bulk_load=True)
+        cursor = MagicMock()
+        loaded_data = []
+        cursor.execute.side_effect = lambda query: loaded_data.append(read_load_data_file(query))
+        task.bulk_insert_rows(cursor)
+        self.assertEquals(
+            loaded_data,
+            [
+                'course1\t2014-05-01\t2014-05-08\t\xe5\x8c\x85\\tzi\t1\n'
+                'course2\t\\N\t2014-05-08\tback\\\\slash\t2\n'
+            ]
+        )
+
+    def test_bulk_insert_rows_not_square(self):
+        source = self._get_source_string(4).replace('ACTIVE', 'AC\tTIVE', 1)
+        task = self.create_task(source=source, bulk_load=True)
+        cursor = MagicMock()
+        cursor.execute.side_effect = read_load_data_file
+        with self.assertRaisesRegexp(Exception, 'Misaligned data'):
+            task.bulk_insert_rows(cursor)
+
+    def test_bulk_insert_rows_with_query_failure(self):
+        task = self.create_task(source=self._get_source_string(4), bulk_load=True)
+        cursor = MagicMock()
+        cursor.execute.side_effect = ValueError('query failed')
+        with self.assertRaisesRegexp(ValueError, 'query failed'):
+            task.bulk_insert_rows(cursor)
+
+    def test_bulk_insert_rows_with_failure_while_reading(self):
+        # Write more than the pipe can hold, so that the thread writing it is blocked when the query fails.
+        task = self.create_task(source=self._get_source_string(20000), bulk_load=True)
+        cursor = MagicMock()
+
+        def read_then_fail(query):
+            """Reads part of the file before failing."""
+            with open(re.search(r"INFILE '([^']*)'", query).group(1), 'rb') as load_data_file:
+                load_data_file.read(100)
+            raise ValueError('query failed')
+
+        cursor.execute.side_effect = read_then_fail
+        with self.assertRaisesRegexp(ValueError, 'query failed'):
+            task.bulk_insert_rows(cursor)
+
+    def test_bulk_overwrite_with_empty_results(self):
+        task = self.create_task(source='   ', overwrite=True, bulk_load=True)
+        task.rows = MagicMock(return_value=[])
+        cursor = MagicMock()
+        cursor.execute.side_effect = read_load_data_file
+        with self.assertRaisesRegexp(Exception, 'Cannot overwrite a table with an empty result set.'):
+            task.bulk_insert_rows(cursor)
+
+    def test_run_with_bulk_load(self):
+        task = self.create_task(bulk_load=True)
+        self.mock_mysql_connector.connect.return_value.cursor.return_value.execute.side_effect = (
+            lambda query, *_args: read_load_data_file(query) if query.startswith('LOAD DATA') else None
+        )
+        task.run()
+        self.assertIn(
+            call(
+                user='exampleuser', password='example password', host='db.example.com', port=3306,
+                database='to_database', autocommit=False, allow_local_infile=True
+            ),
+            self.mock_mysql_connector.connect.call_args_list
+        )
+        self.assertTrue(self.mock_mysql_connector.connect().commit.called)
+
+    def get_executed_queries(self):
+        """Returns the queries executed by the mock connection, with any parameters."""
+        mock_cursor = self.mock_mysql_connector.connect.return_value.cursor.return_value
+        return [execute_call[1][0] for execute_call in mock_cursor.execute.mock_calls]
+
+    def test_swap_staging_table(self):
+        task = self.create_task(cls=InsertIntoMysqlDummyTableWithIndexes, overwrite=True, use_staging_table=True)
+        task.run()
+        table_names = {
+            'staging_table': task.swap_table_name('_staging'),
+            'old_table': task.swap_table_name('_old'),
+        }
+
+        queries = self.get_executed_queries()
+        load_queries = queries[queries.index(
+            "DROP TABLE IF EXISTS {staging_table}, {old_table}".format(**table_names)
+        ):]
+        self.assertEquals(load_queries[1], (
+            "CREATE TABLE IF NOT EXISTS {staging_table} "
+            "(id BIGINT(20) NOT NULL AUTO_INCREMENT,course_id VARCHAR(255),"
+            "interval_start DATETIME,interval_end DATETIME,label VARCHAR(255),"
+            "count INT,created TIMESTAMP DEFAULT NOW(),PRIMARY KEY (id))".format(**table_names)
+        ))
+        self.assertTrue(load_queries[2].startswith('INSERT INTO {staging_table} '.format(**table_names)))
+        self.assertEquals(load_queries[3:6], [
+            "ALTER TABLE {staging_table} ADD INDEX (course_id), ADD INDEX (interval_start,interval_end)".format(
+                **table_names
+            ),
+            "RENAME TABLE dummy_table TO {old_table}, {staging_table} TO dummy_table".format(**table_names),
+            "DELETE FROM table_updates where `target_table`='dummy_table'",
+        ])
+        self.assertEquals(load_queries[-1], "DROP TABLE {old_table}".format(**table_names))
+        self.assertNotIn("DELETE FROM dummy_table", queries)
+        self.assertTrue(self.mock_mysql_connector.connect().commit.called)
+
+    def test_complete_after_swap_staging_table(self):
+        task = self.create_task(overwrite=True, use_staging_table=True)
+        self.assertFalse(task.complete())
+        task.run()
+
+        with patch.object(task.output(), 'exists', return_value=True) as mock_exists:
+            self.assertTrue(task.complete())
+        self.assertTrue(mock_exists.called)
+
+    def test_swap_staging_table_to_predefined_table(self):
+        task = self.create_task(cls=InsertToPredefinedMysqlDummyTable, overwrite=True, use_staging_table=True)
+        task.create_table = MagicMock()
+        task.run()
+
+        queries = self.get_executed_queries()
+        self.assertIn(
+            "CREATE TABLE {staging_table} LIKE dummy_table".format(staging_table=task.swap_table_name('_staging')),
+            queries
+        )
+        self.assertFalse(any(query.startswith('ALTER TABLE') for query in queries))
+
+    def test_swap_staging_table_with_failure(self):
+        task = self.create_task(source='   ', overwrite=True, use_staging_table=True)
+        with self.assertRaisesRegexp(Exception, 'Cannot overwrite a table with an empty result set.'):
+            task.run()
+
+        queries = self.get_executed_queries()
+        self.assertEquals(
+            queries[-1],
+            "DROP TABLE IF EXISTS {staging_table}".format(staging_table=task.swap_table_name('_staging'))
+        )
+        self.assertFalse(any(query.startswith('RENAME TABLE') for query in queries))
+        self.assertTrue(self.mock_mysql_connector.connect().rollback.called)
+
+    def test_swap_table_name(self):
+        task = self.create_task()
+        self.assertEquals(
+            task.swap_table_name('_staging'),
+            'dummy_table_staging_' + hashlib.md5(task.update_id()).hexdigest()[:16]
+        )
+        self.assertEquals(task.swap_table_name('_staging'), self.create_task().swap_table_name('_staging'))
+        other_task = self.create_task(cls=InsertIntoMysqlDummyTableWithIndexes)
+        self.assertEquals(other_task.table, task.table)
+        self.assertNotEquals(other_task.swap_table_name('_staging'), task.swap_table_name('_staging'))
+
+    def test_swap_table_name_of_long_table(self):
+        task = self.create_task()
+        with patch.object(InsertToMysqlDummyTable, 'table', 'x' * 64):
+            staging_table = task.swap_table_name('_staging')
+        self.assertEquals(len(staging_table), 64)
+        self.assertTrue(staging_table.startswith('xxx'))
+        self.assertTrue(staging_table.endswith('_staging_' + hashlib.md5(task.update_id()).hexdigest()[:16]))
+
+    def test_staging_table_without_overwrite(self):
+        self.create_task(use_staging_table=True).run()
+        self.assertFalse(any('dummy_table_staging' in query for query in self.get_executed_queries()))
+
+    def get_source_row_digest(self, num):
+        """Returns the digest of a row in the string returned by _get_source_string()."""
+        return get_row_digest(['course{0}'.format(num + 1), '2014-05-01', '2014-05-08', 'ACTIVE', str(num + 50)])
+
+    def test_merge_rows(self):
+        task = self.create_task(
+            cls=IncrementalInsertToMysqlDummyTable, source=self._get_source_string(3), overwrite=True, diff_load=True
+        )
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [
+            (1, self.get_source_row_digest(0)),
+            (2, self.get_source_row_digest(0)),
+            (3, 'stale'),
+            (4, None),
+            (5, self.get_source_row_digest(2)),
+        ]
+        task.merge_rows(cursor)
+
+        execute_calls = cursor.execute.mock_calls
+        self.assertEquals(len(execute_calls), 3)
+        self.assertEquals(
+            execute_calls[0][1][0],
+            "SELECT id, row_digest FROM dummy_table WHERE interval_start='2014-05-01'"
+        )
+        self.assertEquals(execute_calls[1][1], (
+            "INSERT INTO dummy_table (course_id,interval_start,interval_end,label,count,row_digest) "
+            "VALUES (%s,%s,%s,%s,%s,%s)",
+            [u'course2', u'2014-05-01', u'2014-05-08', u'ACTIVE', u'51', self.get_source_row_digest(1)]
+        ))
+        self.assertEquals(execute_calls[2][1][0], "DELETE FROM dummy_table WHERE id IN (%s,%s,%s)")
+        self.assertEquals(sorted(execute_calls[2][1][1]), [2, 3, 4])
+
+    def test_merge_rows_in_chunks(self):
+        task = self.create_task(
+            cls=IncrementalInsertToMysqlDummyTable, source=self._get_source_string(3), overwrite=True, diff_load=True,
+            insert_chunk_size=2,
+        )
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [(1, 'stale'), (2, 'stale'), (3, 'stale')]
+        task.merge_rows(cursor)
+
+        queries = [execute_call[1][0] for execute_call in cursor.execute.mock_calls]
+        self.assertEquals(queries[1:], [
+            "INSERT INTO dummy_table (course_id,interval_start,interval_end,label,count,row_digest) "
+            "VALUES (%s,%s,%s,%s,%s,%s),(%s,%s,%s,%s,%s,%s)",
+            "INSERT INTO dummy_table (course_id,interval_start,interval_end,label,count,row_digest) "
+            "VALUES (%s,%s,%s,%s,%s,%s)",
+            "DELETE FROM dummy_table WHERE id IN (%s,%s)",
+            "DELETE FROM dummy_table WHERE id IN (%s)",
+        ])
+
+    def test_merge_rows_without_overwrite(self):
+        task = self.create_task(cls=IncrementalInsertToMysqlDummyTable, source=self._get_source_string(2), diff_load=True)
+        cursor = MagicMock()
+        task.merge_rows(cursor)
+
+        execute_calls = cursor.execute.mock_calls
+        self.assertEquals(len(execute_calls), 1)
+        self.assertTrue(execute_calls[0][1][0].startswith('INSERT INTO dummy_table '))
+        self.assertFalse(cursor.fetchall.called)
+
+    def test_merge_rows_not_square(self):
+        source = self._get_source_string(2).replace('ACTIVE', 'AC\tTIVE', 1)
+        task = self.create_task(cls=IncrementalInsertToMysqlDummyTable, source=source, overwrite=True, diff_load=True)
+        cursor = MagicMock()
+        cursor.fetchall.return_value = []
+        with self.assertRaisesRegexp(Exception, 'Misaligned data in mysql_load'):
+            task.merge_rows(cursor)
+
+    def test_run_with_diff_load(self):
+        mock_cursor = self.mock_mysql_connector.connect.return_value.cursor.return_value
+        mock_cursor.fetchall.return_value = []
+        task = self.create_task(cls=IncrementalInsertToMysqlDummyTable, overwrite=True, diff_load=True)
+        task.run()
+
+        queries = self.get_executed_queries()
+        self.assertIn("SHOW COLUMNS FROM dummy_table LIKE 'row_digest'", queries)
+        self.assertIn("ALTER TABLE dummy_table ADD COLUMN row_digest CHAR(32)", queries)
+        self.assertNotIn("DELETE FROM dummy_table WHERE interval_start='2014-05-01'", queries)
+        self.assertTrue(any(query.startswith('INSERT INTO dummy_table ') for query in queries))
+        self.assertTrue(self.mock_mysql_connector.connect().commit.called)
+
+    def test_run_incremental_without_diff_load(self):
+        self.create_task(cls=IncrementalInsertToMysqlDummyTable, overwrite=True).run()
+
+        queries = self.get_executed_queries()
+        self.assertIn("DELETE FROM dummy_table WHERE interval_start='2014-05-01'", queries)
+        self.assertFalse(any('row_digest' in query for query in queries))
+
 
 class MySQLLoadHelperFuncTests(unittest.TestCase):
     """
@@ -284,3 +608,13 @@ class MySQLLoadHelperFuncTests(unittest.TestCase):
     def test_coerce_for_mysql_connect(self):
         for input, output in self.COERCE_TEST_CASES:
             self.assertEqual(coerce_for_mysql_connect(input), output)
+
+    def test_escape_for_mysql_load_data(self):
+        for input, output in [
+            (None, '\\N'),
+            ('None', '\\N'),
+            (1, '1'),
+            ('a\tb\nc\\d', 'a\\tb\\nc\\\\d'),
+            (u'\u5305\u5b50', '\xe5\x8c\x85\xe5\xad\x90'),
+        ]:
+            self.assertEqual(escape_for_mysql_load_data(input), output)
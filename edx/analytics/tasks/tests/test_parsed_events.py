@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Tests for storing and reading pre-parsed tracking log events."""
+
+import json
+
+import luigi
+import luigi.task
+from mock import MagicMock
+
+from edx.analytics.tasks.overall_events import TotalEventsDailyTask
+from edx.analytics.tasks.parsed_events import (
+    encode_parsed_event, decode_parsed_event, ParsedEventsTask, ParsedEventSelectionMixin
+)
+from edx.analytics.tasks.tests import unittest
+from edx.analytics.tasks.tests.map_reduce_mixins import MapperTestMixin
+from edx.analytics.tasks.util import eventlog
+
+
+SAMPLE_EVENT = {
+    "username": "test_user",
+    "host": "test_host",
+    "event_source": "server",
+    "event_type": "problem_check",
+    "context": {
+        "course_id": "foo/bar/baz",
+        "user_id": 10,
+    },
+    "time": "2013-12-17T15:38:32.805444+00:00",
+    "ip": "127.0.0.1",
+    "event": {
+        "problem_id": "i4x://foo/bar/problem/baz",
+        "success": "correct",
+    },
+    "agent": "blah, blah, blah",
+    "page": None
+}
+
+
+def round_trip(event, fields=None):
+    """Parse an event the way it appears in the tracking log and then encode and decode it."""
+    parsed = eventlog.parse_json_event(json.dumps(event))
+    return parsed, decode_parsed_event('\t'.join(encode_parsed_event(parsed)), fields)
+
+
+class ParsedEventEncodingTest(unittest.TestCase):
+    """Test conversion of events to and from the parsed event format."""
+
+    def assert_round_trip(self, event):
+        """Assert that an event survives encoding and decoding unchanged."""
+        parsed, decoded = round_trip(event)
+        self.assertEquals(decoded, parsed)
+
+    def test_round_trip(self):
+        self.assert_round_trip(SAMPLE_EVENT)
+
+    def test_special_characters(self):
+        event = dict(SAMPLE_EVENT)
+        event['username'] = u'tab\there\\N\nnewline\\t\r'
+        event['event_type'] = u'\u00e9v\u00e9nement'
+        self.assert_round_trip(event)
+
+    def test_null_literal(self):
+        event = dict(SAMPLE_EVENT)
+        event['username'] = '\\N'
+        self.assert_round_trip(event)
+
+    def test_missing_and_non_string_fields(self):
+        event = dict(SAMPLE_EVENT)
+        del event['context']
+        del event['event_type']
+        event['username'] = None
+        event['event_source'] = 12
+        event['event'] = '{"nested": "json string"}'
+        self.assert_round_trip(event)
+
+    def test_field_projection(self):
+        parsed, decoded = round_trip(SAMPLE_EVENT, fields=('username', 'context'))
+        self.assertEquals(decoded['context'], parsed['context'])
+        self.assertEquals(decoded['username'], parsed['username'])
+        self.assertNotIn('event', decoded)
+        self.assertNotIn('ip', decoded)
+
+    def test_malformed_line(self):
+        self.assertIsNone(decode_parsed_event('not\ta\tparsed\tevent'))
+
+
+class ParsedEventsTaskTest(MapperTestMixin, unittest.TestCase):
+    """Test the task that converts raw events into the parsed event format."""
+
+    task_class = ParsedEventsTask
+
+    def setUp(self):
+        super(ParsedEventsTaskTest, self).setUp()
+        self.create_task(warehouse_path='/tmp/warehouse/')
+
+    def test_mapper(self):
+        line = json.dumps(SAMPLE_EVENT)
+        self.assert_single_map_output(
+            line, '2013-12-17', encode_parsed_event(eventlog.parse_json_event(line))
+        )
+
+    def test_mapper_outside_interval(self):
+        event = dict(SAMPLE_EVENT)
+        event['time'] = '2013-12-18T15:38:32.805444+00:00'
+        self.assert_no_map_output_for(json.dumps(event))
+
+    def test_reducer(self):
+        output_file = MagicMock()
+        self.task.multi_output_reducer('2013-12-17', [('a', 'b'), ('c', 'd')], output_file)
+        self.assertEquals(
+            ''.join(call[0][0] for call in output_file.write.call_args_list),
+            'a\tb\nc\td\n'
+        )
+
+    def test_output_path_for_key(self):
+        self.assertEquals(
+            self.task.output_path_for_key('2013-12-17'),
+            '/tmp/warehouse/parsed_events/dt=2013-12-17/parsed_events_2013-12-17'
+        )
+
+
+class ParsedTotalEventsDailyTask(ParsedEventSelectionMixin, TotalEventsDailyTask):
+    """Counts events per day using pre-parsed events."""
+
+    parsed_event_fields = ('time',)
+
+
+class ParsedEventSelectionMixinTest(unittest.TestCase):
+    """Test reading parsed events from a downstream job."""
+
+    def setUp(self):
+        luigi.task.Register.clear_instance_cache()
+        self.task = ParsedTotalEventsDailyTask(
+            interval=luigi.DateIntervalParameter().parse('2013-12-17-2013-12-19'),
+            output_root='/tmp/output',
+            warehouse_path='/tmp/warehouse/',
+            mapreduce_engine='local',
+        )
+        self.task.init_local()
+
+    def test_mapper(self):
+        line = '\t'.join(encode_parsed_event(eventlog.parse_json_event(json.dumps(SAMPLE_EVENT))))
+        self.assertEquals(list(self.task.mapper(line)), [('2013-12-17', 1)])
+
+    def test_requires_hadoop(self):
+        self.assertEquals(
+            [task.url for task in self.task.requires_hadoop()],
+            [
+                '/tmp/warehouse/parsed_events/dt=2013-12-17/parsed_events_2013-12-17',
+                '/tmp/warehouse/parsed_events/dt=2013-12-18/parsed_events_2013-12-18',
+            ]
+        )
+        self.assertIsInstance(self.task.requires_local(), ParsedEventsTask)
@@ -1,15 +1,23 @@
 """Test selection of event log files."""
 
 import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
 
+import luigi.task
 from mock import patch
 
 from luigi.date_interval import Month
+from luigi.parameter import DateIntervalParameter
 
-from edx.analytics.tasks.pathutil import PathSelectionByDateIntervalTask
+from edx.analytics.tasks.pathutil import PathSelectionByDateIntervalTask, PathSetTask
 from edx.analytics.tasks.url import UncheckedExternalURL
 from edx.analytics.tasks.tests import unittest
 from edx.analytics.tasks.tests.config import with_luigi_config
+from edx.analytics.tasks.util.event_log_index import EventLogIndex
 
 
 class PathSelectionByDateIntervalTaskTest(unittest.TestCase):
@@ -186,3 +194,209 @@ class PathSelectionByDateIntervalTaskTest(unittest.TestCase):
             pattern=['baz']
         )
         self.assertEquals(task.pattern, ('baz',))
+
+
+class PathSelectionWithIndexTest(unittest.TestCase):
+    """Test selection of event log files that have been indexed."""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+
+    def create_log_file(self, date_string, index=None):
+        """Create an empty tracking log file, and its index if one is provided."""
+        path = os.path.join(self.source, 'tracking.log-{0}.gz'.format(date_string))
+        open(path, 'w').close()
+        if index is not None:
+            with open(path + '.index.json', 'w') as index_file:
+                index_file.write(index.to_json())
+        return path
+
+    def get_selected_paths(self, **kwargs):
+        """Returns the paths selected for the first few days of March, 2014."""
+        task = PathSelectionByDateIntervalTask(
+            source=[self.source],
+            interval=DateIntervalParameter().parse('2014-03-02-2014-03-04'),
+            pattern=[r'.*tracking.log-(?P<date>\d{8}).*\.gz'],
+            expand_interval=datetime.timedelta(1),
+            **kwargs
+        )
+        return [t.url for t in task.requires()]
+
+    def test_unindexed_files(self):
+        paths = [self.create_log_file(date_string) for date_string in ('20140301', '20140302', '20140304')]
+        self.assertItemsEqual(self.get_selected_paths(), paths)
+
+    def test_index_date_range(self):
+        outside = self.create_log_file('20140301', EventLogIndex({'play_video': 1}, '2014-02-28', '2014-03-01'))
+        overlapping = self.create_log_file('20140304', EventLogIndex({'play_video': 1}, '2014-03-03', '2014-03-04'))
+        self.assertNotIn(outside, self.get_selected_paths())
+        self.assertEquals(self.get_selected_paths(), [overlapping])
+
+    def test_index_event_types(self):
+        videos = self.create_log_file('20140302', EventLogIndex({'play_video': 1}, '2014-03-02', '2014-03-02'))
+        self.create_log_file('20140303', EventLogIndex({'problem_check': 1, '/': 2}, '2014-03-03', '2014-03-03'))
+        unindexed = self.create_log_file('20140304')
+        self.assertItemsEqual(
+            self.get_selected_paths(event_types=['play_video', 'pause_video']),
+            [videos, unindexed]
+        )
+
+    def test_unreadable_index(self):
+        path = self.create_log_file('20140302')
+        with open(path + '.index.json', 'w') as index_file:
+            index_file.write('not json')
+        self.assertEquals(self.get_selected_paths(event_types=['play_video']), [path])
+
+    def test_indexes_read_concurrently(self):
+        index = EventLogIndex({'play_video': 1}, '2014-03-02', '2014-03-02')
+        paths = [self.create_log_file('201403{0:02d}'.format(day), index) for day in (1, 2, 3, 4)]
+        state = {'in_flight': 0, 'max_in_flight': 0}
+        lock = threading.Lock()
+        should_include_indexed_url = PathSelectionByDateIntervalTask.should_include_indexed_url
+
+        def count_in_flight(task, url):
+            """Records how many indexes are read at the same time."""
+            with lock:
+                state['in_flight'] += 1
+                state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            time.sleep(0.05)
+            with lock:
+                state['in_flight'] -= 1
+            return should_include_indexed_url(task, url)
+
+        with patch.object(PathSelectionByDateIntervalTask, 'should_include_indexed_url', autospec=True) as mock_read:
+            mock_read.side_effect = count_in_flight
+            self.assertItemsEqual(self.get_selected_paths(listing_threads=4), paths)
+
+        self.assertEquals(mock_read.call_count, 4)
+        self.assertGreater(state['max_in_flight'], 1)
+
+    @patch('edx.analytics.tasks.pathutil.get_s3_key')
+    @patch('edx.analytics.tasks.pathutil.boto.connect_s3')
+    def test_s3_index_thread_connection(self, connect_s3_mock, get_s3_key_mock):
+        index = EventLogIndex({'play_video': 1}, '2014-02-28', '2014-03-01')
+        get_s3_key_mock.return_value.get_contents_as_string.return_value = index.to_json()
+        task = PathSelectionByDateIntervalTask(
+            source=['s3://bucket/logs/'],
+            interval=DateIntervalParameter().parse('2014-03-02-2014-03-04'),
+            pattern=[r'.*tracking.log-(?P<date>\d{8}).*\.gz'],
+            listing_threads=2,
+        )
+        url = 's3://bucket/logs/tracking.log-20140302.gz'
+
+        self.assertEquals(task.get_excluded_indexed_urls([url]), set([url]))
+        self.assertEquals(get_s3_key_mock.call_args[0], (connect_s3_mock.return_value, url + '.index.json'))
+        self.assertIsNone(task.s3_conn)
+
+
+class PathSelectionCacheTest(unittest.TestCase):
+    """Test caching the list of selected event log files."""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root)
+
+        self.paths = [self.create_log_file(date_string) for date_string in ('20140302', '20140303')]
+
+    def create_log_file(self, date_string):
+        """Create an empty tracking log file."""
+        path = os.path.join(self.source, 'tracking.log-{0}.gz'.format(date_string))
+        open(path, 'w').close()
+        return path
+
+    def get_selected_paths(self, interval='2014-03-02-2014-03-04'):
+        """Returns the paths selected for the interval."""
+        # Make sure that a new task is created, instead of reusing the requirements of the previous one.
+        luigi.task.Register.clear_instance_cache()
+        task = PathSelectionByDateIntervalTask(
+            source=[self.source],
+            interval=DateIntervalParameter().parse(interval),
+            pattern=[r'.*tracking.log-(?P<date>\d{8}).*\.gz'],
+            expand_interval=datetime.timedelta(0),
+            selection_cache_root=self.cache_root,
+        )
+        return [t.url for t in task.requires()]
+
+    def test_cached_selection(self):
+        self.assertItemsEqual(self.get_selected_paths(), self.paths)
+        self.assertEquals(len(os.listdir(self.cache_root)), 1)
+
+        self.create_log_file('20140303-1')
+        self.assertItemsEqual(self.get_selected_paths(), self.paths)
+
+    def test_different_interval(self):
+        self.assertItemsEqual(self.get_selected_paths(), self.paths)
+        self.assertItemsEqual(self.get_selected_paths('2014-03-03-2014-03-04'), self.paths[1:])
+        self.assertEquals(len(os.listdir(self.cache_root)), 2)
+
+    def test_recent_selection_not_cached(self):
+        today = datetime.date.today()
+        interval = '{0}-{1}'.format(today - datetime.timedelta(1), today + datetime.timedelta(1))
+        self.assertEquals(self.get_selected_paths(interval), [])
+        self.assertEquals(os.listdir(self.cache_root), [])
+
+
+class PathSelectionWithListingCacheTest(unittest.TestCase):
+    """Test selection of event log files using a persistent cache of listings."""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root)
+
+    def create_log_file(self, date_string):
+        """Create an empty tracking log file."""
+        path = os.path.join(self.source, 'tracking.log-{0}.gz'.format(date_string))
+        open(path, 'w').close()
+        return path
+
+    def get_selected_paths(self):
+        """Returns the paths selected for the first few days of March, 2014."""
+        luigi.task.Register.clear_instance_cache()
+        task = PathSelectionByDateIntervalTask(
+            source=[self.source],
+            interval=DateIntervalParameter().parse('2014-03-02-2014-03-04'),
+            pattern=[r'.*tracking.log-(?P<date>\d{8}).*\.gz'],
+            expand_interval=datetime.timedelta(0),
+            listing_cache_root=self.cache_root,
+        )
+        return [t.url for t in task.requires()]
+
+    def test_listing_cache(self):
+        paths = [self.create_log_file('20140301'), self.create_log_file('20140302')]
+        self.assertEquals(self.get_selected_paths(), paths[1:])
+        self.assertEquals(len(os.listdir(self.cache_root)), 1)
+
+        paths.append(self.create_log_file('20140303'))
+        os.utime(self.source, (0, 0))
+        self.assertEquals(self.get_selected_paths(), paths[1:])
+
+
+class PathSetTaskTest(unittest.TestCase):
+    """Test selection of files using patterns."""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+
+    def test_requires_lists_once(self):
+        path = os.path.join(self.source, 'tracking.log')
+        open(path, 'w').close()
+        task = PathSetTask(src=[self.source], include=['*.log'])
+        with patch('edx.analytics.tasks.pathutil.os.walk', wraps=os.walk) as mock_walk:
+            self.assertEquals([t.url for t in task.requires()], [path])
+            self.assertEquals([t.url for t in task.requires()], [path])
+        self.assertEquals(mock_walk.call_count, 1)
+
+    def test_positional_parameters(self):
+        path = os.path.join(self.source, 'tracking.log')
+        open(path, 'w').close()
+        open(os.path.join(self.source, 'tracking.txt'), 'w').close()
+        task = PathSetTask([self.source], ['*.log'])
+        self.assertEquals(task.src, (self.source,))
+        self.assertEquals(task.include, ('*.log',))
+        self.assertEquals([t.url for t in task.requires()], [path])
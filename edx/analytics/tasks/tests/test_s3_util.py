@@ -1,4 +1,5 @@
 """Tests for S3--related utility functionality."""
+from boto.s3.prefix import Prefix
 from mock import MagicMock, patch
 
 from edx.analytics.tasks import s3_util
@@ -97,6 +98,85 @@ class GenerateS3SourcesTestCase(unittest.TestCase):
         ]))
 
 
+class FakeBucket(object):
+    """A test double of a boto bucket that supports listing keys with a delimiter."""
+
+    def __init__(self, key_names):
+        self.key_names = sorted(key_names)
+        self.list_calls = []
+
+    def list(self, prefix='', delimiter='', marker=''):
+        """Returns the keys, and the common prefixes if there is a delimiter, that start with the prefix."""
+        self.list_calls.append((prefix, delimiter))
+        entries = []
+        for key_name in self.key_names:
+            if not key_name.startswith(prefix) or key_name <= marker:
+                continue
+            delimiter_index = key_name.find(delimiter, len(prefix)) if delimiter else -1
+            if delimiter_index >= 0:
+                folder_name = key_name[:delimiter_index + 1]
+                if not entries or entries[-1].name != folder_name:
+                    entries.append(Prefix(name=folder_name))
+            else:
+                entry = MagicMock(size=10, etag='"etag"', last_modified='2014-03-01T00:00:00.000Z')
+                entry.key = entry.name = key_name
+                entries.append(entry)
+        return entries
+
+
+class ListS3KeysTestCase(unittest.TestCase):
+    """Tests for list_s3_keys()."""
+
+    KEY_NAMES = [
+        'logs/a.txt',
+        'logs/server1/tracking.log-1.gz',
+        'logs/server1/tracking.log-2.gz',
+        'logs/server2/nested/tracking.log-1.gz',
+        'logs/server3/tracking.log-1.gz',
+        'logs/z.txt',
+        'logs2/other.txt',
+    ]
+
+    def setUp(self):
+        self.bucket = FakeBucket(self.KEY_NAMES)
+        self.s3_conn = MagicMock()
+        self.s3_conn.get_bucket.return_value = self.bucket
+
+        patcher = patch('edx.analytics.tasks.s3_util.boto.connect_s3')
+        self.mock_connect_s3 = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_connect_s3.return_value.get_bucket.return_value = self.bucket
+
+    def list_key_names(self, prefix, num_threads):
+        """Returns the names of the keys listed."""
+        return [key.key for key in s3_util.list_s3_keys(self.s3_conn, 'bucket', prefix, num_threads)]
+
+    def test_single_thread(self):
+        self.assertEquals(self.list_key_names('logs/', 1), self.KEY_NAMES[:-1])
+        self.assertEquals(self.bucket.list_calls, [('logs/', '')])
+
+    def test_multiple_threads(self):
+        self.assertEquals(self.list_key_names('logs/', 4), self.KEY_NAMES[:-1])
+        self.assertItemsEqual(
+            self.bucket.list_calls,
+            [('logs/', '/'), ('logs/server1/', ''), ('logs/server2/', ''), ('logs/server3/', '')]
+        )
+
+    def test_prefix_without_slash(self):
+        self.assertEquals(self.list_key_names('logs', 2), self.KEY_NAMES)
+
+    def test_empty_prefix(self):
+        self.assertEquals(self.list_key_names('', 2), self.KEY_NAMES)
+        self.assertItemsEqual(self.bucket.list_calls, [('', '/'), ('logs/', ''), ('logs2/', '')])
+
+    def test_descend_into_single_folder(self):
+        self.assertEquals(self.list_key_names('logs/server2/', 2), ['logs/server2/nested/tracking.log-1.gz'])
+        self.assertEquals(self.bucket.list_calls, [('logs/server2/', '/'), ('logs/server2/nested/', '/')])
+
+    def test_empty_listing(self):
+        self.assertEquals(self.list_key_names('missing/', 2), [])
+
+
 class ScalableS3ClientTestCase(unittest.TestCase):
     """Tests for ScalableS3Client class."""
 
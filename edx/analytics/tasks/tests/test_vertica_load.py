@@ -3,9 +3,14 @@ Ensure we can write to Vertica data sources.
 """
 from __future__ import absolute_import
 
+import hashlib
+import os
+import shutil
+import tempfile
 import textwrap
 
 import luigi
+import luigi.hdfs
 import luigi.task
 
 from mock import call
@@ -89,8 +94,11 @@ class VerticaCopyTaskTest(unittest.TestCase):
         patcher = patch('edx.analytics.tasks.vertica_load.vertica_python.vertica')
         self.mock_vertica_connector = patcher.start()
         self.addCleanup(patcher.stop)
+        self.mock_cursor = self.mock_vertica_connector.connect.return_value.cursor.return_value
+        self.temp_dir = None
 
-    def create_task(self, credentials=None, source=None, overwrite=False, cls=CopyToVerticaDummyTable):
+    def create_task(self, credentials=None, source=None, overwrite=False, cls=CopyToVerticaDummyTable,
+                    copy_connections=1, source_target=None):
         """
          Emulate execution of a generic VerticaCopyTask.
         """
@@ -99,7 +107,8 @@ class VerticaCopyTaskTest(unittest.TestCase):
         luigi.task.Register.clear_instance_cache()
         task = cls(
             credentials=sentinel.ignored,
-            overwrite=overwrite
+            overwrite=overwrite,
+            copy_connections=copy_connections,
         )
 
         if not credentials:
@@ -116,7 +125,7 @@ class VerticaCopyTaskTest(unittest.TestCase):
 
         fake_input = {
             'credentials': FakeTarget(value=textwrap.dedent(credentials)),
-            'insert_source': FakeTarget(value=textwrap.dedent(source))
+            'insert_source': source_target or FakeTarget(value=textwrap.dedent(source))
         }
 
         fake_output = MagicMock(return_value=self.mock_vertica_connector)
@@ -327,3 +336,116 @@ class VerticaCopyTaskTest(unittest.TestCase):
             call('SELECT start_refresh();'),
         ]
         self.assertEquals(expected, mock_cursor.execute.mock_calls)
+
+    def capture_copies(self):
+        """Records the data copied by the mock connection, and returns the list that it is appended to."""
+        copied_data = []
+        self.mock_cursor.copy.side_effect = lambda query, source_file: copied_data.append(source_file.read())
+        return copied_data
+
+    def write_file(self, name, content):
+        """Writes a file in a temporary directory, and returns its path."""
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, self.temp_dir)
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as output_file:
+            output_file.write(content)
+        return path
+
+    def get_executed_queries(self):
+        """Returns the queries executed by the mock connection."""
+        return [execute_call[1][0] for execute_call in self.mock_cursor.execute.mock_calls]
+
+    @with_luigi_config(('vertica-export', 'schema', 'foobar'))
+    def test_parallel_copy_local_file(self):
+        source = self._get_source_string(10)
+        path = self.write_file('source.tsv', source)
+        copied_data = self.capture_copies()
+        task = self.create_task(copy_connections=3, source_target=luigi.LocalTarget(path))
+        task.run()
+        staging_table = task.staging_table_name()
+
+        self.assertEquals(len(copied_data), 3)
+        self.assertEquals(sorted(''.join(copied_data).splitlines()), sorted(source.splitlines()))
+        for copy_call in self.mock_cursor.copy.mock_calls:
+            self.assertEquals(
+                copy_call[1][0],
+                "COPY foobar.{staging_table} (course_id,interval_start,interval_end,label,count) "
+                "FROM STDIN DELIMITER AS E'\t' NULL AS '\\N' DIRECT ABORT ON ERROR;".format(staging_table=staging_table)
+            )
+
+        queries = self.get_executed_queries()
+        self.assertEquals(queries[2:4], [
+            "DROP TABLE IF EXISTS foobar.{staging_table}".format(staging_table=staging_table),
+            "CREATE TABLE foobar.{staging_table} (course_id VARCHAR(255),interval_start DATETIME,"
+            "interval_end DATETIME,label VARCHAR(255),count INT)".format(staging_table=staging_table),
+        ])
+        self.assertIn(
+            "INSERT /*+ DIRECT */ INTO foobar.dummy_table (course_id,interval_start,interval_end,label,count) "
+            "SELECT course_id,interval_start,interval_end,label,count FROM foobar.{staging_table};".format(
+                staging_table=staging_table
+            ),
+            queries
+        )
+        self.assertEquals(queries[-1], "DROP TABLE IF EXISTS foobar.{staging_table}".format(staging_table=staging_table))
+        self.assertTrue(self.mock_vertica_connector.connect().commit.called)
+        self.assertFalse(self.mock_vertica_connector.connect().rollback.called)
+
+    def test_staging_table_name(self):
+        task = self.create_task()
+        self.assertEquals(
+            task.staging_table_name(),
+            'dummy_table_staging_' + hashlib.md5(task.update_id()).hexdigest()
+        )
+        self.assertEquals(task.staging_table_name(), self.create_task().staging_table_name())
+        other_task = self.create_task(cls=CopyToVerticaDummyTableWithProjections)
+        self.assertEquals(other_task.table, task.table)
+        self.assertNotEquals(other_task.staging_table_name(), task.staging_table_name())
+
+    def test_parallel_copy_directory(self):
+        self.write_file('part-00000', self._get_source_string(2))
+        self.write_file('part-00001', self._get_source_string(3))
+        self.write_file('_SUCCESS', '')
+        self.write_file('.part-00000.crc', 'checksum')
+        copied_data = self.capture_copies()
+        self.create_task(copy_connections=4, source_target=luigi.LocalTarget(self.temp_dir)).run()
+
+        self.assertEquals(
+            sorted(copied_data),
+            sorted([self._get_source_string(2), self._get_source_string(3)])
+        )
+
+    def test_parallel_copy_empty_directory(self):
+        self.write_file('_SUCCESS', '')
+        copied_data = self.capture_copies()
+        task = self.create_task(copy_connections=4, source_target=luigi.LocalTarget(self.temp_dir))
+        task.output().touch = MagicMock()
+        task.run()
+
+        self.assertEquals(copied_data, [])
+        queries = self.get_executed_queries()
+        self.assertTrue(any(query.startswith('INSERT /*+ DIRECT */ INTO') for query in queries))
+        self.assertTrue(task.output().touch.called)
+        self.assertTrue(self.mock_vertica_connector.connect.return_value.commit.called)
+
+    def test_parallel_copy_hdfs_directory(self):
+        task = self.create_task(copy_connections=2, source_target=luigi.hdfs.HdfsTarget('/data/table'))
+        with patch('edx.analytics.tasks.vertica_load.luigi.hdfs.listdir') as mock_listdir:
+            mock_listdir.return_value = ['/data/table/part-00001', '/data/table/_SUCCESS', '/data/table/part-00000']
+            sources = task.get_copy_sources()
+        self.assertEquals(
+            [source.func.__self__.path for source in sources],
+            ['/data/table/part-00000', '/data/table/part-00001']
+        )
+
+    def test_parallel_copy_failure(self):
+        path = self.write_file('source.tsv', self._get_source_string(10))
+        task = self.create_task(copy_connections=3, source_target=luigi.LocalTarget(path))
+        self.mock_cursor.copy.side_effect = ValueError('copy failed')
+        with self.assertRaisesRegexp(ValueError, 'copy failed'):
+            task.run()
+
+        self.assertTrue(self.mock_vertica_connector.connect().rollback.called)
+        self.assertFalse(self.mock_vertica_connector.connect().commit.called)
+        self.assertTrue(self.get_executed_queries()[-1].startswith("DROP TABLE IF EXISTS "))
@@ -1,13 +1,21 @@
 """Test student engagement metrics"""
 
+import BaseHTTPServer
 import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import urlparse
 
 from mock import patch, MagicMock
 from ddt import ddt, data, unpack
 from mock import sentinel
 
 from edx.analytics.tasks.video import (
-    UserVideoViewingTask, VideoUsageTask, VIDEO_VIEWING_SECONDS_PER_SEGMENT, VIDEO_UNKNOWN_DURATION
+    UserVideoViewingTask, VideoUsageTask, VIDEO_VIEWING_SECONDS_PER_SEGMENT, VIDEO_UNKNOWN_DURATION,
+    YOUTUBE_MAXIMUM_IDS_PER_REQUEST,
 )
 from edx.analytics.tasks.tests import unittest
 from edx.analytics.tasks.tests.opaque_key_mixins import InitializeOpaqueKeysMixin, InitializeLegacyKeysMixin
@@ -400,6 +408,10 @@ class UserVideoViewingTaskReducerTest(ReducerTestMixin, unittest.TestCase):
         self.mock_urllib = patcher.start()
         self.addCleanup(patcher.stop)
 
+    def _get_reducer_output(self, inputs):
+        """Runs the reducer, including any viewings held back until the end of the reduce task."""
+        return tuple(self.task.reducer(self.reduce_key, inputs)) + tuple(self.task.final_reducer())
+
     def test_simple_viewing(self):
         inputs = [
             ('2013-12-17T00:00:00.00000Z', 'play_video', 0, None, 'html5'),
@@ -713,6 +725,108 @@ class UserVideoViewingTaskReducerTest(ReducerTestMixin, unittest.TestCase):
         })
 
 
+class FakeYoutubeApiHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers video duration requests like the Youtube API, using the durations known to the server."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Returns the durations of the requested videos that are known."""
+        query = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+        youtube_ids = query['id'][0].split(',')
+        self.server.requested_ids.append(youtube_ids)
+        items = [
+            {'id': youtube_id, 'contentDetails': {'duration': 'PT{0}S'.format(self.server.durations[youtube_id])}}
+            for youtube_id in youtube_ids if youtube_id in self.server.durations
+        ]
+        body = json.dumps({'items': items})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class UserVideoViewingTaskDurationLookupTest(ReducerTestMixin, unittest.TestCase):
+    """Tests batched and cached lookups of video durations against a local stand-in for the Youtube API."""
+
+    task_class = UserVideoViewingTask
+
+    def setUp(self):
+        super(UserVideoViewingTaskDurationLookupTest, self).setUp()
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), FakeYoutubeApiHandler)
+        self.server.durations = {'video{0:03d}'.format(index): index + 10 for index in range(120)}
+        self.server.requested_ids = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        patcher = patch(
+            'edx.analytics.tasks.video.YOUTUBE_API_URL',
+            'http://127.0.0.1:{0}/youtube/v3/videos'.format(self.server.server_address[1])
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root)
+
+    def create_cached_task(self):
+        """Creates a task that uses the temporary duration cache and has an API key."""
+        self.create_task(duration_cache_root=self.cache_root)
+        self.task.api_key = 'foobar'
+
+    def reduce_viewings(self, youtube_ids):
+        """Runs the reducer over one viewing of each video, and returns the duration of each viewing by user."""
+        records = []
+        for youtube_id in youtube_ids:
+            inputs = [
+                ('2013-12-17T00:00:00.00000Z', 'play_video', 0, None, youtube_id),
+                ('2013-12-17T00:00:03.00000Z', 'pause_video', 3, None, None),
+            ]
+            records.extend(self.task.reducer(('user_' + youtube_id, self.COURSE_ID, 'i4x-foo-bar-baz'), inputs))
+        records.extend(self.task.final_reducer())
+        return {record[ViewingColumns.USERNAME]: record[ViewingColumns.VIDEO_DURATION] for record in records}
+
+    def test_batched_lookups(self):
+        self.create_cached_task()
+        youtube_ids = sorted(self.server.durations)
+        durations = self.reduce_viewings(youtube_ids + youtube_ids[:10])
+
+        self.assertEquals(durations, {'user_' + youtube_id: self.server.durations[youtube_id] for youtube_id in youtube_ids})
+        self.assertEquals(len(self.server.requested_ids), 3)
+        self.assertTrue(all(len(ids) <= YOUTUBE_MAXIMUM_IDS_PER_REQUEST for ids in self.server.requested_ids))
+        self.assertEquals(sorted(sum(self.server.requested_ids, [])), youtube_ids)
+
+    def test_persistent_cache(self):
+        self.create_cached_task()
+        self.reduce_viewings(['video001', 'video002', 'unknown'])
+        self.task.merge_video_duration_cache()
+
+        with open(os.path.join(self.cache_root, 'durations.json'), 'r') as cache_file:
+            self.assertEquals(json.load(cache_file), {'video001': 11, 'video002': 12})
+        self.assertEquals(os.listdir(os.path.join(self.cache_root, 'fragments')), [])
+        self.assertEquals(len(self.server.requested_ids), 1)
+
+        self.create_cached_task()
+        durations = self.reduce_viewings(['video001', 'video002', 'video003', 'unknown'])
+        self.task.merge_video_duration_cache()
+
+        self.assertEquals(durations, {
+            'user_video001': 11,
+            'user_video002': 12,
+            'user_video003': 13,
+            'user_unknown': VIDEO_UNKNOWN_DURATION,
+        })
+        # Only the videos that were not found in the cache are requested again.
+        self.assertEquals(self.server.requested_ids[1:], [['unknown', 'video003']])
+        with open(os.path.join(self.cache_root, 'durations.json'), 'r') as cache_file:
+            self.assertEquals(json.load(cache_file), {'video001': 11, 'video002': 12, 'video003': 13})
+
+
 class VideoUsageTaskMapTest(MapperTestMixin, unittest.TestCase):
     """Test video usage mapper"""
 
@@ -1074,6 +1188,34 @@ class VideoUsageTaskReducerTest(ReducerTestMixin, unittest.TestCase):
             },
         ])
 
+    def test_random_overlapping_viewings(self):
+        generator = random.Random(0)
+        for _ in range(50):
+            inputs = []
+            for _ in range(generator.randint(1, 20)):
+                start_offset = generator.uniform(0, 100)
+                end_offset = start_offset + generator.uniform(0, 60)
+                inputs.append(('user{}'.format(generator.randint(0, 4)), start_offset, end_offset, 200))
+
+            users_by_segment = {}
+            views_by_segment = {}
+            for username, start_offset, end_offset, _duration in inputs:
+                first_segment = int(start_offset) / VIDEO_VIEWING_SECONDS_PER_SEGMENT
+                last_segment = int(end_offset) / VIDEO_VIEWING_SECONDS_PER_SEGMENT
+                for segment in range(first_segment, last_segment + 1):
+                    users_by_segment.setdefault(segment, set()).add(username)
+                    views_by_segment[segment] = views_by_segment.get(segment, 0) + 1
+
+            output = self._get_reducer_output(inputs)
+            self.assertEquals(
+                [(row[UsageColumns.SEGMENT], row[UsageColumns.USERS_VIEWED], row[UsageColumns.NUM_VIEWS]) for row in output],
+                [
+                    (segment, len(users_by_segment[segment]), views_by_segment[segment])
+                    for segment in sorted(views_by_segment)
+                ]
+            )
+            self.assertEquals(output[0][UsageColumns.USERS_AT_START], len(users_by_segment.get(0, [])))
+
 
 @ddt
 class GetFinalSegmentTest(unittest.TestCase):
@@ -1086,7 +1228,7 @@ class GetFinalSegmentTest(unittest.TestCase):
     def generate_segment(self, num_users, num_views):
         """Constructs an entry for a video segment."""
         return {
-            'users': ['user{}'.format(i) for i in range(num_users)],
+            'users': num_users,
             'views': num_views
         }
 
@@ -7,7 +7,7 @@ import luigi
 import luigi.date_interval
 
 from edx.analytics.tasks.calendar_task import CalendarTableTask
-from edx.analytics.tasks.mapreduce import MapReduceJobTask, MapReduceJobTaskMixin
+from edx.analytics.tasks.mapreduce import MapReduceJobTask, MapReduceJobTaskMixin, SummingJobTaskMixin
 from edx.analytics.tasks.pathutil import EventLogSelectionMixin, EventLogSelectionDownstreamMixin
 from edx.analytics.tasks.url import get_target_from_url
 import edx.analytics.tasks.util.eventlog as eventlog
@@ -23,7 +23,7 @@ PLAY_VIDEO_LABEL = "PLAYED_VIDEO"
 POST_FORUM_LABEL = "POSTED_FORUM"
 
 
-class UserActivityTask(EventLogSelectionMixin, MapReduceJobTask):
+class UserActivityTask(SummingJobTaskMixin, EventLogSelectionMixin, MapReduceJobTask):
     """
     Categorize activity of users.
 
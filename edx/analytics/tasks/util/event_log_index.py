@@ -0,0 +1,116 @@
+"""
+Summaries of the events contained in a tracking log file.
+
+An index is stored next to the tracking log file it describes, in a file with the same name followed by INDEX_SUFFIX.
+It records the number of events of each type found in the file along with the range of dates of those events, which
+allows the file to be skipped entirely by jobs that are not interested in any of its events.
+"""
+
+import json
+
+
+INDEX_SUFFIX = '.index.json'
+
+# Implicit events use the URL as their event type. Storing each URL would make the index nearly as large as the log, so
+# all of them are counted under this single type instead.
+IMPLICIT_EVENT_TYPE = '/'
+
+
+def get_index_url(url):
+    """Returns the URL of the index of the tracking log at the given URL."""
+    return url + INDEX_SUFFIX
+
+
+def is_index_url(url):
+    """Returns True if the URL points to an index instead of a tracking log."""
+    return url.endswith(INDEX_SUFFIX)
+
+
+def normalize_event_type(event_type):
+    """Map an event type to the key used to count it in the index."""
+    if event_type.startswith(IMPLICIT_EVENT_TYPE):
+        return IMPLICIT_EVENT_TYPE
+    return event_type
+
+
+class EventLogIndex(object):
+    """
+    Summary of the events in a tracking log file.
+
+    Arguments:
+        event_type_counts (dict): Maps each (normalized) event type to the number of events of that type.
+        min_date (str): The date of the earliest event in the file, formatted as "YYYY-MM-DD".
+        max_date (str): The date of the latest event in the file, formatted as "YYYY-MM-DD".
+        unparsed_count (int): The number of lines in the file that could not be parsed.
+    """
+
+    def __init__(self, event_type_counts=None, min_date=None, max_date=None, unparsed_count=0):
+        self.event_type_counts = event_type_counts or {}
+        self.min_date = min_date
+        self.max_date = max_date
+        self.unparsed_count = unparsed_count
+
+    def add(self, event_type, date_string, count=1):
+        """Record `count` events of the given type that occurred on the given date."""
+        event_type = normalize_event_type(event_type)
+        self.event_type_counts[event_type] = self.event_type_counts.get(event_type, 0) + count
+        self.add_date_range(date_string, date_string)
+
+    def add_date_range(self, min_date, max_date):
+        """Extend the range of dates covered by this index."""
+        if min_date is not None and (self.min_date is None or min_date < self.min_date):
+            self.min_date = min_date
+        if max_date is not None and (self.max_date is None or max_date > self.max_date):
+            self.max_date = max_date
+
+    def update(self, other):
+        """Merge the contents of another index into this one."""
+        for event_type, count in other.event_type_counts.iteritems():
+            self.event_type_counts[event_type] = self.event_type_counts.get(event_type, 0) + count
+        self.add_date_range(other.min_date, other.max_date)
+        self.unparsed_count += other.unparsed_count
+
+    def may_contain(self, event_types=None, date_a=None, date_b=None):
+        """
+        Determine if the file might contain relevant events.
+
+        Arguments:
+            event_types (iterable): If specified, only events of these types are relevant.
+            date_a (str): If specified, only events on or after this date ("YYYY-MM-DD") are relevant.
+            date_b (str): If specified, only events before this date ("YYYY-MM-DD") are relevant.
+
+        Returns: False if the file definitely contains no relevant events, True otherwise. Note that lines that could not
+            be parsed, or that have no timestamp, are never relevant since event log jobs discard them.
+        """
+        if event_types:
+            if not any(normalize_event_type(event_type) in self.event_type_counts for event_type in event_types):
+                return False
+
+        if self.min_date is None or self.max_date is None:
+            return False
+        if date_a is not None and self.max_date < date_a:
+            return False
+        if date_b is not None and self.min_date >= date_b:
+            return False
+
+        return True
+
+    def to_json(self):
+        """Serialize the index to a JSON string."""
+        return json.dumps({
+            'event_types': self.event_type_counts,
+            'min_date': self.min_date,
+            'max_date': self.max_date,
+            'unparsed': self.unparsed_count,
+        }, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, json_str):
+        """Deserialize an index from a JSON string as generated by `to_json`."""
+        obj = json.loads(json_str)
+        return cls(
+            event_type_counts=obj.get('event_types'),
+            min_date=obj.get('min_date'),
+            max_date=obj.get('max_date'),
+            unparsed_count=obj.get('unparsed', 0),
+        )
@@ -25,6 +25,18 @@ def encode_json(obj):
     return cjson.encode(obj)
 
 
+class Event(dict):
+    """
+    A tracking log event that remembers the decoded value of its nested "event" payload.
+
+    `get_event_data` only decodes the payload of an Event the first time it is called.  This is only worth the cost of
+    building the Event when several consumers read the payload of the same event, see MultiplexedEventLogTask.
+    """
+
+    # A (payload, decoded payload) tuple, set by `get_event_data`.
+    event_data_cache = None
+
+
 def parse_json_event(line, nested=False):
     """
     Parse a tracking log input line as JSON to create a dict representation.
@@ -58,13 +70,14 @@ def parse_json_event(line, nested=False):
     return parsed
 
 
-def parse_json_server_event(line, requested_event_type):
+def parse_json_server_event(line, requested_event_type, parse_event=parse_json_event):
     """
     Parse a tracking log input line as JSON to create a dict representation.
 
     Arguments:
         line:  the eventlog text
         requested_event_type: string representing the requested event_type
+        parse_event: the function used to parse the line, which defaults to `parse_json_event`.
 
     Returns:
         tracking event log entry as a dict, if line corresponds to a server
@@ -78,7 +91,7 @@ def parse_json_server_event(line, requested_event_type):
         return None
 
     # Parse the line into a dict.
-    event = parse_json_event(line)
+    event = parse_event(line)
     if event is None:
         # The line didn't parse.  We know that some significant number
         # of server lines do not parse because of line length issues,
@@ -167,6 +180,22 @@ def get_event_data(event):
 
     Returns None if not found.
     """
+    if not isinstance(event, Event):
+        return _decode_event_data(event)
+
+    # Reuse the result of decoding the payload the last time, unless the payload was replaced since then.
+    event_value = event.get('event')
+    cached = event.event_data_cache
+    if cached is not None and cached[0] is event_value:
+        return cached[1]
+
+    event_data = _decode_event_data(event)
+    event.event_data_cache = (event_value, event_data)
+    return event_data
+
+
+def _decode_event_data(event):
+    """Decode the payload of an event log entry, see `get_event_data`."""
     event_value = event.get('event')
 
     if event_value is None:
@@ -229,6 +258,10 @@ def get_augmented_event_data(event, fields_to_augment):
         # Assume it's already logged (and with more specifics).
         return None
 
+    if isinstance(event, Event):
+        # The decoded event data is cached, so copy it to keep the augmented fields out of the cache.
+        event_data = dict(event_data)
+
     if 'timestamp' in fields_to_augment:
         # Get the timestamp as an object.
         datetime_obj = get_event_time(event)
@@ -1,15 +1,21 @@
 """
 Utility methods interact with files.
 """
+import io
 import logging
 import os
 from contextlib import contextmanager
+import Queue
+import threading
+import zlib
 
 import sys
 
 from edx.analytics.tasks.url import get_target_from_url
 
 TRANSFER_BUFFER_SIZE = 1024 * 1024  # 1 MB
+# Tells zlib to expect a gzip header and trailer around the compressed data.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
 log = logging.getLogger(__name__)
 
 
@@ -32,6 +38,55 @@ def copy_file_to_file(src_file, output_file, progress=None):
     log.info('Copy to output complete')
 
 
+def get_line_aligned_byte_ranges(path, num_ranges):
+    """
+    Splits a local file into at most `num_ranges` parts of about the same size that start and end on line boundaries.
+
+    Returns a list of (start, end) byte offsets, which always includes at least one range.
+    """
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, 'rb') as input_file:
+        for index in range(1, num_ranges):
+            offset = size * index // num_ranges
+            if offset <= boundaries[-1]:
+                continue
+            # Start reading from the byte before the offset, so that a line that starts at the offset is not skipped.
+            input_file.seek(offset - 1)
+            input_file.readline()
+            if boundaries[-1] < input_file.tell() < size:
+                boundaries.append(input_file.tell())
+    boundaries.append(size)
+    return zip(boundaries[:-1], boundaries[1:])
+
+
+class ByteRangeFile(object):
+    """A file object that reads the bytes from `start` up to `end` of a local file."""
+
+    def __init__(self, path, start, end):
+        self.fileobj = open(path, 'rb')
+        self.fileobj.seek(start)
+        self.remaining = end - start
+
+    def read(self, size=-1):
+        """Returns up to `size` bytes, or all of the remaining bytes if `size` is negative."""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fileobj.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        """Close the underlying file."""
+        self.fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 @contextmanager
 def read_config_file(filename):
     """Read a config file from either an external source (S3, HDFS etc) or the "share" directory of this repo."""
@@ -43,3 +98,146 @@ def read_config_file(filename):
         file_path = os.path.join(sys.prefix, 'share', 'edx.analytics.tasks', filename)
         with open(file_path, 'r') as config_file:
             yield config_file
+
+
+def open_gzip_stream(fileobj, buffer_size=TRANSFER_BUFFER_SIZE, read_ahead=4):
+    """
+    Returns a file object that decompresses a gzip file as it is read from another file object.
+
+    Unlike gzip.GzipFile, this doesn't require `tell()` or `seek()` to be supported, so it can be used with pipes and
+    files streamed from S3. Files that consist of several concatenated gzip members are fully decompressed.
+
+    Arguments:
+        fileobj: The file object to read compressed data from.
+        buffer_size (int): The number of bytes to read from `fileobj` at a time.
+        read_ahead (int): The maximum number of reads from `fileobj` that are done in advance by a background thread,
+            so that reading and decompressing can happen at the same time. Set to 0 to read synchronously.
+    """
+    if read_ahead > 0:
+        fileobj = ReadAheadFile(fileobj, buffer_size, read_ahead)
+    return io.BufferedReader(GzipStreamReader(fileobj, buffer_size), buffer_size)
+
+
+class GzipStreamReader(io.RawIOBase):
+    """Raw stream of the data decompressed from a gzip file that is read sequentially, see `open_gzip_stream`."""
+
+    def __init__(self, fileobj, buffer_size=TRANSFER_BUFFER_SIZE):
+        super(GzipStreamReader, self).__init__()
+        self.fileobj = fileobj
+        self.buffer_size = buffer_size
+        self.decompressor = zlib.decompressobj(GZIP_WBITS)
+        self.pending = ''
+        self.pending_offset = 0
+        self.received_input = False
+        self.end_of_input = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        while self.pending_offset >= len(self.pending) and not self.end_of_input:
+            compressed = self.fileobj.read(self.buffer_size)
+            if compressed:
+                self.received_input = True
+                self.pending = self.decompress(compressed)
+            else:
+                self.end_of_input = True
+                if self.received_input and not self.member_finished():
+                    raise IOError('Compressed file ended before the end-of-stream marker was reached')
+                self.pending = self.decompressor.flush()
+            self.pending_offset = 0
+
+        # Keep an offset into the pending data rather than slicing off what has been read, which would copy the rest
+        # of a highly compressible block on every read.
+        start = self.pending_offset
+        num_bytes = min(len(buf), len(self.pending) - start)
+        buf[:num_bytes] = self.pending[start:start + num_bytes]
+        self.pending_offset += num_bytes
+        return num_bytes
+
+    def member_finished(self):
+        """Returns True if the end of the gzip member that is currently being decompressed has been reached."""
+        # The zlib module doesn't expose this directly, but once a member has ended any further input is left in
+        # unused_data rather than being consumed, so check what happens to a byte passed to a copy of the decompressor.
+        probe = self.decompressor.copy()
+        try:
+            probe.decompress('\x00')
+        except zlib.error:
+            return False
+        return len(probe.unused_data) > len(self.decompressor.unused_data)
+
+    def decompress(self, compressed):
+        """Decompress the next block of data, which may contain the end of one gzip member and the start of another."""
+        decompressed = []
+        while compressed:
+            decompressed.append(self.decompressor.decompress(compressed))
+            compressed = self.decompressor.unused_data
+            if not compressed.strip('\x00'):
+                # Like gzip.GzipFile, ignore zero padding after the last member.
+                break
+            self.decompressor = zlib.decompressobj(GZIP_WBITS)
+
+        return ''.join(decompressed)
+
+    def close(self):
+        if not self.closed:
+            self.fileobj.close()
+        super(GzipStreamReader, self).close()
+
+
+class ReadAheadFile(object):
+    """
+    Read a file sequentially in fixed size blocks using a background thread.
+
+    Only `read()` and `close()` are supported, and `read()` always returns the next block regardless of the size that
+    is requested. This is only intended to be used to feed a GzipStreamReader.
+    """
+
+    def __init__(self, fileobj, buffer_size=TRANSFER_BUFFER_SIZE, read_ahead=4):
+        self.fileobj = fileobj
+        self.buffer_size = buffer_size
+        self.blocks = Queue.Queue(read_ahead)
+        self.closed = threading.Event()
+        self.exhausted = False
+
+        self.thread = threading.Thread(target=self.read_blocks)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def read_blocks(self):
+        """Read blocks from the file until it is exhausted or closed, passing any error to the reader."""
+        try:
+            while not self.closed.is_set():
+                block = self.fileobj.read(self.buffer_size)
+                self.put((block, None))
+                if not block:
+                    return
+        except Exception as exc:  # pylint: disable=broad-except
+            self.put(('', exc))
+
+    def put(self, item):
+        """Wait until there is space for another block, giving up if the file is closed in the meantime."""
+        while not self.closed.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except Queue.Full:
+                pass
+
+    def read(self, _size=-1):
+        """Returns the next block of the file, or an empty string once the end of the file is reached."""
+        if self.exhausted:
+            return ''
+        block, exc = self.blocks.get()
+        if exc is not None:
+            self.exhausted = True
+            raise exc
+        if not block:
+            self.exhausted = True
+        return block
+
+    def close(self):
+        """Stop reading ahead and close the underlying file."""
+        self.closed.set()
+        self.thread.join()
+        self.fileobj.close()
@@ -2,14 +2,11 @@
 
 import base64
 import random
-import logging
 import luigi
 try:
-    import numpy as np
+    import numpy
 except ImportError:
-    np = object
-    log = logging.getLogger(__name__)
-    log.warn('Could not import numpy, any code that relies on it in this module will fail.')
+    numpy = None  # pylint: disable=invalid-name
 
 
 def encode_id(scope, id_type, id_value):
@@ -24,48 +21,110 @@ def decode_id(encoded_id):
 
 
 class PermutationGenerator(object):
-    """Class to calculate reversible 1-1 mapping using a permutation matrix."""
+    """
+    Class to calculate reversible 1-1 mapping using a permutation of the bits of an int.
 
-    def __init__(self, seed, matrix_dim, bits):
-        self.bits = bits
-        self.permutation_matrix = self.random_permutation_matrix(seed, matrix_dim)
-
-    def int_to_binvec(self, int_value):
-        """Convert int_value, which must be less than 2**bits, to an np vector of bits 0/1 bits."""
-        if int_value < 0 or int_value >= 2 ** self.bits:
-            raise ValueError("{} out of range [0, 2**{}]".format(int_value, self.bits))
+    The permutation moves the bits of a value as if they were a vector multiplied by a random permutation matrix.
+    Rather than doing that for every value, the result of permuting each possible byte at each position in the value is
+    precomputed, so a value can be permuted by combining one table lookup per byte.
+    """
 
-        str_int_value = bin(int_value)[2:].zfill(self.bits)
-        return np.array([int(b) for b in str_int_value])
+    BITS_PER_TABLE = 8
 
-    def binvec_to_int(self, vec):
-        """Convert an np array of bits (type int) to a real int."""
-        # more string hacks
-        return int("".join(map(str, vec)), 2)
-
-    def random_permutation_matrix(self, seed, matrix_dim):
-        """Return a random permutation matrix of dimension matrix_dim using seed."""
+    def __init__(self, seed, matrix_dim, bits):
+        if matrix_dim != bits:
+            raise ValueError("matrix dimension {} does not match the number of bits {}".format(matrix_dim, bits))
+        self.bits = bits
+        mapping = self.random_permutation(seed, matrix_dim)
+        inverse_mapping = [0] * matrix_dim
+        for i, mapped_index in enumerate(mapping):
+            inverse_mapping[mapped_index] = i
+        self.permute_tables = self.build_lookup_tables(mapping)
+        self.unpermute_tables = self.build_lookup_tables(inverse_mapping)
+        # Arrays of the lookup tables, for use with numpy.  These are only built when needed.
+        self.permute_table_arrays = None
+        self.unpermute_table_arrays = None
+
+    def random_permutation(self, seed, matrix_dim):
+        """Return a list that gives the index of the row of a permutation matrix that has a one in each column."""
         rng = random.Random(seed)
         # Decide where each bit goes.
         mapping = range(matrix_dim)
         rng.shuffle(mapping)
-        # Then make a matrix that does that.
-        permutation = np.zeros((matrix_dim, matrix_dim), dtype=int)
-        for i in range(matrix_dim):
-            permutation[i, mapping[i]] = 1
-        return permutation
+        return mapping
+
+    def build_lookup_tables(self, mapping):
+        """
+        Return a list of (shift, mask, table) tuples that together move each bit of a value to its position in mapping.
+
+        The mapping moves the bit at index i, counting from the most significant bit, to index mapping[i].
+        """
+        tables = []
+        for shift in range(0, self.bits, self.BITS_PER_TABLE):
+            table_bits = min(self.BITS_PER_TABLE, self.bits - shift)
+            # Where each bit of this byte ends up in the permuted value.
+            permuted_bits = [
+                1 << (self.bits - 1 - mapping[self.bits - 1 - (shift + bit)])
+                for bit in range(table_bits)
+            ]
+            table = [0] * (1 << table_bits)
+            for byte_value in range(1, 1 << table_bits):
+                lowest_bit = byte_value & -byte_value
+                table[byte_value] = table[byte_value ^ lowest_bit] | permuted_bits[lowest_bit.bit_length() - 1]
+            tables.append((shift, (1 << table_bits) - 1, table))
+        return tables
+
+    def check_range(self, int_value):
+        """Raise a ValueError if int_value is not less than 2**bits or is negative."""
+        if int_value < 0 or int_value >= 2 ** self.bits:
+            raise ValueError("{} out of range [0, 2**{}]".format(int_value, self.bits))
 
     def permute(self, int_value):
         """Given int `int_value` with bits `bits`, permute it using the specified bits-by-bits permutation."""
-        vec = self.int_to_binvec(int_value)
-        permuted = vec.dot(self.permutation_matrix)
-        return self.binvec_to_int(permuted)
+        self.check_range(int_value)
+        permuted = 0
+        for shift, mask, table in self.permute_tables:
+            permuted |= table[(int_value >> shift) & mask]
+        return permuted
 
     def unpermute(self, int_value):
         """Given int `int_value` with bits `bits`, unpermute it using the specified bits-by-bits permutation."""
-        vec = self.int_to_binvec(int_value)
-        permuted = vec.dot(self.permutation_matrix.T)
-        return self.binvec_to_int(permuted)
+        self.check_range(int_value)
+        unpermuted = 0
+        for shift, mask, table in self.unpermute_tables:
+            unpermuted |= table[(int_value >> shift) & mask]
+        return unpermuted
+
+    def permute_array(self, int_values):
+        """Permute each of the values in `int_values`, returning a numpy array of int64 values."""
+        if self.permute_table_arrays is None:
+            self.permute_table_arrays = self.get_table_arrays(self.permute_tables)
+        return self.apply_table_arrays(int_values, self.permute_table_arrays)
+
+    def unpermute_array(self, int_values):
+        """Unpermute each of the values in `int_values`, returning a numpy array of int64 values."""
+        if self.unpermute_table_arrays is None:
+            self.unpermute_table_arrays = self.get_table_arrays(self.unpermute_tables)
+        return self.apply_table_arrays(int_values, self.unpermute_table_arrays)
+
+    def get_table_arrays(self, tables):
+        """Convert lookup tables to numpy arrays."""
+        if numpy is None:
+            raise RuntimeError('NumPy is required to permute arrays of values.')
+        if self.bits > 63:
+            raise ValueError("Arrays of values with more than 63 bits are not supported")
+        return [(shift, mask, numpy.array(table, dtype=numpy.int64)) for shift, mask, table in tables]
+
+    def apply_table_arrays(self, int_values, table_arrays):
+        """Look up each byte of each value in the tables, and combine the results."""
+        int_values = numpy.asarray(int_values).astype(numpy.int64)
+        if int_values.size > 0:
+            self.check_range(int_values.min())
+            self.check_range(int_values.max())
+        result = numpy.zeros(int_values.shape, dtype=numpy.int64)
+        for shift, mask, table in table_arrays:
+            result |= table[(int_values >> shift) & mask]
+        return result
 
 
 class UserIdRemapperMixin(object):
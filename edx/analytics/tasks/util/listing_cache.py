@@ -0,0 +1,125 @@
+"""
+A persistent cache of the files found in event log sources.
+
+Listing a large source, such as an S3 bucket that contains years of tracking logs, can take several minutes. The cache
+stores the result of each listing, and refreshes it incrementally the next time the source is listed:
+
+* In S3, new files are expected to appear at the end of their folder, since tracking log file names contain the date
+  they were rotated. Each folder is only listed starting after the last file that is already known in it.
+* In the local file system, the contents of directories that haven't been modified since they were last listed are
+  taken from the cache.
+
+Note that files that are removed from S3, or that are added to a S3 folder in a position other than the end, are not
+detected. Delete the cache file for the source to force it to be listed again from scratch.
+"""
+
+import bisect
+from collections import namedtuple
+import hashlib
+import json
+import logging
+import os
+
+from edx.analytics.tasks.s3_util import list_s3_keys
+from edx.analytics.tasks.url import get_target_from_url, url_path_join
+
+log = logging.getLogger(__name__)
+
+
+# A file found in a source. The key is the name of the S3 key or the path of the local file, the etag is only known
+# for S3 keys and last_modified is the value reported by S3 or the modification time of the local file.
+ListedFile = namedtuple('ListedFile', ['key', 'size', 'etag', 'last_modified'])  # pylint: disable=invalid-name
+
+
+class ListingCache(object):
+    """
+    Store listings of sources in files below a root URL.
+
+    Arguments:
+        cache_root (str): A URL to the directory that contains one file for each source that was listed.
+        num_threads (int): The number of threads used to list S3 sources, see `s3_util.list_s3_keys`.
+    """
+
+    def __init__(self, cache_root, num_threads=1):
+        self.cache_root = cache_root
+        self.num_threads = num_threads
+
+    def get_cache_target(self, source):
+        """Returns the target in which the listing of the source is stored."""
+        return get_target_from_url(url_path_join(self.cache_root, hashlib.md5(source).hexdigest() + '.json'))
+
+    def load(self, source):
+        """Returns the cached listing of the source as a dict, or an empty dict if it can't be read."""
+        target = self.get_cache_target(source)
+        try:
+            if target.exists():
+                with target.open('r') as cache_file:
+                    cached = json.load(cache_file)
+                if cached.get('source') == source:
+                    return cached
+        except Exception:  # pylint: disable=broad-except
+            log.warning('Unable to read the cached listing of %s, listing it again.', source, exc_info=True)
+        return {}
+
+    def save(self, source, cached):
+        """Store the listing of the source, which is a dict that can be serialized as JSON."""
+        cached['source'] = source
+        with self.get_cache_target(source).open('w') as cache_file:
+            json.dump(cached, cache_file, separators=(',', ':'))
+
+    def list_s3_keys(self, s3_conn, bucket_name, prefix):
+        """Returns the ListedFiles for the keys in the bucket whose names start with the prefix, sorted by name."""
+        source = u's3://{0}/{1}'.format(bucket_name, prefix).encode('utf8')
+        known_files = {listed[0]: ListedFile(*listed) for listed in self.load(source).get('files', [])}
+        known_names = sorted(known_files)
+
+        def get_marker(folder_name):
+            """Returns the name of the last known key in the folder."""
+            index = bisect.bisect_left(known_names, folder_name)
+            marker = None
+            while index < len(known_names) and known_names[index].startswith(folder_name):
+                marker = known_names[index]
+                index += 1
+            return marker
+
+        num_new_files = 0
+        for key in list_s3_keys(s3_conn, bucket_name, prefix, self.num_threads, get_marker=get_marker):
+            if key.name not in known_files:
+                num_new_files += 1
+            known_files[key.name] = ListedFile(key.name, key.size, key.etag, key.last_modified)
+
+        log.debug('Found %d new files in %s.', num_new_files, source)
+        files = [known_files[name] for name in sorted(known_files)]
+        self.save(source, {'files': files})
+        return files
+
+    def list_local_files(self, source):
+        """Returns the ListedFiles for the files inside the local directory and its subdirectories, sorted by path."""
+        known_directories = self.load(source).get('directories', {})
+        directories = {}
+        files = []
+        pending_paths = [source]
+        while pending_paths:
+            path = pending_paths.pop()
+            try:
+                modified = os.stat(path).st_mtime
+            except OSError:
+                continue
+
+            directory = known_directories.get(path)
+            if directory is None or directory['modified'] != modified:
+                directory = {'modified': modified, 'subdirectories': [], 'files': []}
+                for name in sorted(os.listdir(path)):
+                    child_path = os.path.join(path, name)
+                    if os.path.isdir(child_path):
+                        directory['subdirectories'].append(child_path)
+                    else:
+                        child_stat = os.stat(child_path)
+                        directory['files'].append(ListedFile(child_path, child_stat.st_size, None, child_stat.st_mtime))
+
+            directories[path] = directory
+            files.extend(ListedFile(*listed) for listed in directory['files'])
+            pending_paths.extend(directory['subdirectories'])
+
+        self.save(source, {'directories': directories})
+        return sorted(files)
@@ -5,8 +5,9 @@ import logging
 
 import luigi
 
-from edx.analytics.tasks.url import ExternalURL
+from edx.analytics.tasks.url import ExternalURL, get_target_from_url
 from edx.analytics.tasks.util.id_codec import UserIdRemapperMixin
+from edx.analytics.tasks.util.user_info_index import UserInfoIndex, write_user_info_index
 
 
 log = logging.getLogger(__name__)
@@ -29,6 +30,68 @@ class UserInfoDownstreamMixin(object):
     """Mixin providing parameters for downstream classes dependent on classes using UserInfoMixin."""
     auth_user_path = luigi.Parameter()
     auth_userprofile_path = luigi.Parameter()
+    user_info_index_path = luigi.Parameter(
+        config_path={'section': 'obfuscation', 'name': 'user_info_index_path'},
+        default=None,
+        significant=False,
+        description='A URL to which an index of the auth_user and auth_userprofile data is written, so that tasks can '
+        'memory-map it instead of loading all users into memory.  A new URL should be used whenever the auth_user '
+        'and auth_userprofile data changes, since local copies of the index are reused.',
+    )
+
+
+def read_auth_user(input_target):
+    """Yields the user_id and unicode username of each user in an auth_user file dumped by Sqoop."""
+    count = 0
+    with input_target.open('r') as auth_user_file:
+        for line in auth_user_file:
+            count += 1
+            # TODO: Fix ugly hack to get around reading .metadata record information.
+            if line.startswith('{'):
+                line = line.split('}', 2)[1]
+            split_line = line.rstrip('\r\n').split('\x01')
+            try:
+                user_id = int(split_line[0])
+            except ValueError:
+                log.error("Unexpected non-int value for user_id read from auth_user file: %s", split_line)
+                continue
+            username = split_line[1].decode('utf8').strip()
+            if len(username) == 0:
+                log.error("Unexpected whitespace value for username read from auth_user file: %s", split_line)
+                continue
+            yield user_id, username
+        log.info("Finished loading %s auth_user records from %s into user_info data.", count, input_target.path)
+
+
+def read_auth_user_profile(input_target):
+    """Yields the user_id and unicode name of each user in an auth_userprofile file dumped by Sqoop."""
+    count = 0
+    with input_target.open('r') as auth_user_profile_file:
+        for line in auth_user_profile_file:
+            count += 1
+            # TODO: Fix ugly hack to get around reading .metadata record information.
+            if line.startswith('{'):
+                line = line.split('}', 2)[1]
+            split_line = line.rstrip('\r\n').split('\x01')
+            try:
+                user_id = int(split_line[0])
+            except ValueError:
+                log.error("Unexpected non-int value for user_id read from auth_user_profile file: %s", split_line)
+                continue
+            name = split_line[1].decode('utf8')
+            yield user_id, name
+        log.info("Finished loading %s auth_userprofile records from %s into user_info data.",
+                 count, input_target.path)
+
+
+def log_unknown_profile(user_id, name):
+    """Logs a user_id from auth_userprofile that is not found in auth_user."""
+    # Note that the userprofile may be more recent than the auth_user file.
+    # We have no guarantee that they are dumped at the same time, though we presume
+    # they were dumped on the same day, and presumably closer in time than that.
+    # It is presumed that none of these entries really matter, since they're after the
+    # auth_user dump.
+    log.error("Unknown value for user_id read from auth_user_profile file: %s '%s'", user_id, name)
 
 
 class UserInfoMixin(UserInfoDownstreamMixin):
@@ -36,6 +99,14 @@ class UserInfoMixin(UserInfoDownstreamMixin):
 
     def user_info_requirements(self):
         """Define values to add to requirements() for tasks including this mixin."""
+        if self.user_info_index_path is not None:
+            return {
+                'user_info_index': UserInfoIndexTask(
+                    auth_user_path=self.auth_user_path,
+                    auth_userprofile_path=self.auth_userprofile_path,
+                    user_info_index_path=self.user_info_index_path,
+                ),
+            }
         return {
             'auth_user': ExternalURL(self.auth_user_path),
             'auth_userprofile': ExternalURL(self.auth_userprofile_path),
@@ -71,60 +142,19 @@ class UserInfoMixin(UserInfoDownstreamMixin):
 
     def _load_auth_user(self, input_targets):
         """Load auth_user "username" data from Sqoop into global _USER_BY_ID and _USER_BY_USERNAME tables."""
-
-        count = 0
-        with input_targets['auth_user'].open('r') as auth_user_file:
-            for line in auth_user_file:
-                count += 1
-                # TODO: Fix ugly hack to get around reading .metadata record information.
-                if line.startswith('{'):
-                    line = line.split('}', 2)[1]
-                split_line = line.rstrip('\r\n').split('\x01')
-                try:
-                    user_id = int(split_line[0])
-                except ValueError:
-                    log.error("Unexpected non-int value for user_id read from auth_user file: %s", split_line)
-                    continue
-                username = split_line[1].decode('utf8').strip()
-                if len(username) == 0:
-                    log.error("Unexpected whitespace value for username read from auth_user file: %s", split_line)
-                    continue
-                _USER_BY_ID[user_id] = {'username': username, 'user_id': user_id}
-                # Point to the same object so that we can just store two pointers to the data instead of two
-                # copies of the data
-                _USER_BY_USERNAME[username] = _USER_BY_ID[user_id]
-            log.info("Finished loading %s auth_user records from %s into user_info data.",
-                     count, input_targets['auth_user'].path)
+        for user_id, username in read_auth_user(input_targets['auth_user']):
+            _USER_BY_ID[user_id] = {'username': username, 'user_id': user_id}
+            # Point to the same object so that we can just store two pointers to the data instead of two
+            # copies of the data
+            _USER_BY_USERNAME[username] = _USER_BY_ID[user_id]
 
     def _load_auth_user_profile(self, input_targets):
         """Load auth_userprofile "name" data from Sqoop into global _USER_BY_ID table."""
-
-        count = 0
-        with input_targets['auth_userprofile'].open('r') as auth_user_profile_file:
-            for line in auth_user_profile_file:
-                count += 1
-                # TODO: Fix ugly hack to get around reading .metadata record information.
-                if line.startswith('{'):
-                    line = line.split('}', 2)[1]
-                split_line = line.rstrip('\r\n').split('\x01')
-                try:
-                    user_id = int(split_line[0])
-                except ValueError:
-                    log.error("Unexpected non-int value for user_id read from auth_user_profile file: %s", split_line)
-                    continue
-                name = split_line[1].decode('utf8')
-                try:
-                    _USER_BY_ID[user_id]['name'] = name
-                except KeyError:
-                    # Note that the userprofile may be more recent than the auth_user file.
-                    # We have no guarantee that they are dumped at the same time, though we presume
-                    # they were dumped on the same day, and presumably closer in time than that.
-                    # It is presumed that none of these entries really matter, since they're after the
-                    # auth_user dump.
-                    log.error("Unknown value for user_id read from auth_user_profile file: %s '%s'", user_id, name)
-
-            log.info("Finished loading %s auth_userprofile records from %s into user_info data.",
-                     count, input_targets['auth_userprofile'].path)
+        for user_id, name in read_auth_user_profile(input_targets['auth_userprofile']):
+            try:
+                _USER_BY_ID[user_id]['name'] = name
+            except KeyError:
+                log_unknown_profile(user_id, name)
 
     def _initialize_user_info(self):
         """Make sure that user_info (auth_user and auth_userprofile) is loaded *once*."""
@@ -138,8 +168,14 @@ class UserInfoMixin(UserInfoDownstreamMixin):
                 _USER_BY_ID = {}
                 _USER_BY_USERNAME = {}
                 input_targets = {k: v.output() for k, v in self.user_info_requirements().items()}
-                self._load_auth_user(input_targets)
-                self._load_auth_user_profile(input_targets)
+                if 'user_info_index' in input_targets:
+                    # Memory-map the index rather than loading every user.
+                    user_info_index = UserInfoIndex.from_target(input_targets['user_info_index'])
+                    _USER_BY_ID = user_info_index.by_id
+                    _USER_BY_USERNAME = user_info_index.by_username
+                else:
+                    self._load_auth_user(input_targets)
+                    self._load_auth_user_profile(input_targets)
 
             except Exception:
                 # Don't leave a half-initialized set of structures for the next task to use.
@@ -151,6 +187,35 @@ class UserInfoMixin(UserInfoDownstreamMixin):
             log.info("Loaded user_info data.")
 
 
+class UserInfoIndexTask(UserInfoDownstreamMixin, luigi.Task):
+    """Writes an index of the user_id, username and name of each user that can be memory-mapped by UserInfoMixin."""
+
+    def requires(self):
+        return {
+            'auth_user': ExternalURL(self.auth_user_path),
+            'auth_userprofile': ExternalURL(self.auth_userprofile_path),
+        }
+
+    def output(self):
+        return get_target_from_url(self.user_info_index_path)
+
+    def run(self):
+        names_by_id = {}
+        for user_id, username in read_auth_user(self.input()['auth_user']):
+            names_by_id[user_id] = (username, None)
+        for user_id, name in read_auth_user_profile(self.input()['auth_userprofile']):
+            if user_id in names_by_id:
+                names_by_id[user_id] = (names_by_id[user_id][0], name)
+            else:
+                log_unknown_profile(user_id, name)
+
+        with self.output().open('w') as output_file:
+            write_user_info_index(
+                output_file,
+                ((user_id, username, name) for user_id, (username, name) in names_by_id.iteritems())
+            )
+
+
 class ObfuscatorDownstreamMixin(UserInfoDownstreamMixin):
     """Class for defining Luigi functions used downstream of obfuscating classes."""
 
@@ -297,13 +362,17 @@ def find_emails(text, log_context=DEFAULT_LOG_CONTEXT):
 #####################
 
 
-def find_username(text, username, log_context=DEFAULT_LOG_CONTEXT):
-    """Replaces the provided username value as it appears in text."""
-    username_pattern = re.compile(
+def get_username_pattern(username):
+    """Returns a compiled pattern that matches the provided username value."""
+    return re.compile(
         r'\b({})\b'.format(re.escape(username)),
         re.IGNORECASE,
     )
-    return find_all_matches(username_pattern, text, "USERNAME", log_context)
+
+
+def find_username(text, username, log_context=DEFAULT_LOG_CONTEXT):
+    """Replaces the provided username value as it appears in text."""
+    return find_all_matches(get_username_pattern(username), text, "USERNAME", log_context)
 
 
 #####################
@@ -311,13 +380,17 @@ def find_username(text, username, log_context=DEFAULT_LOG_CONTEXT):
 #####################
 
 
-def find_userid(text, user_id, log_context=DEFAULT_LOG_CONTEXT):
-    """Replaces the provided user_id value as it appears in text."""
-    userid_pattern = re.compile(
+def get_userid_pattern(user_id):
+    """Returns a compiled pattern that matches the provided user_id value."""
+    return re.compile(
         r'\b({})\b'.format(user_id),
         re.IGNORECASE,
     )
-    return find_all_matches(userid_pattern, text, "USER_ID", log_context)
+
+
+def find_userid(text, user_id, log_context=DEFAULT_LOG_CONTEXT):
+    """Replaces the provided user_id value as it appears in text."""
+    return find_all_matches(get_userid_pattern(user_id), text, "USER_ID", log_context)
 
 
 #####################
@@ -339,11 +412,15 @@ REJECTED_NAMES = set()
 STOPWORDS = ['the', 'and', 'can']
 
 
-def find_user_fullname(text, fullname, log_context=DEFAULT_LOG_CONTEXT):
-    """Culls 'fullnames' originally from auth_userprofile.name and replaces them in text."""
+def get_fullname_alternatives(fullname):
+    """
+    Returns the list of regular expressions that match a 'fullname' or the significant parts of it.
+
+    Returns None if the fullname cannot be searched for.
+    """
 
     if fullname in REJECTED_NAMES:
-        return text
+        return None
 
     # Indian names use special abbreviations for "son of"/"daughter of".
     # For the purposes of finding matches, just strip these out.
@@ -362,7 +439,7 @@ def find_user_fullname(text, fullname, log_context=DEFAULT_LOG_CONTEXT):
     if not LEGAL_NAME_PATTERN.match(fullname2):
         log.error(u"Fullname '%r' contains unexpected characters.", fullname)
         REJECTED_NAMES.add(fullname)
-        return text
+        return None
 
     # Strip parentheses and commas and the like, and escape the characters that are
     # legal in names but may have different meanings in regexps (i.e. apostrophe and period).
@@ -383,7 +460,7 @@ def find_user_fullname(text, fullname, log_context=DEFAULT_LOG_CONTEXT):
     if len(names) == 0:
         log.error(u"Fullname '%r' contains only whitespace characters.", fullname)
         REJECTED_NAMES.add(fullname)
-        return text
+        return None
 
     patterns = []
     # add the whole, then add each individual part if it's long enough.
@@ -391,14 +468,25 @@ def find_user_fullname(text, fullname, log_context=DEFAULT_LOG_CONTEXT):
     for name in names:
         if len(name) > 2 and name.lower() not in STOPWORDS and not name.endswith('.'):
             patterns.append(name)
+    return patterns
 
+
+def get_fullname_pattern(alternatives):
+    """Returns a compiled pattern that matches any of the alternatives returned by get_fullname_alternatives()."""
     # Because we're operating with unicode instead of raw strings, make sure that
     # the slashes are escaped.
-    fullname_pattern = re.compile(
-        u'\\b({})\\b'.format(u"|".join(patterns)),
+    return re.compile(
+        u'\\b({})\\b'.format(u"|".join(alternatives)),
         re.IGNORECASE + re.UNICODE,
     )
-    return find_all_matches(fullname_pattern, text, "FULLNAME", log_context)
+
+
+def find_user_fullname(text, fullname, log_context=DEFAULT_LOG_CONTEXT):
+    """Culls 'fullnames' originally from auth_userprofile.name and replaces them in text."""
+    alternatives = get_fullname_alternatives(fullname)
+    if alternatives is None:
+        return text
+    return find_all_matches(get_fullname_pattern(alternatives), text, "FULLNAME", log_context)
 
 
 #####################
@@ -472,6 +560,128 @@ def find_facebook(text, log_context=DEFAULT_LOG_CONTEXT):
 
 DEFAULT_ENTITIES = set(['email', 'username', 'fullname', 'phone', 'userid'])
 
+# Patterns for text that must be present in a string for the patterns of an entity to match it.
+ENTITY_TRIGGERS = {
+    'email': u'@',
+    'facebook': u'facebook',
+    'phone': r'\d',
+    'possible_phone': r'\d',
+}
+COMPILED_ENTITY_TRIGGERS = {entity: re.compile(trigger, re.IGNORECASE) for entity, trigger in ENTITY_TRIGGERS.iteritems()}
+# Combinations of triggers for the entities that are in use, compiled on demand.
+COMPILED_TRIGGER_PATTERNS = {}
+
+# Limits how many scanners an Obfuscator keeps for reuse with the same user_info.
+MAXIMUM_CACHED_SCANNERS = 1000
+
+
+class ObfuscationScanner(object):
+    """
+    Applies the obfuscation patterns for a set of entities and user_info to strings.
+
+    The patterns are compiled once, so that a scanner can be applied to every string in a structure.  Each pattern can
+    only match a string that contains certain text (an '@' for emails, a digit for phone numbers, or the name of the
+    user), so a single search for any of these triggers is made before applying the patterns, and strings that contain
+    none of them are returned unchanged.  The patterns themselves are applied in the same order as before, so the
+    result is the same as applying each find function in turn.
+    """
+
+    def __init__(self, entities, user_info=None):
+        # A list of (pattern, label, trigger_pattern) tuples, where trigger_pattern may be None.
+        self.passes = []
+        triggers = set()
+        # Lowercase text that must be present for the patterns for the user to match.
+        self.literals = []
+        # Context patterns are only used in development, and have no simple triggers.
+        self.always_scan = False
+
+        def add_entity_pass(entity, pattern, label):
+            """Adds a pattern that is only applied to strings that contain the trigger for its entity."""
+            self.passes.append((pattern, label, COMPILED_ENTITY_TRIGGERS[entity]))
+            triggers.add(ENTITY_TRIGGERS[entity])
+
+        # Names can appear in emails and identifying urls, so find them before the names.
+        if 'email' in entities:
+            add_entity_pass('email', COMPILED_EMAIL_PATTERN, "EMAIL")
+        if 'facebook' in entities:
+            add_entity_pass('facebook', FACEBOOK_PATTERN, "FACEBOOK")
+
+        # Find Names and IDs, using supplied information to search for.
+        if user_info is not None:
+            if 'fullname' in entities:
+                for fullname in user_info.get('name', []):
+                    alternatives = get_fullname_alternatives(fullname)
+                    if alternatives is not None:
+                        self.passes.append((get_fullname_pattern(alternatives), "FULLNAME", None))
+                        # The only characters escaped in the alternatives are punctuation.
+                        self.literals.extend(alternative.replace('\\', '') for alternative in alternatives)
+
+            if 'username' in entities:
+                for username in user_info.get('username', []):
+                    self.passes.append((get_username_pattern(username), "USERNAME", None))
+                    self.literals.append(username)
+
+            if 'userid' in entities:
+                for user_id in user_info.get('user_id', []):
+                    self.passes.append((get_userid_pattern(user_id), "USER_ID", None))
+                    user_id_string = u'{}'.format(user_id)
+                    if user_id_string.isdigit():
+                        self.literals.append(user_id_string)
+                    else:
+                        # The user_id is used as a regular expression, so it has no simple trigger.
+                        self.always_scan = True
+
+        # Find phone numbers.
+        if 'phone' in entities:
+            add_entity_pass('phone', COMPILED_PHONE_PATTERN, "PHONE_NUMBER")
+        if 'possible_phone' in entities:
+            add_entity_pass('possible_phone', COMPILED_POSSIBLE_PHONE_PATTERN, "POSSIBLE_PHONE_NUMBER")
+
+        # Look for context *after* looking for items?
+        # (If we need the original item for context, then we should do
+        # context first, but it must not overlap with actual item.)
+        # E.g. "facebook" in context and in url.
+        for entity, pattern, label in (
+                ('email_context', EMAIL_CONTEXT, "EMAIL_CONTEXT"),
+                ('phone_context', PHONE_CONTEXT, "PHONE_CONTEXT"),
+                ('name_context', NAME_CONTEXT, "NAME_CONTEXT"),
+        ):
+            if entity in entities:
+                self.passes.append((pattern, label, None))
+                self.always_scan = True
+
+        self.literals = [literal.lower() for literal in self.literals]
+        self.trigger_pattern = None
+        if triggers:
+            key = frozenset(triggers)
+            if key not in COMPILED_TRIGGER_PATTERNS:
+                COMPILED_TRIGGER_PATTERNS[key] = re.compile(u'|'.join(sorted(triggers)), re.IGNORECASE)
+            self.trigger_pattern = COMPILED_TRIGGER_PATTERNS[key]
+
+    def might_match(self, text):
+        """Returns False if none of the patterns can match the text."""
+        # Byte strings are compared with the patterns byte by byte, so don't try to find literals in them.
+        if self.always_scan or not isinstance(text, unicode):
+            return True
+        if self.trigger_pattern is not None and self.trigger_pattern.search(text) is not None:
+            return True
+        if self.literals:
+            # Case-insensitive matching compares the lowercase forms of characters, so this finds at least every
+            # string that the patterns for the user would match.
+            lowercase_text = text.lower()
+            return any(literal in lowercase_text for literal in self.literals)
+        return False
+
+    def scan(self, text, log_context=DEFAULT_LOG_CONTEXT):
+        """Returns the text with all matches of the patterns replaced."""
+        if not self.passes or not self.might_match(text):
+            return text
+
+        for pattern, label, trigger_pattern in self.passes:
+            if trigger_pattern is None or trigger_pattern.search(text) is not None:
+                text = find_all_matches(pattern, text, label, log_context)
+        return text
+
 
 class Obfuscator(object):
     """Class for configuring and then applying obfuscation algorithms to data structures."""
@@ -484,6 +694,28 @@ class Obfuscator(object):
             self.log_context = kwargs['log_context']
         if 'entities' in kwargs:
             self.entities = kwargs['entities']
+        self.scanners = {}
+
+    def get_scanner(self, user_info=None, entities=None):
+        """Returns an ObfuscationScanner for the user_info and entities, reusing one made for the same values."""
+        if entities is None:
+            entities = self.entities
+
+        if user_info is None:
+            user_info_key = None
+        else:
+            user_info_key = tuple(
+                (key, tuple(user_info.get(key, []))) for key in ('name', 'username', 'user_id')
+            )
+        key = (frozenset(entities), user_info_key)
+
+        scanner = self.scanners.get(key)
+        if scanner is None:
+            if len(self.scanners) >= MAXIMUM_CACHED_SCANNERS:
+                self.scanners.clear()
+            scanner = ObfuscationScanner(entities, user_info)
+            self.scanners[key] = scanner
+        return scanner
 
     def is_logging_enabled(self):
         """
@@ -523,50 +755,16 @@ class Obfuscator(object):
         """
         if log_context is None:
             log_context = self.log_context
-        if entities is None:
-            entities = self.entities
-
-        # Names can appear in emails and identifying urls, so find them before the names.
-        if 'email' in entities:
-            text = find_emails(text, log_context)
-        if 'facebook' in entities:
-            text = find_facebook(text, log_context)
-
-        # Find Names and IDs, using supplied information to search for.
-        if user_info is not None:
-            if 'fullname' in entities:
-                for fullname in user_info.get('name', []):
-                    text = find_user_fullname(text, fullname, log_context)
-
-            if 'username' in entities:
-                for username in user_info.get('username', []):
-                    text = find_username(text, username, log_context)
-
-            if 'userid' in entities:
-                for user_id in user_info.get('user_id', []):
-                    text = find_userid(text, user_id, log_context)
-
-        # Find phone numbers.
-        if 'phone' in entities:
-            text = find_phone_numbers(text, log_context)
-        if 'possible_phone' in entities:
-            text = find_possible_phone_numbers(text, log_context)
-
-        # Look for context *after* looking for items?
-        # (If we need the original item for context, then we should do
-        # context first, but it must not overlap with actual item.)
-        # E.g. "facebook" in context and in url.
-        if 'email_context' in entities:
-            text = find_email_context(text, log_context)
-        if 'phone_context' in entities:
-            text = find_phone_context(text, log_context)
-        if 'name_context' in entities:
-            text = find_name_context(text, log_context)
-
-        return text
+        return self.get_scanner(user_info, entities).scan(text, log_context)
 
     def obfuscate_structure(self, obj, label, user_info=None, log_context=None, entities=None):
         """Returns a modified object if any string contained within it was obfuscated, None otherwise."""
+        if log_context is None:
+            log_context = self.log_context
+        return self._obfuscate_structure(obj, label, self.get_scanner(user_info, entities), log_context)
+
+    def _obfuscate_structure(self, obj, label, scanner, log_context):
+        """Applies the scanner to each string within obj, returning a modified object if any changed, else None."""
 
         if isinstance(obj, dict):
             new_dict = {}
@@ -577,7 +775,7 @@ class Obfuscator(object):
                     new_label = u"{}.{}".format(label, key.decode('utf8'))
                 else:
                     new_label = u"{}.{}".format(label, key)
-                updated_value = self.obfuscate_structure(value, new_label, user_info, log_context, entities)
+                updated_value = self._obfuscate_structure(value, new_label, scanner, log_context)
                 if updated_value is not None:
                     changed = True
                     new_dict[key] = updated_value
@@ -592,7 +790,7 @@ class Obfuscator(object):
             changed = False
             for index, value in enumerate(obj):
                 new_label = u"{}[{}]".format(label, index)
-                updated_value = self.obfuscate_structure(value, new_label, user_info, log_context, entities)
+                updated_value = self._obfuscate_structure(value, new_label, scanner, log_context)
                 if updated_value is not None:
                     changed = True
                     new_list.append(updated_value)
@@ -607,14 +805,14 @@ class Obfuscator(object):
             if needs_backslash_decoding(obj):
                 decoded_obj = backslash_decode_value(obj)
                 new_label = u"{}*d".format(label)
-                updated_value = self.obfuscate_structure(decoded_obj, new_label, user_info, log_context, entities)
+                updated_value = self._obfuscate_structure(decoded_obj, new_label, scanner, log_context)
                 if updated_value is not None:
                     return backslash_encode_value(updated_value)
                 else:
                     return None
 
             # Only obfuscate once backslashes have been decoded as many times as needed.
-            updated_value = self.obfuscate_text(obj, user_info, log_context, entities)
+            updated_value = scanner.scan(obj, log_context)
             if obj != updated_value:
                 if self.is_logging_enabled():
                     log.info(u"Obfuscated '%s'", label)
@@ -624,7 +822,7 @@ class Obfuscator(object):
         elif isinstance(obj, str):
             unicode_obj = obj.decode('utf8')
             new_label = u"{}*u".format(label)
-            updated_value = self.obfuscate_structure(unicode_obj, new_label, user_info, log_context, entities)
+            updated_value = self._obfuscate_structure(unicode_obj, new_label, scanner, log_context)
             if updated_value is not None:
                 return updated_value.encode('utf8')
             else:
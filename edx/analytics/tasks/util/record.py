@@ -5,6 +5,11 @@ import re
 import datetime
 import itertools
 
+try:
+    import numpy
+except ImportError:
+    numpy = None  # pylint: disable=invalid-name
+
 
 DEFAULT_NULL_VALUE = '\\N'  # This is the default string used by Hive to represent a NULL value.
 
@@ -71,6 +76,18 @@ class Record(object):
     """
 
     def __init__(self, *args, **kwargs):
+        field_names, field_objs = self.get_field_sequences()
+        if len(args) == len(field_names) and not kwargs:
+            # This is by far the most common case, so avoid the bookkeeping needed to report invalid arguments unless
+            # there is actually a problem.
+            for field_name, field_obj, val in itertools.izip(field_names, field_objs, args):
+                if field_obj.validate(val):
+                    # This raises a descriptive error.
+                    self.initialize_field(field_name, val)
+            self.__dict__.update(itertools.izip(field_names, args))
+            self.__dict__['_initialized'] = True
+            return
+
         fields = self.get_fields()
 
         # First process all of the positional arguments, and map them to the fields in order of field declaration.
@@ -216,6 +233,42 @@ class Record(object):
 
         return field_dict
 
+    @classmethod
+    def get_field_sequences(cls):
+        """
+        Get the names and the field objects of this record in order of declaration.
+
+        This is equivalent to `get_fields()`, but tuples are much cheaper to iterate over when processing each record.
+
+        Returns: A tuple containing a tuple of field names and a tuple of the corresponding field objects.
+        """
+        class_private_var_name = '_{0}__field_sequences'.format(cls.__name__)
+        field_sequences = getattr(cls, class_private_var_name, None)
+        if field_sequences is None:
+            fields = cls.get_fields()
+            field_sequences = (tuple(fields.keys()), tuple(fields.values()))
+            setattr(cls, class_private_var_name, field_sequences)
+
+        return field_sequences
+
+    @classmethod
+    def from_trusted_values(cls, values):
+        """
+        Construct a record from a sequence of typed values without validating them.
+
+        This should only be used for data that is known to be valid, such as data that was produced by another record of
+        the same type.
+
+        Arguments:
+            values (iterable): The values for the fields in order of declaration.
+
+        """
+        field_names = cls.get_field_sequences()[0]
+        record = cls.__new__(cls)
+        record.__dict__.update(itertools.izip(field_names, values))
+        record.__dict__['_initialized'] = True
+        return record
+
     def replace(self, **kwargs):
         """
         Returns: a new Record with identical values except for those specified in the kwargs, which override any
@@ -236,17 +289,15 @@ class Record(object):
 
         """
         if string_encoder is None:
-            string_encoder = HiveTsvEncoder()
-
-        field_values = []
-        for field_name, field_obj in self.get_fields().items():
-            val = getattr(self, field_name)
-            if val is not None:
-                val = field_obj.serialize_to_string(val)
+            string_encoder = DEFAULT_STRING_ENCODER
 
-            field_values.append(string_encoder.encode(val, field_obj))
-
-        return tuple(field_values)
+        encode = string_encoder.encode
+        values = self.__dict__
+        field_names, field_objs = self.get_field_sequences()
+        return tuple([
+            encode(None if values[field_name] is None else field_obj.serialize_to_string(values[field_name]), field_obj)
+            for field_name, field_obj in itertools.izip(field_names, field_objs)
+        ])
 
     def to_ordered_dict(self):
         """
@@ -275,7 +326,7 @@ class Record(object):
         return utf8sep.join(self.to_string_tuple(string_encoder=string_encoder))
 
     @classmethod
-    def from_string_tuple(cls, string_tuple, string_decoder=None):
+    def from_string_tuple(cls, string_tuple, string_decoder=None, validate=True):
         """
         Construct a record from an iterable of strings.
 
@@ -285,34 +336,102 @@ class Record(object):
         Arguments:
             string_tuple (iterable): The values for the fields as strings.
             string_decoder : The string encoder to decode the strings with.
+            validate (bool): If False, the typed values are not validated. This is only safe for data that was written
+                by a record of the same type, such as the output of an earlier job in the pipeline.
 
         """
         if string_decoder is None:
-            string_decoder = HiveTsvEncoder()
+            string_decoder = DEFAULT_STRING_ENCODER
 
-        fields = cls.get_fields()
-        if len(string_tuple) != len(fields):
+        field_objs = cls.get_field_sequences()[1]
+        if len(string_tuple) != len(field_objs):
             raise ValueError('The length of the tuple of strings must exactly match the number of fields in the Record')
+
+        decode = string_decoder.decode
         typed_field_values = []
-        for str_value, field_name in zip(string_tuple, fields):
-            field_obj = fields[field_name]
-            value = string_decoder.decode(str_value, field_obj)
+        for str_value, field_obj in itertools.izip(string_tuple, field_objs):
+            value = decode(str_value, field_obj)
             if value is not None:
                 value = field_obj.deserialize_from_string(value)
 
             typed_field_values.append(value)
 
-        return cls(*typed_field_values)
+        if validate:
+            return cls(*typed_field_values)
+        else:
+            return cls.from_trusted_values(typed_field_values)
 
     @classmethod
-    def from_tsv(cls, tsv_str):
+    def from_tsv(cls, tsv_str, validate=True):
         """
         Construct a record from a tab-separated string.
 
         Arguments:
             tsv_str (string): The TSV formatted string that represents the record.
+            validate (bool): If False, the typed values are not validated, see `from_string_tuple`.
         """
-        return cls.from_string_tuple(tuple(tsv_str.rstrip('\r\n').split('\t')))
+        return cls.from_string_tuple(tsv_str.rstrip('\r\n').split('\t'), validate=validate)
+
+    @classmethod
+    def columns_from_tsv(cls, tsv_strs, field_names=None, string_decoder=None):
+        """
+        Decode a batch of tab-separated strings into one column of values per field.
+
+        Columns of numeric fields are NumPy arrays that are converted in bulk, which is much cheaper than constructing a
+        record for each string when all that is needed is to aggregate the values of a few fields. If a numeric column
+        contains any null values, it is returned as an array of floats in which those values are NaN. The values in other
+        columns are decoded exactly as they are by `from_string_tuple`. Note that the values are not validated.
+
+        Arguments:
+            tsv_strs (iterable): The TSV formatted strings that represent the records.
+            field_names (iterable): The names of the fields to decode, defaults to all fields.
+            string_decoder : The string encoder to decode the strings with.
+
+        Returns: An OrderedDict mapping field names to their columns, in order of declaration.
+        """
+        if numpy is None:
+            raise RuntimeError('NumPy is required to decode records into columns.')
+
+        if string_decoder is None:
+            string_decoder = DEFAULT_STRING_ENCODER
+
+        all_field_names, field_objs = cls.get_field_sequences()
+        if field_names is None:
+            field_names = all_field_names
+        else:
+            field_names = set(field_names)
+            unknown_field_names = field_names.difference(all_field_names)
+            if unknown_field_names:
+                raise ValueError('Unknown fields specified: {0}'.format(', '.join(sorted(unknown_field_names))))
+
+        rows = [tsv_str.rstrip('\r\n').split('\t') for tsv_str in tsv_strs]
+        for row in rows:
+            if len(row) != len(field_objs):
+                raise ValueError('The number of values must exactly match the number of fields in the Record')
+        string_columns = itertools.izip(*rows) if rows else itertools.repeat(())
+
+        columns = OrderedDict()
+        for field_name, field_obj, string_column in itertools.izip(all_field_names, field_objs, string_columns):
+            if field_name not in field_names:
+                continue
+
+            if field_obj.numpy_dtype is not None:
+                string_array = numpy.array(string_column, dtype=str)
+                is_null = string_array == string_decoder.null_value
+                if is_null.any():
+                    columns[field_name] = numpy.where(is_null, 'nan', string_array).astype(float)
+                else:
+                    columns[field_name] = string_array.astype(field_obj.numpy_dtype)
+            else:
+                decoded_values = []
+                for str_value in string_column:
+                    value = string_decoder.decode(str_value, field_obj)
+                    if value is not None:
+                        value = field_obj.deserialize_from_string(value)
+                    decoded_values.append(value)
+                columns[field_name] = tuple(decoded_values)
+
+        return columns
 
     @classmethod
     def get_sql_schema(cls):
@@ -396,6 +515,9 @@ class Record(object):
         return '\n'.join(field_doc)
 
 
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
 class HiveTsvEncoder(object):
 
     def __init__(self, normalize_whitespace=False, **kwargs):
@@ -406,8 +528,8 @@ class HiveTsvEncoder(object):
         if decoded_string is None:
             return self.null_value
         else:
-            if self.normalize_whitespace or getattr(field_obj, 'normalize_whitespace', False):
-                decoded_string = re.sub(r'\s+', ' ', decoded_string)
+            if self.normalize_whitespace or field_obj.normalize_whitespace:
+                decoded_string = WHITESPACE_PATTERN.sub(' ', decoded_string)
 
         return decoded_string.encode('utf8')
 
@@ -418,6 +540,10 @@ class HiveTsvEncoder(object):
             return encoded_string.decode('utf8')
 
 
+# Encoders hold no state other than their configuration, so the default one is shared by all records.
+DEFAULT_STRING_ENCODER = HiveTsvEncoder()
+
+
 class Field(object):
     """
     Represents a field within a record.
@@ -428,6 +554,9 @@ class Field(object):
     declared schema.
     """
     counter = 0
+    normalize_whitespace = False
+    # The type of the NumPy arrays that hold columns of values of this field, see Record.columns_from_tsv().
+    numpy_dtype = None
 
     def __init__(self, **kwargs):
         self.nullable = kwargs.pop('nullable', True)
@@ -521,10 +650,12 @@ class StringField(Field):  # pylint: disable=abstract-method
 
     def serialize_to_string(self, value):
         """Returns a unicode string representation of a value for this field."""
+        if isinstance(value, unicode):
+            # Check for this up front since it is the common case and raising an exception is relatively expensive.
+            return value
         try:
             return unicode(value, encoding=getattr(self, 'encoding', 'utf8'))
         except TypeError:
-            # It's already a unicode string
             return value
 
     @property
@@ -593,6 +724,7 @@ class IntegerField(Field):  # pylint: disable=abstract-method
 
     hive_type = sql_base_type = 'INT'
     elasticsearch_type = 'integer'
+    numpy_dtype = 'int64'
 
     def validate(self, value):
         validation_errors = super(IntegerField, self).validate(value)
@@ -681,6 +813,7 @@ class FloatField(Field):  # pylint: disable=abstract-method
 
     hive_type = sql_base_type = 'FLOAT'
     elasticsearch_type = 'float'
+    numpy_dtype = 'float64'
 
     def validate(self, value):
         validation_errors = super(FloatField, self).validate(value)
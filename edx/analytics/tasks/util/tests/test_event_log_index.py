@@ -0,0 +1,52 @@
+"""Tests for summaries of the contents of tracking log files."""
+
+from edx.analytics.tasks.tests import unittest
+from edx.analytics.tasks.util.event_log_index import EventLogIndex, get_index_url, is_index_url
+
+
+class EventLogIndexTest(unittest.TestCase):
+    """Tests for EventLogIndex."""
+
+    def setUp(self):
+        self.index = EventLogIndex()
+        self.index.add('play_video', '2014-03-02')
+        self.index.add('/courses/foo/bar/baz/courseware', '2014-03-01')
+        self.index.add('/courses/foo/bar/baz/info', '2014-03-03')
+
+    def test_add(self):
+        self.assertEquals(self.index.event_type_counts, {'play_video': 1, '/': 2})
+        self.assertEquals(self.index.min_date, '2014-03-01')
+        self.assertEquals(self.index.max_date, '2014-03-03')
+
+    def test_event_types(self):
+        self.assertTrue(self.index.may_contain(['play_video', 'pause_video']))
+        self.assertTrue(self.index.may_contain(['/courses/foo/bar/baz/progress']))
+        self.assertFalse(self.index.may_contain(['problem_check']))
+
+    def test_dates(self):
+        self.assertTrue(self.index.may_contain(date_a='2014-03-03', date_b='2014-03-04'))
+        self.assertTrue(self.index.may_contain(date_a='2014-02-01', date_b='2014-03-02'))
+        self.assertFalse(self.index.may_contain(date_a='2014-03-04', date_b='2014-03-05'))
+        self.assertFalse(self.index.may_contain(date_a='2014-02-01', date_b='2014-03-01'))
+
+    def test_empty_index(self):
+        index = EventLogIndex(unparsed_count=10)
+        self.assertFalse(index.may_contain())
+
+    def test_update(self):
+        other = EventLogIndex({'play_video': 2, 'problem_check': 1}, '2014-02-28', '2014-03-01', 3)
+        self.index.update(other)
+        self.assertEquals(self.index.event_type_counts, {'play_video': 3, 'problem_check': 1, '/': 2})
+        self.assertEquals(self.index.min_date, '2014-02-28')
+        self.assertEquals(self.index.max_date, '2014-03-03')
+        self.assertEquals(self.index.unparsed_count, 3)
+
+    def test_serialization(self):
+        index = EventLogIndex.from_json(self.index.to_json())
+        self.assertEquals(index.to_json(), self.index.to_json())
+        self.assertEquals(index.event_type_counts, self.index.event_type_counts)
+
+    def test_index_url(self):
+        index_url = get_index_url('s3://foo/tracking.log-20140301.gz')
+        self.assertTrue(is_index_url(index_url))
+        self.assertFalse(is_index_url('s3://foo/tracking.log-20140301.gz'))
@@ -157,6 +157,39 @@ class GetEventDataTest(unittest.TestCase):
         self.assertIn('unrecognized type', self.mock_log.error.call_args[0][0])
 
 
+class CachedEventDataTest(unittest.TestCase):
+    """Verify that the event data of an Event is only decoded once."""
+
+    def setUp(self):
+        self.event = eventlog.Event(
+            eventlog.parse_json_event('{"username": "bub", "time": "now", "event": "{\\"a\\": \\"b\\"}"}')
+        )
+
+    def test_event_data_is_cached(self):
+        with patch('edx.analytics.tasks.util.eventlog.decode_json', wraps=eventlog.decode_json) as mock_decode:
+            event_data = eventlog.get_event_data(self.event)
+            self.assertIs(eventlog.get_event_data(self.event), event_data)
+        self.assertEquals(event_data, {"a": "b"})
+        self.assertEquals(mock_decode.call_count, 1)
+
+    def test_plain_event_data_is_not_cached(self):
+        event = dict(self.event)
+        with patch('edx.analytics.tasks.util.eventlog.decode_json', wraps=eventlog.decode_json) as mock_decode:
+            eventlog.get_event_data(event)
+            eventlog.get_event_data(event)
+        self.assertEquals(mock_decode.call_count, 2)
+
+    def test_replaced_event_data(self):
+        self.assertEquals(eventlog.get_event_data(self.event), {"a": "b"})
+        self.event['event'] = '{"c": "d"}'
+        self.assertEquals(eventlog.get_event_data(self.event), {"c": "d"})
+
+    def test_augmented_event_data_is_copied(self):
+        event_data = eventlog.get_augmented_event_data(self.event, ['username'])
+        self.assertEquals(event_data, {"a": "b", "username": "bub"})
+        self.assertEquals(eventlog.get_event_data(self.event), {"a": "b"})
+
+
 class GetCourseIdTest(unittest.TestCase):
     """Verify that get_course_id works as expected."""
 
@@ -0,0 +1,138 @@
+"""Tests for file utilities."""
+
+import gzip
+import StringIO
+import tempfile
+
+from ddt import ddt, data
+
+from edx.analytics.tasks.tests import unittest
+from edx.analytics.tasks.util.file_util import open_gzip_stream, get_line_aligned_byte_ranges, ByteRangeFile
+
+
+def compress(content):
+    """Returns the content as a gzip file."""
+    compressed = StringIO.StringIO()
+    gzip_file = gzip.GzipFile(fileobj=compressed, mode='wb')
+    gzip_file.write(content)
+    gzip_file.close()
+    return compressed.getvalue()
+
+
+class NonSeekableFile(object):
+    """A file that can only be read sequentially, like a pipe."""
+
+    def __init__(self, content, error=None):
+        self.content = StringIO.StringIO(content)
+        self.error = error
+        self.closed = False
+
+    def read(self, size=-1):
+        """Read from the file, raising the error if there is one once all of the content has been read."""
+        block = self.content.read(size)
+        if not block and self.error:
+            raise self.error
+        return block
+
+    def close(self):
+        """Close the file."""
+        self.closed = True
+
+
+@ddt
+class OpenGzipStreamTest(unittest.TestCase):
+    """Tests for open_gzip_stream."""
+
+    CONTENT = ''.join('line {0}\n'.format(i) for i in range(1000))
+
+    def read_lines(self, compressed, **kwargs):
+        """Returns the lines decompressed from a non-seekable file."""
+        with open_gzip_stream(NonSeekableFile(compressed), **kwargs) as gzip_stream:
+            return list(gzip_stream)
+
+    @data(0, 1, 4)
+    def test_small_buffers(self, read_ahead):
+        lines = self.read_lines(compress(self.CONTENT), buffer_size=7, read_ahead=read_ahead)
+        self.assertEquals(''.join(lines), self.CONTENT)
+        self.assertEquals(lines[-1], 'line 999\n')
+
+    def test_default_buffers(self):
+        self.assertEquals(''.join(self.read_lines(compress(self.CONTENT))), self.CONTENT)
+
+    @data(1, 16, 1024 * 1024)
+    def test_multiple_members(self, buffer_size):
+        compressed = compress('a\nb') + compress('c\n') + compress('') + compress('d\n')
+        self.assertEquals(self.read_lines(compressed, buffer_size=buffer_size), ['a\n', 'bc\n', 'd\n'])
+
+    def test_zero_padding(self):
+        compressed = compress('a\n') + '\x00' * 10
+        self.assertEquals(self.read_lines(compressed, buffer_size=4), ['a\n'])
+
+    def test_empty_file(self):
+        self.assertEquals(self.read_lines(compress('')), [])
+
+    @data(1, 8, 100)
+    def test_truncated_file(self, num_bytes_removed):
+        compressed = compress('a\n') + compress(self.CONTENT)
+        with self.assertRaises(IOError):
+            self.read_lines(compressed[:-num_bytes_removed], buffer_size=16)
+
+    def test_truncated_at_buffer_boundary(self):
+        compressed = compress(self.CONTENT)
+        compressed = compressed[:-4]
+        with self.assertRaises(IOError):
+            self.read_lines(compressed, buffer_size=len(compressed))
+
+    def test_highly_compressible(self):
+        content = 'a' * (1024 * 1024) + '\n'
+        self.assertEquals(self.read_lines(compress(content), buffer_size=64), [content])
+
+    @data(0, 2)
+    def test_read_error(self, read_ahead):
+        input_file = NonSeekableFile(compress(self.CONTENT), error=IOError('connection reset'))
+        with self.assertRaises(IOError):
+            with open_gzip_stream(input_file, buffer_size=64, read_ahead=read_ahead) as gzip_stream:
+                list(gzip_stream)
+
+    @data(0, 2)
+    def test_close(self, read_ahead):
+        input_file = NonSeekableFile(compress(self.CONTENT))
+        gzip_stream = open_gzip_stream(input_file, buffer_size=16, read_ahead=read_ahead)
+        self.assertEquals(gzip_stream.readline(), 'line 0\n')
+        gzip_stream.close()
+        self.assertTrue(input_file.closed)
+
+
+@ddt
+class ByteRangeTest(unittest.TestCase):
+    """Tests for splitting a file into line aligned byte ranges."""
+
+    def read_ranges(self, content, num_ranges):
+        """Returns the content of each range that the content is split into."""
+        with tempfile.NamedTemporaryFile() as input_file:
+            input_file.write(content)
+            input_file.flush()
+            contents = []
+            for start, end in get_line_aligned_byte_ranges(input_file.name, num_ranges):
+                with ByteRangeFile(input_file.name, start, end) as range_file:
+                    contents.append(''.join(iter(lambda: range_file.read(3), '')))
+            return contents
+
+    @data(1, 2, 3, 7, 100)
+    def test_ranges(self, num_ranges):
+        content = ''.join('line {0}\n'.format(i) for i in range(50))
+        contents = self.read_ranges(content, num_ranges)
+        self.assertEquals(''.join(contents), content)
+        self.assertEquals(len(contents), min(num_ranges, 50))
+        for range_content in contents:
+            self.assertTrue(range_content.endswith('\n'))
+
+    def test_long_lines(self):
+        content = 'a' * 100 + '\n' + 'b\n'
+        self.assertEquals(self.read_ranges(content, 4), ['a' * 100 + '\n', 'b\n'])
+
+    def test_no_trailing_newline(self):
+        self.assertEquals(self.read_ranges('a\nb\nc', 3), ['a\n', 'b\n', 'c'])
+
+    def test_empty_file(self):
+        self.assertEquals(self.read_ranges('', 3), [''])
@@ -1,7 +1,11 @@
 """
 Tests for encoding/decoding id values.
 """
-from ddt import ddt, data
+import random
+
+from ddt import ddt, data, unpack
+from mock import patch
+import numpy
 
 import edx.analytics.tasks.util.id_codec as id_codec
 from edx.analytics.tasks.tests import unittest
@@ -27,6 +31,20 @@ class EncodeDecodeIdTest(unittest.TestCase):
         self.assertEquals((SCOPE + suffix, TYPE + suffix, VALUE + suffix), decoded)
 
 
+def permute_with_matrix(seed, bits, int_value, inverse=False):
+    """Permute the bits of an int by multiplying a vector of its bits with a permutation matrix."""
+    mapping = range(bits)
+    random.Random(seed).shuffle(mapping)
+    permutation_matrix = numpy.zeros((bits, bits), dtype=int)
+    for i in range(bits):
+        permutation_matrix[i, mapping[i]] = 1
+    if inverse:
+        permutation_matrix = permutation_matrix.T
+    vec = numpy.array([int(b) for b in bin(int_value)[2:].zfill(bits)])
+    return int("".join(map(str, vec.dot(permutation_matrix))), 2)
+
+
+@ddt
 class PermutationGeneratorTest(unittest.TestCase):
     """Test that PermutationGenerator works correctly."""
 
@@ -39,3 +57,52 @@ class PermutationGeneratorTest(unittest.TestCase):
 
         unpermuted = permutation_generator.unpermute(permuted)
         self.assertEquals(unpermuted, id_value)
+
+    @data(
+        (42, 32),
+        (7, 32),
+        (42, 12),
+        (3, 5),
+    )
+    @unpack
+    def test_matches_permutation_matrix(self, seed, bits):
+        permutation_generator = id_codec.PermutationGenerator(seed, bits, bits)
+        rng = random.Random(0)
+        values = [0, 1, 2 ** bits - 1] + [rng.randrange(2 ** bits) for _ in range(200)]
+        for value in values:
+            self.assertEquals(permutation_generator.permute(value), permute_with_matrix(seed, bits, value))
+            self.assertEquals(
+                permutation_generator.unpermute(value), permute_with_matrix(seed, bits, value, inverse=True)
+            )
+
+    def test_permute_array(self):
+        permutation_generator = id_codec.PermutationGenerator(42, 32, 32)
+        values = [123456, 0, 2 ** 32 - 1, 1, 98765]
+        permuted = permutation_generator.permute_array(values)
+        self.assertEquals(permuted.tolist(), [permutation_generator.permute(value) for value in values])
+        self.assertEquals(permutation_generator.unpermute_array(permuted).tolist(), values)
+
+    def test_permute_array_of_strings(self):
+        permutation_generator = id_codec.PermutationGenerator(42, 32, 32)
+        self.assertEquals(permutation_generator.permute_array(['123456', u'123456']).tolist(), [273678626] * 2)
+
+    def test_permute_empty_array(self):
+        permutation_generator = id_codec.PermutationGenerator(42, 32, 32)
+        self.assertEquals(permutation_generator.permute_array([]).tolist(), [])
+
+    def test_permute_array_without_numpy(self):
+        permutation_generator = id_codec.PermutationGenerator(42, 32, 32)
+        with patch('edx.analytics.tasks.util.id_codec.numpy', None):
+            with self.assertRaisesRegexp(RuntimeError, 'NumPy is required'):
+                permutation_generator.permute_array([1, 2])
+            self.assertEquals(permutation_generator.permute(123456), 273678626)
+
+    @data(-1, 2 ** 32)
+    def test_out_of_range(self, value):
+        permutation_generator = id_codec.PermutationGenerator(42, 32, 32)
+        with self.assertRaises(ValueError):
+            permutation_generator.permute(value)
+        with self.assertRaises(ValueError):
+            permutation_generator.unpermute(value)
+        with self.assertRaises(ValueError):
+            permutation_generator.permute_array([1, value])
@@ -0,0 +1,127 @@
+"""Tests for the persistent cache of source listings."""
+
+import os
+import shutil
+import tempfile
+
+from mock import MagicMock, patch
+
+from edx.analytics.tasks.tests import unittest
+from edx.analytics.tasks.tests.test_s3_util import FakeBucket
+from edx.analytics.tasks.util.listing_cache import ListingCache
+
+
+class ListS3KeysTest(unittest.TestCase):
+    """Test incrementally listing S3 sources."""
+
+    KEY_NAMES = [
+        'logs/server1/tracking.log-20140301.gz',
+        'logs/server1/tracking.log-20140302.gz',
+        'logs/server2/tracking.log-20140301.gz',
+    ]
+
+    def setUp(self):
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root)
+
+        self.bucket = FakeBucket(self.KEY_NAMES)
+        self.s3_conn = MagicMock()
+        self.s3_conn.get_bucket.return_value = self.bucket
+        patcher = patch('edx.analytics.tasks.s3_util.boto.connect_s3')
+        patcher.start().return_value = self.s3_conn
+        self.addCleanup(patcher.stop)
+
+    def list_key_names(self):
+        """List the source using a new cache, and return the names of the keys."""
+        listing_cache = ListingCache(self.cache_root, num_threads=2)
+        return [listed.key for listed in listing_cache.list_s3_keys(self.s3_conn, 'bucket', 'logs/')]
+
+    def test_initial_listing(self):
+        self.assertEquals(self.list_key_names(), self.KEY_NAMES)
+        self.assertItemsEqual(
+            self.bucket.list_calls,
+            [('logs/', '/'), ('logs/server1/', ''), ('logs/server2/', '')]
+        )
+
+    def test_incremental_listing(self):
+        self.list_key_names()
+        self.bucket.key_names = sorted(self.KEY_NAMES + [
+            'logs/server1/tracking.log-20140303.gz',
+            'logs/server3/tracking.log-20140303.gz',
+        ])
+        with patch.object(self.bucket, 'list', wraps=self.bucket.list) as mock_list:
+            self.assertEquals(self.list_key_names(), self.bucket.key_names)
+
+        self.assertItemsEqual(mock_list.call_args_list[1:], [
+            (('logs/server1/',), {'marker': 'logs/server1/tracking.log-20140302.gz'}),
+            (('logs/server2/',), {'marker': 'logs/server2/tracking.log-20140301.gz'}),
+            (('logs/server3/',), {'marker': ''}),
+        ])
+
+    def test_cached_metadata(self):
+        listing_cache = ListingCache(self.cache_root)
+        listing_cache.list_s3_keys(self.s3_conn, 'bucket', 'logs/')
+        self.bucket.key_names = []
+        listed = listing_cache.list_s3_keys(self.s3_conn, 'bucket', 'logs/')
+        self.assertEquals(
+            listed[0],
+            ('logs/server1/tracking.log-20140301.gz', 10, '"etag"', '2014-03-01T00:00:00.000Z')
+        )
+        self.assertEquals(len(listed), 3)
+
+    def test_corrupt_cache(self):
+        self.list_key_names()
+        for filename in os.listdir(self.cache_root):
+            with open(os.path.join(self.cache_root, filename), 'w') as cache_file:
+                cache_file.write('not json')
+        self.assertEquals(self.list_key_names(), self.KEY_NAMES)
+
+
+class ListLocalFilesTest(unittest.TestCase):
+    """Test incrementally listing local sources."""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root)
+        self.listing_cache = ListingCache(self.cache_root)
+
+    def create_file(self, *path):
+        """Create an empty file in the source directory."""
+        file_path = os.path.join(self.source, *path)
+        if not os.path.exists(os.path.dirname(file_path)):
+            os.makedirs(os.path.dirname(file_path))
+        open(file_path, 'w').close()
+        return file_path
+
+    def list_paths(self):
+        """Returns the paths of the files found in the source."""
+        return [listed.key for listed in self.listing_cache.list_local_files(self.source)]
+
+    def test_listing(self):
+        paths = [self.create_file('a', 'tracking.log-1'), self.create_file('b', 'tracking.log-1')]
+        paths.append(self.create_file('tracking.log'))
+        self.assertEquals(self.list_paths(), sorted(paths))
+
+    def test_new_files(self):
+        paths = [self.create_file('a', 'tracking.log-1')]
+        self.assertEquals(self.list_paths(), paths)
+
+        paths.append(self.create_file('a', 'tracking.log-2'))
+        paths.append(self.create_file('b', 'tracking.log-1'))
+        # Make sure the modification time of the directory changes, even on file systems with a low resolution.
+        os.utime(os.path.join(self.source, 'a'), (0, 0))
+        self.assertEquals(self.list_paths(), sorted(paths))
+
+    def test_unmodified_directories_not_listed(self):
+        paths = [self.create_file('a', 'tracking.log-1')]
+        self.list_paths()
+        with patch('edx.analytics.tasks.util.listing_cache.os.listdir') as mock_listdir:
+            self.assertEquals(self.list_paths(), paths)
+        self.assertEquals(mock_listdir.call_count, 0)
+
+    def test_missing_source(self):
+        shutil.rmtree(self.source)
+        self.assertEquals(self.list_paths(), [])
+        os.makedirs(self.source)
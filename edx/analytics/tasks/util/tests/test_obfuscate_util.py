@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 """Tests for obfuscation utilities."""
 
+import os
+import shutil
+import tempfile
 import textwrap
 from ddt import data, ddt, unpack
+import luigi
 from mock import MagicMock, patch
 
 from edx.analytics.tasks.tests import unittest
@@ -673,3 +677,93 @@ class ObfuscatorTestCase(unittest.TestCase):
         user_info = {'name': ['Olav Øyaland'.decode('utf8'), 'Test User']}
         result = obfuscator.obfuscate_structure(text, 'root', user_info=user_info)
         self.assertEquals(result, expected)
+
+    @data(
+        u'nothing to see here',
+        u'half past twelve',
+        u'user at example dot com',
+    )
+    def test_scanner_skips_strings_without_triggers(self, text):
+        obfuscator = obfuscate_util.Obfuscator()
+        user_info = {'username': [u'staff'], 'user_id': [12345], 'name': [u'Static Staff']}
+        with patch('edx.analytics.tasks.util.obfuscate_util.find_all_matches') as mock_find_all_matches:
+            self.assertEquals(obfuscator.obfuscate_text(text, user_info=user_info), text)
+        self.assertFalse(mock_find_all_matches.called)
+
+    @data(
+        (u'Written by STAFF', u'Written by <<USERNAME>>'),
+        (u'\u00c9L\u00c8VE was here', u'<<FULLNAME>> was here'),
+        (u'id 12345 at 555-1234', u'id <<USER_ID>> at <<PHONE_NUMBER>>'),
+        (u'Mail staff@example.com', u'Mail <<EMAIL>>'),
+    )
+    @unpack
+    def test_scanner_triggers(self, text, expected):
+        obfuscator = obfuscate_util.Obfuscator()
+        user_info = {'username': [u'staff'], 'user_id': [12345], 'name': [u'\u00c9l\u00e8ve Un']}
+        self.assertEquals(obfuscator.obfuscate_text(text, user_info=user_info), expected)
+
+    def test_scanner_reuse(self):
+        obfuscator = obfuscate_util.Obfuscator()
+        scanner = obfuscator.get_scanner({'username': [u'staff'], 'user_id': [4]})
+        self.assertIs(obfuscator.get_scanner({'username': [u'staff'], 'user_id': [4]}), scanner)
+        self.assertIsNot(obfuscator.get_scanner({'username': [u'staff'], 'user_id': [5]}), scanner)
+        self.assertIsNot(obfuscator.get_scanner({'username': [u'staff'], 'user_id': [4]}, entities=['email']), scanner)
+
+
+class UserInfoIndexTestTask(obfuscate_util.UserInfoMixin, luigi.Task):
+    """A task that looks up user info."""
+    pass
+
+
+class UserInfoIndexTaskTestCase(unittest.TestCase):
+    """Test looking up user info in an index built from auth_user and auth_userprofile."""
+
+    def setUp(self):
+        super(UserInfoIndexTaskTestCase, self).setUp()
+        obfuscate_util.reset_user_info_for_testing()
+        self.addCleanup(obfuscate_util.reset_user_info_for_testing)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def write_file(self, filename, contents):
+        """Write contents to a file in the temporary directory, formatted like Sqoop output."""
+        path = os.path.join(self.temp_dir, filename)
+        with open(path, 'w') as output_file:
+            output_file.write(textwrap.dedent(contents).strip().replace('\t', '\x01'))
+        return path
+
+    def test_index(self):
+        auth_user_path = self.write_file('auth_user', u"""
+            1	honor
+            2	audit
+            3	verified
+            4	élève
+            five	broken
+        """.encode('utf8'))
+        auth_userprofile_path = self.write_file('auth_userprofile', u"""
+            1	Honor Student
+            3	Verified Vera
+            4	Élève Un
+            6	Unknown User
+        """.encode('utf8'))
+        kwargs = {
+            'auth_user_path': auth_user_path,
+            'auth_userprofile_path': auth_userprofile_path,
+            'user_info_index_path': os.path.join(self.temp_dir, 'user_info.idx'),
+        }
+        index_task = obfuscate_util.UserInfoIndexTask(**kwargs)
+        index_task.run()
+        self.assertTrue(index_task.complete())
+
+        task = UserInfoIndexTestTask(**kwargs)
+        self.assertEquals(task.user_info_requirements(), {'user_info_index': index_task})
+        expected = {
+            1: {'user_id': 1, 'username': u'honor', 'name': u'Honor Student'},
+            2: {'user_id': 2, 'username': u'audit'},
+            3: {'user_id': 3, 'username': u'verified', 'name': u'Verified Vera'},
+            4: {'user_id': 4, 'username': u'\u00e9l\u00e8ve', 'name': u'\u00c9l\u00e8ve Un'},
+        }
+        self.assertDictEqual(dict(task.user_by_id), expected)
+        self.assertDictEqual(
+            dict(task.user_by_username), {user_info['username']: user_info for user_info in expected.values()}
+        )
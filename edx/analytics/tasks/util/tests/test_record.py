@@ -4,6 +4,8 @@ import datetime
 import dateutil
 import pickle
 
+import numpy
+
 from ddt import data, ddt, unpack
 
 from edx.analytics.tasks.tests import unittest
@@ -232,6 +234,55 @@ class RecordTestCase(unittest.TestCase):
         self.assertEqual(test_record.index, 0)
         self.assertEqual(test_record.date, datetime.date(2015, 11, 1))
 
+    def test_from_tsv_without_validation(self):
+        tsv_string = 'foo\t0\t2015-11-01\n'
+        test_record = SampleStruct.from_tsv(tsv_string, validate=False)
+        self.assertEqual(test_record, SampleStruct.from_tsv(tsv_string))
+        with self.assertRaisesRegexp(TypeError, 'Records are intended to be immutable'):
+            test_record.name = 'bar'
+
+    def test_from_trusted_values_skips_validation(self):
+        test_record = SampleStruct.from_trusted_values(['foo', 'not an integer', None])
+        self.assertEqual(test_record.index, 'not an integer')
+        self.assertEqual(test_record.to_string_tuple(), ('foo', 'not an integer', '\\N'))
+
+    def test_columns_from_tsv(self):
+        columns = SampleStruct.columns_from_tsv(['foo\t0\t2015-11-01\n', '\\N\t12\t2015-11-02\n'])
+        self.assertEqual(columns.keys(), ['name', 'index', 'date'])
+        self.assertEqual(columns['name'], ('foo', None))
+        self.assertEqual(columns['index'].dtype, numpy.int64)
+        self.assertEqual(columns['index'].tolist(), [0, 12])
+        self.assertEqual(columns['date'], (datetime.date(2015, 11, 1), datetime.date(2015, 11, 2)))
+
+    def test_columns_from_tsv_subset(self):
+        columns = SampleStruct.columns_from_tsv(['foo\t0\t2015-11-01', 'bar\t\\N\t2015-11-02'], field_names=['index'])
+        self.assertEqual(columns.keys(), ['index'])
+        self.assertEqual(columns['index'][0], 0)
+        self.assertTrue(numpy.isnan(columns['index'][1]))
+
+    def test_columns_from_tsv_floats(self):
+        columns = FloatRecord.columns_from_tsv(['1.5', 'inf', '-2'])
+        self.assertEqual(columns['value'].dtype, numpy.float64)
+        self.assertEqual(columns['value'].tolist(), [1.5, float('inf'), -2.0])
+
+    def test_columns_from_tsv_empty(self):
+        columns = SampleStruct.columns_from_tsv([])
+        self.assertEqual(len(columns['index']), 0)
+        self.assertEqual(columns['name'], ())
+
+    def test_columns_from_tsv_errors(self):
+        with self.assertRaisesRegexp(ValueError, 'Unknown fields specified: foo'):
+            SampleStruct.columns_from_tsv(['foo\t0\t2015-11-01'], field_names=['foo', 'index'])
+        with self.assertRaisesRegexp(ValueError, 'number of values must exactly match'):
+            SampleStruct.columns_from_tsv(['foo\t0'])
+
+    def test_field_sequences(self):
+        self.assertEqual(
+            SampleStruct.get_field_sequences(),
+            (tuple(SampleStruct.get_fields().keys()), tuple(SampleStruct.get_fields().values()))
+        )
+        self.assertEqual(ExtendedSingleField.get_field_sequences()[0], ('name', 'another_field'))
+
     def test_immutability_set(self):
         test_record = SingleFieldRecord(name='foo')
         with self.assertRaisesRegexp(TypeError, 'Records are intended to be immutable'):
@@ -425,6 +476,11 @@ class SampleStruct(Record):
     date = DateField()
 
 
+class FloatRecord(Record):
+    """A record with a single floating point field"""
+    value = FloatField()
+
+
 class SampleElasticSearchStruct(Record):
     """A record with a variety of field types to illustrate all elasticsearch properties"""
     name = StringField()
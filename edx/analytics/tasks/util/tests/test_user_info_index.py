@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Tests for the memory-mapped user info index."""
+
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from edx.analytics.tasks.tests import unittest
+from edx.analytics.tasks.tests.target import FakeTarget
+from edx.analytics.tasks.util import user_info_index
+
+
+USERS = [
+    (3, u'verified', u'Verified Vera'),
+    (1, u'honor', u'Honor Student'),
+    (10, u'élève', u'Élève Un'),
+    (2, u'audit', None),
+    (4, u'staff', u''),
+]
+
+
+class UserInfoIndexTest(unittest.TestCase):
+    """Test writing and reading user info indexes."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.index_path = os.path.join(self.temp_dir, 'user_info.idx')
+
+    def write_index(self, users):
+        """Write an index of the given users and return a reader for it."""
+        with open(self.index_path, 'wb') as index_file:
+            user_info_index.write_user_info_index(index_file, users)
+        return user_info_index.UserInfoIndex(self.index_path)
+
+    def get_expected_user_info(self, users):
+        """Return the user_info dicts that UserInfoMixin would have loaded for the given users."""
+        expected = {}
+        for user_id, username, name in users:
+            expected[user_id] = {'user_id': user_id, 'username': username}
+            if name is not None:
+                expected[user_id]['name'] = name
+        return expected
+
+    def test_by_id(self):
+        index = self.write_index(USERS)
+        self.assertDictEqual(dict(index.by_id), self.get_expected_user_info(USERS))
+        self.assertEquals(list(index.by_id), [1, 2, 3, 4, 10])
+        self.assertEquals(len(index.by_id), 5)
+
+    def test_by_username(self):
+        index = self.write_index(USERS)
+        expected = {user_info['username']: user_info for user_info in self.get_expected_user_info(USERS).values()}
+        self.assertDictEqual(dict(index.by_username), expected)
+        self.assertEquals(index.by_username['honor']['user_id'], 1)
+        self.assertEquals(index.by_username[u'élève']['user_id'], 10)
+
+    def test_missing_keys(self):
+        index = self.write_index(USERS)
+        for user_id in (0, 5, 11, '1', None):
+            self.assertNotIn(user_id, index.by_id)
+            with self.assertRaises(KeyError):
+                index.by_id[user_id]  # pylint: disable=pointless-statement
+        for username in (u'unknown', u'élève'.encode('utf8'), 1, None):
+            self.assertNotIn(username, index.by_username)
+        self.assertIsNone(index.by_username.get(u'Honor'))
+
+    def test_empty_index(self):
+        index = self.write_index([])
+        self.assertEquals(dict(index.by_id), {})
+        self.assertEquals(dict(index.by_username), {})
+        self.assertNotIn(1, index.by_id)
+        self.assertNotIn(u'honor', index.by_username)
+
+    def test_username_hash_collisions(self):
+        with patch('edx.analytics.tasks.util.user_info_index.hash_username', return_value=42):
+            index = self.write_index(USERS)
+            for user_id, username, _name in USERS:
+                self.assertEquals(index.by_username[username]['user_id'], user_id)
+            self.assertNotIn(u'unknown', index.by_username)
+
+    def test_invalid_file(self):
+        with open(self.index_path, 'wb') as index_file:
+            index_file.write('\x00' * 64)
+        with self.assertRaises(ValueError):
+            user_info_index.UserInfoIndex(self.index_path)
+
+    def test_without_numpy(self):
+        self.write_index(USERS)
+        with patch('edx.analytics.tasks.util.user_info_index.numpy', None):
+            with self.assertRaisesRegexp(RuntimeError, 'NumPy is required'):
+                self.write_index(USERS)
+            with self.assertRaisesRegexp(RuntimeError, 'NumPy is required'):
+                user_info_index.UserInfoIndex(self.index_path)
+
+    def test_remote_target(self):
+        self.write_index(USERS)
+        with open(self.index_path, 'rb') as index_file:
+            target = FakeTarget(path='s3://fake/user_info/{0}.idx'.format(self.temp_dir), value=index_file.read())
+        with patch('edx.analytics.tasks.util.user_info_index.tempfile.gettempdir', return_value=self.temp_dir):
+            index = user_info_index.UserInfoIndex.from_target(target)
+            self.assertEquals(index.by_id[3]['name'], u'Verified Vera')
+            local_path = user_info_index.get_local_copy(target)
+            self.assertNotEquals(local_path, self.index_path)
+            self.assertEquals(os.path.dirname(local_path), self.temp_dir)
@@ -0,0 +1,218 @@
+"""
+A compact index of user information that is stored in a file and memory-mapped when it is read.
+
+Looking up a user in the index only reads the parts of the file that are needed, and the pages of the file are shared by
+all of the processes on a machine that open it, so large numbers of users do not need to be loaded into the memory of
+each process.
+
+The file contains, in order:
+
+* a header with a magic string and the number of users.
+* the user_id of each user, in ascending order.
+* a hash of the username of each user, in ascending order.
+* for each hash, the position of the user in the list of user_ids.
+* for each user, the offset of their record, followed by the offset of the end of the last record.
+* the records, each consisting of a flag byte that is set if the user has a name, the UTF-8 encoded username, a null
+  byte, and the UTF-8 encoded name.
+"""
+
+import collections
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+import luigi
+
+log = logging.getLogger(__name__)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # pylint: disable=invalid-name
+
+
+MAGIC = 'USRIDX01'
+HEADER = struct.Struct('<8sQ')
+INT_DTYPE = '<i8'
+HASH_DTYPE = '<u8'
+HAS_NAME = '\x01'
+NO_NAME = '\x00'
+
+
+def hash_username(username):
+    """Returns a 64 bit hash of a unicode username."""
+    return struct.unpack('<Q', hashlib.md5(username.encode('utf8')).digest()[:8])[0]
+
+
+def write_user_info_index(output_file, users):
+    """
+    Writes an index of users to a file.
+
+    `users` is an iterable of (user_id, username, name) tuples, where user_id is an int, username is a unicode string and
+    name is a unicode string or None.
+    """
+    if numpy is None:
+        raise RuntimeError('NumPy is required to write a user info index.')
+
+    users = sorted(users)
+    records = []
+    offsets = [0]
+    for _user_id, username, name in users:
+        if name is None:
+            record = NO_NAME + username.encode('utf8') + '\x00'
+        else:
+            record = HAS_NAME + username.encode('utf8') + '\x00' + name.encode('utf8')
+        records.append(record)
+        offsets.append(offsets[-1] + len(record))
+
+    username_hashes = numpy.array([hash_username(username) for _user_id, username, _name in users], dtype=HASH_DTYPE)
+    hash_order = numpy.argsort(username_hashes, kind='mergesort')
+
+    output_file.write(HEADER.pack(MAGIC, len(users)))
+    output_file.write(numpy.array([user[0] for user in users], dtype=INT_DTYPE).tostring())
+    output_file.write(username_hashes[hash_order].tostring())
+    output_file.write(hash_order.astype(INT_DTYPE).tostring())
+    output_file.write(numpy.array(offsets, dtype=INT_DTYPE).tostring())
+    for record in records:
+        output_file.write(record)
+
+
+def get_local_copy(target):
+    """
+    Returns the path of a copy of the target on the local filesystem.
+
+    Remote targets are copied once to the temporary directory, where the copy is shared by all of the processes on this
+    machine that read the same URL.
+    """
+    if isinstance(target, luigi.LocalTarget):
+        return target.path
+
+    local_path = os.path.join(
+        tempfile.gettempdir(), 'user_info_index_{0}'.format(hashlib.md5(target.path).hexdigest())
+    )
+    if not os.path.exists(local_path):
+        log.info('Copying user info index from %s to %s', target.path, local_path)
+        temporary_file = tempfile.NamedTemporaryFile(dir=os.path.dirname(local_path), delete=False)
+        with temporary_file:
+            with target.open('r') as input_file:
+                shutil.copyfileobj(input_file, temporary_file)
+        # Another process may have copied the file in the meantime, but renaming over its copy is harmless.
+        os.rename(temporary_file.name, local_path)
+    return local_path
+
+
+class UserInfoIndex(object):
+    """Reads an index of users that was written by `write_user_info_index`."""
+
+    def __init__(self, path):
+        if numpy is None:
+            raise RuntimeError('NumPy is required to read a user info index.')
+
+        with open(path, 'rb') as index_file:
+            self.mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise ValueError('{0} is not a user info index'.format(path))
+
+        position = HEADER.size
+        self.user_ids = numpy.frombuffer(self.mmap, dtype=INT_DTYPE, count=count, offset=position)
+        position += self.user_ids.nbytes
+        self.username_hashes = numpy.frombuffer(self.mmap, dtype=HASH_DTYPE, count=count, offset=position)
+        position += self.username_hashes.nbytes
+        self.hash_order = numpy.frombuffer(self.mmap, dtype=INT_DTYPE, count=count, offset=position)
+        position += self.hash_order.nbytes
+        self.record_offsets = numpy.frombuffer(self.mmap, dtype=INT_DTYPE, count=count + 1, offset=position)
+        self.records_start = position + self.record_offsets.nbytes
+
+        self.by_id = UserInfoById(self)
+        self.by_username = UserInfoByUsername(self)
+
+    @classmethod
+    def from_target(cls, target):
+        """Opens the index stored in a target."""
+        return cls(get_local_copy(target))
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def get_user_info(self, position):
+        """Returns a dict with 'user_id', 'username' and possibly 'name' keys for the user at a position in the index."""
+        start = self.records_start + int(self.record_offsets[position])
+        end = self.records_start + int(self.record_offsets[position + 1])
+        record = self.mmap[start:end]
+        username, name = record[1:].split('\x00', 1)
+        user_info = {'user_id': int(self.user_ids[position]), 'username': username.decode('utf8')}
+        if record[0] == HAS_NAME:
+            user_info['name'] = name.decode('utf8')
+        return user_info
+
+    def find_user_id(self, user_id):
+        """Returns the position of the user with the given user_id, or None if there is no such user."""
+        position = int(numpy.searchsorted(self.user_ids, user_id))
+        if position < len(self.user_ids) and self.user_ids[position] == user_id:
+            return position
+        return None
+
+    def find_username(self, username):
+        """Returns the user_info of the user with the given unicode username, or None if there is no such user."""
+        username_hash = numpy.uint64(hash_username(username))
+        position = int(numpy.searchsorted(self.username_hashes, username_hash))
+        while position < len(self.username_hashes) and self.username_hashes[position] == username_hash:
+            user_info = self.get_user_info(int(self.hash_order[position]))
+            if user_info['username'] == username:
+                return user_info
+            position += 1
+        return None
+
+
+class UserInfoById(collections.Mapping):
+    """A read-only mapping from int user_id to user_info, backed by a UserInfoIndex."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __getitem__(self, user_id):
+        if isinstance(user_id, (int, long, numpy.integer)):
+            position = self.index.find_user_id(user_id)
+            if position is not None:
+                return self.index.get_user_info(position)
+        raise KeyError(user_id)
+
+    def __iter__(self):
+        for user_id in self.index.user_ids:
+            yield int(user_id)
+
+    def __len__(self):
+        return len(self.index)
+
+
+class UserInfoByUsername(collections.Mapping):
+    """A read-only mapping from unicode username to user_info, backed by a UserInfoIndex."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __getitem__(self, username):
+        if isinstance(username, str):
+            # Like a dict with unicode keys, only match byte strings that are ASCII.
+            try:
+                username = username.decode('ascii')
+            except UnicodeDecodeError:
+                raise KeyError(username)
+        if isinstance(username, unicode):
+            user_info = self.index.find_username(username)
+            if user_info is not None:
+                return user_info
+        raise KeyError(username)
+
+    def __iter__(self):
+        for position in xrange(len(self.index)):
+            yield self.index.get_user_info(position)['username']
+
+    def __len__(self):
+        return len(self.index)
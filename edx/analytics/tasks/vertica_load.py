@@ -2,13 +2,19 @@
 Support for loading data into an HP Vertica database.
 """
 from collections import namedtuple
+import functools
+import hashlib
 import json
 import logging
+from multiprocessing.pool import ThreadPool
+import os
 
 import luigi
 import luigi.configuration
+import luigi.hdfs
 from edx.analytics.tasks.url import ExternalURL
 
+from edx.analytics.tasks.util.file_util import get_line_aligned_byte_ranges, ByteRangeFile
 from edx.analytics.tasks.util.overwrite import OverwriteOutputMixin
 from edx.analytics.tasks.util.vertica_target import VerticaTarget
 
@@ -26,6 +32,8 @@ except ImportError:
 PROJECTION_TYPE_NORMAL = 'Normal'
 PROJECTION_TYPE_AGGREGATE = 'Aggregate'
 
+STAGING_TABLE_SUFFIX = '_staging'
+
 VerticaProjection = namedtuple('VerticaProjection',  # pylint: disable=invalid-name
                                ['name', 'type', 'definition',])
 
@@ -56,6 +64,14 @@ class VerticaCopyTaskMixin(OverwriteOutputMixin):
         default='experimental',
         config_path={'section': 'vertica-export', 'name': 'persistent_schema'}
     )
+    copy_connections = luigi.IntParameter(
+        default=1,
+        config_path={'section': 'vertica-export', 'name': 'copy_connections'},
+        significant=False,
+        description='The number of connections to use to copy the insert source into Vertica at the same time.  If '
+        'greater than 1, the files in the insert source, or the byte ranges of a single local file, are copied into a '
+        'staging table by concurrent COPY statements, and then inserted into the table in a single transaction.',
+    )
 
 class VerticaCopyTask(VerticaCopyTaskMixin, luigi.Task):
     """
@@ -387,29 +403,140 @@ class VerticaCopyTask(VerticaCopyTaskMixin, luigi.Task):
         """The null sequence in the data to be copied.  Default is Hive NULL (\\N)"""
         return "'\\N'"
 
-    def copy_data_table_from_target(self, cursor):
-        """Performs the copy query from the insert source."""
+    def _get_column_names(self):
+        """Returns the names of the columns, joined by commas."""
         if isinstance(self.columns[0], basestring):
-            column_names = ','.join([name for name in self.columns])
+            return ','.join([name for name in self.columns])
         elif len(self.columns[0]) == 2:
-            column_names = ','.join([name for name, _type in self.columns])
+            return ','.join([name for name, _type in self.columns])
         else:
             raise Exception('columns must consist of column strings or '
                             '(column string, type string) tuples (was %r ...)'
                             % (self.columns[0],))
 
+    def _copy_file(self, cursor, source_file, table, commit=False):
+        """Copies the data in a file into a table in the schema, committing it only if `commit` is True."""
+        cursor.copy(
+            "COPY {schema}.{table} ({cols}) FROM STDIN DELIMITER AS {delim} NULL AS {null} DIRECT ABORT ON ERROR{no_commit};".format(
+                schema=self.schema,
+                table=table,
+                cols=self._get_column_names(),
+                delim=self.copy_delimiter,
+                null=self.copy_null_sequence,
+                no_commit='' if commit else ' NO COMMIT',
+            ),
+            source_file
+        )
+
+    def copy_data_table_from_target(self, cursor):
+        """Performs the copy query from the insert source."""
         with self.input()['insert_source'].open('r') as insert_source_file:
             log.debug("Running stream copy from source file")
-            cursor.copy(
-                "COPY {schema}.{table} ({cols}) FROM STDIN DELIMITER AS {delim} NULL AS {null} DIRECT ABORT ON ERROR NO COMMIT;".format(
-                    schema=self.schema,
-                    table=self.table,
-                    cols=column_names,
-                    delim=self.copy_delimiter,
-                    null=self.copy_null_sequence
-                ),
-                insert_source_file
+            self._copy_file(cursor, insert_source_file, self.table)
+
+    def get_copy_sources(self):
+        """
+        Returns a list of functions that each open a part of the insert source, so that the parts can be copied at once.
+
+        A directory is split into the files it contains, other than hidden files and files like _SUCCESS, and a single
+        local file is split into copy_connections byte ranges that start and end on line boundaries.  Other sources are
+        not split.
+        """
+        target = self.input()['insert_source']
+        if isinstance(target, luigi.LocalTarget):
+            if not os.path.isdir(target.path):
+                return [
+                    functools.partial(ByteRangeFile, target.path, start, end)
+                    for start, end in get_line_aligned_byte_ranges(target.path, self.copy_connections)
+                ]
+            paths = [os.path.join(target.path, name) for name in sorted(os.listdir(target.path))]
+            return [functools.partial(open, path, 'r') for path in paths if is_data_file(path)]
+        elif isinstance(target, luigi.hdfs.HdfsTarget):
+            paths = sorted(luigi.hdfs.listdir(target.path, ignore_directories=True))
+            return [functools.partial(target.__class__(path).open, 'r') for path in paths if is_data_file(path)]
+        return [functools.partial(target.open, 'r')]
+
+    def staging_table_name(self):
+        """
+        Returns the name of the staging table for this task.
+
+        The name includes a hash of the update id, so that tasks loading different data into the same table at the
+        same time do not use, or drop, each other's staging table.
+        """
+        return '{table}{suffix}_{update_hash}'.format(
+            table=self.table, suffix=STAGING_TABLE_SUFFIX, update_hash=hashlib.md5(self.update_id()).hexdigest()
+        )
+
+    def create_staging_table(self, connection):
+        """
+        Creates an empty staging table with the columns to be copied, and returns its name.
+
+        Any staging table left behind by a previous attempt is dropped first.
+        """
+        staging_table = self.staging_table_name()
+        query = "DROP TABLE IF EXISTS {schema}.{staging_table}".format(schema=self.schema, staging_table=staging_table)
+        log.debug(query)
+        connection.cursor().execute(query)
+
+        if len(self.columns[0]) == 2:
+            query = "CREATE TABLE {schema}.{staging_table} ({coldefs})".format(
+                schema=self.schema,
+                staging_table=staging_table,
+                coldefs=','.join('{name} {definition}'.format(name=name, definition=definition)
+                                 for name, definition in self.columns),
             )
+        else:
+            query = "CREATE TABLE {schema}.{staging_table} LIKE {schema}.{table}".format(
+                schema=self.schema, staging_table=staging_table, table=self.table
+            )
+        log.debug(query)
+        connection.cursor().execute(query)
+        return staging_table
+
+    def copy_data_table_to_staging(self, staging_table):
+        """
+        Copies the parts of the insert source into the staging table, using a pool of copy_connections connections.
+
+        Data copied without being committed is only visible to the connection that copied it, so each part is committed
+        to the staging table as soon as it has been copied.  The data only becomes visible in the table once it is
+        inserted from the staging table, in the same transaction that updates the marker table.
+        """
+        copy_sources = self.get_copy_sources()
+        log.debug("Running %d stream copies into %s", len(copy_sources), staging_table)
+        if not copy_sources:
+            # An empty source loads no rows, as it does with a single connection.
+            return
+
+        pool = ThreadPool(min(self.copy_connections, len(copy_sources)))
+        try:
+            pool.map(functools.partial(self._copy_source, staging_table), copy_sources)
+        finally:
+            pool.terminate()
+
+    def _copy_source(self, table, open_source):
+        """Copies and commits one part of the insert source into a table, using a new connection."""
+        connection = self.output().connect()
+        try:
+            connection.cursor().execute("SET TIMEZONE TO 'GMT';")
+            with open_source() as source_file:
+                self._copy_file(connection.cursor(), source_file, table, commit=True)
+        finally:
+            connection.close()
+
+    def insert_data_table_from_staging(self, cursor, staging_table):
+        """Inserts the data that has been copied into the staging table into the table."""
+        column_names = self._get_column_names()
+        query = "INSERT /*+ DIRECT */ INTO {schema}.{table} ({cols}) SELECT {cols} FROM {schema}.{staging_table};".format(
+            schema=self.schema, table=self.table, cols=column_names, staging_table=staging_table
+        )
+        log.debug(query)
+        cursor.execute(query)
+
+    def drop_staging_table(self, connection, staging_table):
+        """Drops the staging table."""
+        query = "DROP TABLE IF EXISTS {schema}.{staging_table}".format(schema=self.schema, staging_table=staging_table)
+        log.debug(query)
+        connection.cursor().execute(query)
 
     def run(self):
         """
@@ -423,12 +550,18 @@ class VerticaCopyTask(VerticaCopyTaskMixin, luigi.Task):
         self.check_vertica_availability()
 
         connection = self.output().connect()
+        staging_table = None
         try:
             # create schema and table only if necessary:
             self.create_schema(connection)
             self.create_table(connection)
             self.create_nonaggregate_projections(connection)
 
+            if self.copy_connections > 1:
+                # Creating a table commits, so this has to be done before the transaction that loads the table starts.
+                staging_table = self.create_staging_table(connection)
+                self.copy_data_table_to_staging(staging_table)
+
             # we should do nothing between initialization and copying
             # that would commit the transaction.
             self.init_copy(connection)
@@ -436,7 +569,10 @@ class VerticaCopyTask(VerticaCopyTaskMixin, luigi.Task):
             connection.cursor().execute("SET TIMEZONE TO 'GMT';")
 
             cursor = connection.cursor()
-            self.copy_data_table_from_target(cursor)
+            if staging_table is not None:
+                self.insert_data_table_from_staging(cursor, staging_table)
+            else:
+                self.copy_data_table_from_target(cursor)
 
             # mark as complete in same transaction
             self.init_touch(connection)
@@ -446,6 +582,10 @@ class VerticaCopyTask(VerticaCopyTaskMixin, luigi.Task):
             connection.commit()
             log.debug("Committed transaction.")
 
+            if staging_table is not None:
+                self.drop_staging_table(connection, staging_table)
+                staging_table = None
+
             # If we don't do this, the deleted records will significantly impact query performance.
             self.purge_deleted_records(connection)
 
@@ -457,6 +597,8 @@ class VerticaCopyTask(VerticaCopyTaskMixin, luigi.Task):
         except Exception as exc:
             log.exception("Rolled back the transaction; exception raised: %s", str(exc))
             connection.rollback()
+            if staging_table is not None:
+                self.drop_staging_table(connection, staging_table)
             raise
         finally:
             connection.close()
@@ -467,6 +609,11 @@ class VerticaCopyTask(VerticaCopyTaskMixin, luigi.Task):
             raise ImportError('Vertica client library not available')
 
 
+def is_data_file(path):
+    """Returns False for files in an output directory that do not contain data, like _SUCCESS and hidden files."""
+    return not os.path.basename(path).startswith(('_', '.'))
+
+
 class CredentialFileVerticaTarget(VerticaTarget):
     """
     Represents a table in Vertica, is complete when the update_id is the same as a previous successful execution.
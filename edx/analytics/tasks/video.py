@@ -1,18 +1,19 @@
 """Tasks for aggregating statisics about video viewing."""
 
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 import json
 import logging
 import math
 import re
 import urllib
+import uuid
 
 import ciso8601
 import luigi
 from luigi import configuration
 
 from edx.analytics.tasks.mapreduce import MapReduceJobTask, MapReduceJobTaskMixin
-from edx.analytics.tasks.pathutil import EventLogSelectionMixin, EventLogSelectionDownstreamMixin
+from edx.analytics.tasks.pathutil import EventLogSelectionMixin, EventLogSelectionDownstreamMixin, PathSetTask
 from edx.analytics.tasks.url import get_target_from_url, url_path_join
 from edx.analytics.tasks.util import eventlog
 from edx.analytics.tasks.util.hive import WarehouseMixin, HivePartition, HiveTableTask, HiveQueryToMysqlTask
@@ -39,6 +40,12 @@ VIDEO_UNKNOWN_DURATION = -1
 VIDEO_VIEWING_SECONDS_PER_SEGMENT = 5
 VIDEO_VIEWING_MINIMUM_LENGTH = 0.25  # seconds
 
+YOUTUBE_API_URL = 'https://www.googleapis.com/youtube/v3/videos'
+# The Youtube API accepts at most this many comma-separated video IDs in a single request.
+YOUTUBE_MAXIMUM_IDS_PER_REQUEST = 50
+# Limits how many keys the reducer holds back while it gathers video IDs to look up together.
+VIDEO_DURATION_MAXIMUM_PENDING_KEYS = 1000
+
 VideoViewing = namedtuple('VideoViewing', [   # pylint: disable=invalid-name
     'start_timestamp', 'course_id', 'encoded_module_id', 'start_offset', 'video_duration'])
 
@@ -47,6 +54,15 @@ class UserVideoViewingTask(EventLogSelectionMixin, MapReduceJobTask):
     """Validates video-related events and identifies start-stop event pairs."""
 
     output_root = luigi.Parameter()
+    duration_cache_root = luigi.Parameter(
+        config_path={'section': 'videos', 'name': 'duration_cache_root'},
+        default=None,
+        significant=False,
+        description='A URL to a directory in which the durations fetched from Youtube are stored, so that each video '
+        'only needs to be looked up once across runs.',
+    )
+
+    required_event_types = VIDEO_EVENT_TYPES
 
     # Cache for storing duration values fetched from Youtube.
     # Persist this across calls to the reducer.
@@ -57,7 +73,12 @@ class UserVideoViewingTask(EventLogSelectionMixin, MapReduceJobTask):
         # Providing an api_key is optional.
         self.api_key = configuration.get_config().get('google', 'api_key', None)
         # Reset this (mostly for the sake of tests).
-        self.video_durations = {}
+        self.video_durations = self.read_video_duration_cache()
+        # Durations fetched by this reducer that should be added to the persistent cache.
+        self.new_video_durations = {}
+        # Keys (and their sorted events) that are waiting for the durations of their videos to be fetched.
+        self.pending_viewings = []
+        self.pending_youtube_ids = set()
 
     def mapper(self, line):
         # Add a filter here to permit quicker rejection of unrelated events.
@@ -174,11 +195,52 @@ class UserVideoViewingTask(EventLogSelectionMixin, MapReduceJobTask):
 
         Puts the user's video events in chronological order, and identifies pairs of
         play_video/non-play_video events.
-        """
-        username, course_id, encoded_module_id = key
 
+        Keys that refer to Youtube videos of unknown duration are held back until enough video IDs have accumulated to
+        look them up with a single request, so their records may be output while reducing a later key, or by
+        `final_reducer`.
+        """
         sorted_events = sorted(events)
 
+        if self.api_key is not None:
+            missing_youtube_ids = set(
+                event[4] for event in sorted_events
+                if event[1] == VIDEO_PLAYED and event[4] and event[4] not in self.video_durations
+            )
+            if missing_youtube_ids:
+                self.pending_viewings.append((key, sorted_events))
+                self.pending_youtube_ids.update(missing_youtube_ids)
+                if (
+                    len(self.pending_youtube_ids) >= YOUTUBE_MAXIMUM_IDS_PER_REQUEST or
+                    len(self.pending_viewings) >= VIDEO_DURATION_MAXIMUM_PENDING_KEYS
+                ):
+                    for record in self.reduce_pending_viewings():
+                        yield record
+                return
+
+        for record in self.get_viewings(key, sorted_events):
+            yield record
+
+    def final_reducer(self):
+        """Outputs the viewings still waiting for video durations, and stores the durations that were fetched."""
+        for record in self.reduce_pending_viewings():
+            yield record
+        self.write_video_duration_cache_fragment()
+
+    def reduce_pending_viewings(self):
+        """Fetches the durations of all pending video IDs in batches, then outputs the viewings that needed them."""
+        self.fetch_video_durations(self.pending_youtube_ids)
+        pending_viewings = self.pending_viewings
+        self.pending_viewings = []
+        self.pending_youtube_ids = set()
+        for key, sorted_events in pending_viewings:
+            for record in self.get_viewings(key, sorted_events):
+                yield record
+
+    def get_viewings(self, key, sorted_events):
+        """Identifies the viewings within the chronologically sorted events of a single user and video module."""
+        username, course_id, encoded_module_id = key
+
         # When a user seeks forward while the video is playing, it is common to see an incorrect value for currentTime
         # in the play event emitted after the seek. The expected behavior here is play->seek->play with the second
         # play event being emitted almost immediately after the seek. This second play event should record the
@@ -201,9 +263,8 @@ class UserVideoViewingTask(EventLogSelectionMixin, MapReduceJobTask):
                 if youtube_id:
                     video_duration = self.video_durations.get(youtube_id)
                     if not video_duration:
-                        video_duration = self.get_video_duration(youtube_id)
-                        # Duration might still be unknown, but just store it.
-                        self.video_durations[youtube_id] = video_duration
+                        self.fetch_video_durations([youtube_id])
+                        video_duration = self.video_durations[youtube_id]
 
                 if last_viewing_end_event is not None and last_viewing_end_event[1] == VIDEO_SEEK:
                     start_offset = last_viewing_end_event[2]
@@ -284,26 +345,62 @@ class UserVideoViewingTask(EventLogSelectionMixin, MapReduceJobTask):
     def output(self):
         return get_target_from_url(self.output_root)
 
+    def run(self):
+        super(UserVideoViewingTask, self).run()
+        self.merge_video_duration_cache()
+
+    def fetch_video_durations(self, youtube_ids):
+        """Looks up the durations of the given videos that are not yet cached, and caches them."""
+        missing_youtube_ids = sorted(
+            set(youtube_id for youtube_id in youtube_ids if youtube_id not in self.video_durations)
+        )
+        for index in range(0, len(missing_youtube_ids), YOUTUBE_MAXIMUM_IDS_PER_REQUEST):
+            batch = missing_youtube_ids[index:index + YOUTUBE_MAXIMUM_IDS_PER_REQUEST]
+            durations = self.get_video_durations(batch)
+            for youtube_id in batch:
+                # Duration might still be unknown, but just store it.
+                duration = durations.get(youtube_id, VIDEO_UNKNOWN_DURATION)
+                self.video_durations[youtube_id] = duration
+                # Unknown durations are not persisted, since a later run may be able to find them.
+                if duration != VIDEO_UNKNOWN_DURATION:
+                    self.new_video_durations[youtube_id] = duration
+
     def get_video_duration(self, youtube_id):
         """
         For youtube videos, queries Google API for video duration information.
 
         This returns an "unknown" duration flag if no API key has been defined, or if the query fails.
         """
-        duration = VIDEO_UNKNOWN_DURATION
-        if self.api_key is None:
-            return duration
+        return self.get_video_durations([youtube_id]).get(youtube_id, VIDEO_UNKNOWN_DURATION)
+
+    def get_video_durations(self, youtube_ids):
+        """
+        Queries Google API for the durations of several youtube videos with a single request.
+
+        Returns a dictionary mapping each youtube_id to its duration in seconds.  Videos whose duration could not be
+        found are omitted, as are all of them if no API key has been defined or the query fails.
+        """
+        durations = {}
+        if self.api_key is None or not youtube_ids:
+            return durations
 
         video_file = None
         try:
-            video_url = "https://www.googleapis.com/youtube/v3/videos?id={0}&part=contentDetails&key={1}".format(
-                youtube_id, self.api_key
+            video_url = "{0}?id={1}&part=contentDetails&key={2}".format(
+                YOUTUBE_API_URL, ','.join(youtube_ids), self.api_key
             )
             video_file = urllib.urlopen(video_url)
             content = json.load(video_file)
             items = content.get('items', [])
-            if len(items) > 0:
-                duration_str = items[0].get(
+            if len(items) == 0:
+                log.error('Unable to find items in response to duration request for youtube videos: %s', youtube_ids)
+            for item in items:
+                # Older responses for a single video may omit the ID, so fall back to the one that was requested.
+                youtube_id = item.get('id', youtube_ids[0] if len(youtube_ids) == 1 else None)
+                if youtube_id is None:
+                    log.error('Unable to find video ID in response to duration request: %s', item)
+                    continue
+                duration_str = item.get(
                     'contentDetails', {'duration': 'MISSING_CONTENTDETAILS'}
                 ).get('duration', 'MISSING_DURATION')
                 matcher = re.match(r'PT(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?', duration_str)
@@ -313,16 +410,60 @@ class UserVideoViewingTask(EventLogSelectionMixin, MapReduceJobTask):
                     duration_secs = int(matcher.group('hours') or 0) * 3600
                     duration_secs += int(matcher.group('minutes') or 0) * 60
                     duration_secs += int(matcher.group('seconds') or 0)
-                    duration = duration_secs
-            else:
-                log.error('Unable to find items in response to duration request for youtube video: %s', youtube_id)
+                    durations[youtube_id.encode('utf8')] = duration_secs
         except Exception:  # pylint: disable=broad-except
             log.exception("Unrecognized response from Youtube API")
         finally:
             if video_file is not None:
                 video_file.close()
 
-        return duration
+        return durations
+
+    def read_video_duration_cache(self):
+        """Returns the durations stored by previous runs, or an empty dictionary if there is no cache."""
+        if self.duration_cache_root is None:
+            return {}
+
+        cache_target = get_target_from_url(url_path_join(self.duration_cache_root, 'durations.json'))
+        if not cache_target.exists():
+            return {}
+
+        with cache_target.open('r') as cache_file:
+            return {youtube_id.encode('utf8'): duration for youtube_id, duration in json.load(cache_file).iteritems()}
+
+    def write_video_duration_cache_fragment(self):
+        """Stores the durations fetched by this reducer in a file of its own, to be merged into the cache later."""
+        if self.duration_cache_root is None or not self.new_video_durations:
+            return
+
+        fragment_url = url_path_join(self.duration_cache_root, 'fragments', '{0}.json'.format(uuid.uuid4().hex))
+        with get_target_from_url(fragment_url).open('w') as fragment_file:
+            json.dump(self.new_video_durations, fragment_file)
+        self.new_video_durations = {}
+
+    def merge_video_duration_cache(self):
+        """Merges the durations fetched by the reducers of this job into the persistent cache."""
+        if self.duration_cache_root is None:
+            return
+
+        fragments_url = url_path_join(self.duration_cache_root, 'fragments')
+        # List the fragments directly, since the PathSetTask instance and the listing it holds may be reused.
+        fragment_targets = [
+            url_task.output() for url_task in PathSetTask(src=[fragments_url], include=['*.json']).generate_file_list()
+        ]
+        if not fragment_targets:
+            return
+
+        video_durations = self.read_video_duration_cache()
+        for fragment_target in fragment_targets:
+            with fragment_target.open('r') as fragment_file:
+                video_durations.update(json.load(fragment_file))
+
+        with get_target_from_url(url_path_join(self.duration_cache_root, 'durations.json')).open('w') as cache_file:
+            json.dump(video_durations, cache_file)
+
+        for fragment_target in fragment_targets:
+            fragment_target.remove()
 
 
 class VideoTableDownstreamMixin(WarehouseMixin, EventLogSelectionDownstreamMixin, MapReduceJobTaskMixin):
@@ -383,7 +524,11 @@ class VideoUsageTask(VideoTableDownstreamMixin, MapReduceJobTask):
         """
         course_id, encoded_module_id = key
         pipeline_video_id = '{0}|{1}'.format(course_id, encoded_module_id)
-        usage_map = {}
+
+        # Rather than visiting every segment of every viewing, record where the number of views changes and the ranges
+        # of segments watched by each user, and count the views and users of each segment in a single sweep afterwards.
+        view_changes = defaultdict(int)
+        segment_ranges_by_user = defaultdict(list)
 
         video_duration = 0
         for viewing in viewings:
@@ -401,11 +546,36 @@ class VideoUsageTask(VideoTableDownstreamMixin, MapReduceJobTask):
 
             first_segment = self.snap_to_last_segment_boundary(float(start_offset))
             last_segment = self.snap_to_last_segment_boundary(float(end_offset))
-            for segment in xrange(first_segment, last_segment + 1):
-                stats = usage_map.setdefault(segment, {})
-                users = stats.setdefault('users', set())
-                users.add(username)
-                stats['views'] = stats.get('views', 0) + 1
+            if first_segment > last_segment:
+                continue
+            view_changes[first_segment] += 1
+            view_changes[last_segment + 1] -= 1
+            segment_ranges_by_user[username].append((first_segment, last_segment))
+
+        # A user is only counted once for each segment, so overlapping ranges of segments watched by the same user are
+        # merged before they are counted.
+        user_changes = defaultdict(int)
+        for segment_ranges in segment_ranges_by_user.itervalues():
+            segment_ranges.sort()
+            merged_first_segment, merged_last_segment = segment_ranges[0]
+            for first_segment, last_segment in segment_ranges:
+                if first_segment > merged_last_segment + 1:
+                    user_changes[merged_first_segment] += 1
+                    user_changes[merged_last_segment + 1] -= 1
+                    merged_first_segment = first_segment
+                merged_last_segment = max(merged_last_segment, last_segment)
+            user_changes[merged_first_segment] += 1
+            user_changes[merged_last_segment + 1] -= 1
+
+        usage_map = {}
+        num_views = num_users = 0
+        boundaries = sorted(set(view_changes).union(user_changes))
+        for boundary, next_boundary in zip(boundaries, boundaries[1:]):
+            num_views += view_changes.get(boundary, 0)
+            num_users += user_changes.get(boundary, 0)
+            if num_views > 0:
+                for segment in xrange(boundary, next_boundary):
+                    usage_map[segment] = {'users': num_users, 'views': num_views}
 
         # If we don't know the duration of the video, just use the final segment that was
         # actually viewed to determine users_at_end.
@@ -416,8 +586,8 @@ class VideoUsageTask(VideoTableDownstreamMixin, MapReduceJobTask):
             final_segment = self.snap_to_last_segment_boundary(float(video_duration))
 
         # Output stats.
-        users_at_start = len(usage_map.get(0, {}).get('users', []))
-        users_at_end = len(usage_map.get(self.complete_end_segment(video_duration), {}).get('users', []))
+        users_at_start = usage_map.get(0, {}).get('users', 0)
+        users_at_end = usage_map.get(self.complete_end_segment(video_duration), {}).get('users', 0)
         for segment in sorted(usage_map.keys()):
             stats = usage_map[segment]
             yield (
@@ -429,8 +599,8 @@ class VideoUsageTask(VideoTableDownstreamMixin, MapReduceJobTask):
                 users_at_start,
                 users_at_end,
                 segment,
-                len(stats.get('users', [])),
-                stats.get('views', 0),
+                stats['users'],
+                stats['views'],
             )
             if segment == final_segment:
                 break
@@ -448,12 +618,14 @@ class VideoUsageTask(VideoTableDownstreamMixin, MapReduceJobTask):
         """
         Identifies the final segment by looking for a sharp drop in number of users per segment.
         Needed as some events appear after the actual end of videos.
+
+        The usage_map maps each segment to a dict containing the number of 'users' that watched it.
         """
         final_segment = last_segment = max(usage_map.keys())
-        last_segment_num_users = len(usage_map[last_segment]['users'])
+        last_segment_num_users = usage_map[last_segment]['users']
         for segment in sorted(usage_map.keys(), reverse=True)[1:]:
             stats = usage_map[segment]
-            current_segment_num_users = len(stats.get('users', []))
+            current_segment_num_users = stats.get('users', 0)
             if last_segment_num_users <= current_segment_num_users * self.dropoff_threshold:
                 final_segment = segment
                 break
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Measure the cost of remapping user ids with a PermutationGenerator.
+
+Usage: python scripts/benchmark_id_codec.py [number_of_ids]
+
+The ids are remapped one at a time, in bulk, and with a reference implementation that multiplies a vector of the bits
+of each id by a permutation matrix.  The script fails if the results are not the same.
+"""
+
+import random
+import sys
+import timeit
+
+import numpy
+
+from edx.analytics.tasks.util.id_codec import PermutationGenerator
+
+
+SEED = 42
+BITS = 32
+
+
+def permutation_matrix():
+    """Return the permutation matrix that corresponds to the permutation used by PermutationGenerator(SEED)."""
+    mapping = range(BITS)
+    random.Random(SEED).shuffle(mapping)
+    matrix = numpy.zeros((BITS, BITS), dtype=int)
+    for i in range(BITS):
+        matrix[i, mapping[i]] = 1
+    return matrix
+
+
+def permute_with_matrix(matrix, int_value):
+    """Permute the bits of int_value by converting them to a vector and multiplying it by the matrix."""
+    vec = numpy.array([int(b) for b in bin(int_value)[2:].zfill(BITS)])
+    return int("".join(map(str, vec.dot(matrix))), 2)
+
+
+def main():
+    """Check that each implementation gives the same results, and print the time taken by each."""
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(0)
+    ids = [rng.randrange(2 ** BITS) for _ in range(number)]
+    id_array = numpy.array(ids, dtype=numpy.int64)
+    generator = PermutationGenerator(SEED, BITS, BITS)
+    matrix = permutation_matrix()
+
+    benchmarks = (
+        ('permutation matrix', lambda: [permute_with_matrix(matrix, value) for value in ids]),
+        ('permute', lambda: [generator.permute(value) for value in ids]),
+        ('permute_array', lambda: generator.permute_array(id_array).tolist()),
+    )
+
+    expected = None
+    for name, function in benchmarks:
+        timer = timeit.Timer(function)
+        best = min(timer.repeat(repeat=3, number=1))
+        result = function()
+        if expected is None:
+            expected = result
+        elif result != expected:
+            raise AssertionError('{0} does not match the permutation matrix'.format(name))
+        print '{0:<30}{1:8.3f} us'.format(name, best * 1e6 / number)
+
+
+if __name__ == '__main__':
+    main()
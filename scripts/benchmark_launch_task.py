@@ -0,0 +1,48 @@
+"""
+Measure how long launch-task spends importing modules before it starts to run a task.
+
+Usage: python scripts/benchmark_launch_task.py [task_name]
+
+Each measurement is the wall clock time of a new python process that imports the launcher and then either loads every
+task that is configured using entry_points, or only the named task.  The package must be installed, so that its
+entry_points can be found.
+"""
+
+import subprocess
+import sys
+import time
+
+
+REPEAT = 5
+LAUNCHER_IMPORT = 'import edx.analytics.tasks.launchers.local as local; '
+
+
+def time_process(code):
+    """Return the best wall clock time, in seconds, taken by a python process that runs some code."""
+    best = None
+    for _ in range(REPEAT):
+        start_time = time.time()
+        subprocess.check_call([sys.executable, '-c', code])
+        elapsed = time.time() - start_time
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    """Print the time taken to start with each way of loading tasks."""
+    task_name = sys.argv[1] if len(sys.argv) > 1 else 'export-events'
+
+    benchmarks = (
+        ('python', 'pass'),
+        ('launcher', LAUNCHER_IMPORT),
+        ('all tasks', LAUNCHER_IMPORT + 'local.stevedore.ExtensionManager(local.EXTENSION_NAMESPACE)'),
+        (task_name, LAUNCHER_IMPORT + 'assert local.load_task([{0!r}]) is not None'.format(task_name)),
+    )
+
+    for name, code in benchmarks:
+        print '{0:<30}{1:8.2f} ms'.format(name, time_process(code) * 1e3)
+
+
+if __name__ == '__main__':
+    main()
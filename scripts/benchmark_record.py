@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Measure the cost of creating, encoding and decoding typed records.
+
+Usage: python scripts/benchmark_record.py [number_of_records]
+
+Each line of output is the time in microseconds per record for one way of processing ModuleEngagementRecords, which are
+the most common records handled by map reduce jobs.
+"""
+
+import datetime
+import sys
+import timeit
+
+from edx.analytics.tasks.module_engagement import ModuleEngagementRecord
+
+
+VALUES = (
+    u'course-v1:edX+DemoX+Demo_2014',
+    u'learner',
+    datetime.date(2015, 11, 1),
+    u'problem',
+    u'block-v1:edX+DemoX+Demo_2014+type@problem+block@0123456789abcdef',
+    u'attempted',
+    3,
+)
+KEYWORD_VALUES = dict(zip(ModuleEngagementRecord.get_fields().keys(), VALUES))
+RECORD = ModuleEngagementRecord(*VALUES)
+TSV_LINE = '\t'.join(RECORD.to_string_tuple()) + '\n'
+
+BENCHMARKS = (
+    ('keyword arguments', lambda: ModuleEngagementRecord(**KEYWORD_VALUES)),
+    ('positional arguments', lambda: ModuleEngagementRecord(*VALUES)),
+    ('trusted values', lambda: ModuleEngagementRecord.from_trusted_values(VALUES)),
+    ('to_string_tuple', RECORD.to_string_tuple),
+    ('from_tsv', lambda: ModuleEngagementRecord.from_tsv(TSV_LINE)),
+    ('from_tsv without validation', lambda: ModuleEngagementRecord.from_tsv(TSV_LINE, validate=False)),
+)
+
+
+def main():
+    """Run each benchmark and print the results."""
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for name, function in BENCHMARKS:
+        best = min(timeit.repeat(function, repeat=3, number=number))
+        print '{0:<30}{1:8.2f} us'.format(name, best * 1e6 / number)
+
+
+if __name__ == '__main__':
+    main()